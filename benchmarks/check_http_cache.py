@@ -0,0 +1,189 @@
+"""
+Check of the HTTP response cache against the local stub of pagure API.
+
+The stub server sends `ETag` header and answers conditional requests for pages
+which didn't change by `304 Not Modified`. Every check verifies that the statistics
+computed with the cache are the same as without it, that unchanged pages are reused
+after revalidation, that changed pages replace the cached ones, that pages of finished
+window are reused without any request and that pages cached before the window ended
+are revalidated.
+
+Usage: python benchmarks/check_http_cache.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import arrow
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixture_server import FixtureServer, synthetic_issues  # noqa: E402
+from pagure_api_scripts import get_statistics  # noqa: E402
+from pagure_api_scripts.pagure_client import PagureClient  # noqa: E402
+from pagure_api_scripts.request_scheduler import RequestScheduler  # noqa: E402
+from pagure_api_scripts.response_cache import ResponseCache  # noqa: E402
+
+# Length of the window in days
+DAYS_AGO = 30
+
+
+class Run:
+    """
+    Statistics of the run and requests it sent.
+
+    Attributes:
+      result: Statistics of closed issues
+      requests: Number of requests received by the server
+      not_modified: Number of requests answered by 304
+    """
+
+    def __init__(self, server: FixtureServer, cache_dir: str, till: arrow.Arrow, frozen_till: int = None):
+        """
+        Compute statistics of closed issues in the window ending at till.
+
+        Params:
+          server: Stub server
+          cache_dir: Directory of the response cache, None doesn't use the cache
+          till: End of the window
+          frozen_till: Timestamp of the end of finished window. Default: None
+        """
+        requests = server.requests
+        not_modified = server.not_modified
+        response_cache = ResponseCache(cache_dir) if cache_dir else None
+        client = PagureClient(scheduler=RequestScheduler(rate=0), response_cache=response_cache)
+        try:
+            self.result = get_statistics.closed_issues(
+                till, till.shift(days=-DAYS_AGO), "fixture", client=client, frozen_till=frozen_till
+            )
+        finally:
+            client.close()
+        self.requests = server.requests - requests
+        self.not_modified = server.not_modified - not_modified
+
+
+def close_issue(server: FixtureServer, closed_at: int):
+    """
+    Add issue closed at the time to the repository, as if it was closed after the pages were cached.
+
+    Params:
+      server: Stub server
+      closed_at: Timestamp when the issue was closed
+    """
+    issues = server.repositories["fixture"]
+    issue = dict(
+        issues[0], id=len(issues) + 1, status="Closed", close_status="Fixed",
+        date_created=str(closed_at - 86400), closed_at=str(closed_at), last_updated=str(closed_at)
+    )
+    server.repositories["fixture"] = sorted(
+        issues + [issue], key=lambda issue: int(issue["date_created"]), reverse=True
+    )
+
+
+def check_not_modified(server: FixtureServer, cache_dir: str, till: arrow.Arrow):
+    """
+    Unchanged pages are revalidated and reused from the cache.
+    """
+    expected = Run(server, None, till).result
+    first = Run(server, cache_dir, till)
+    second = Run(server, cache_dir, till)
+    if first.result != expected or second.result != expected:
+        return "results differ"
+    if second.requests != first.requests or second.not_modified != second.requests:
+        return "{} of {} requests answered by 304".format(second.not_modified, second.requests)
+
+
+def check_changed(server: FixtureServer, cache_dir: str, till: arrow.Arrow):
+    """
+    Changed pages replace the cached ones.
+    """
+    cached = Run(server, cache_dir, till).result
+    close_issue(server, till.shift(hours=-1).int_timestamp)
+    changed = Run(server, cache_dir, till)
+    if changed.result != Run(server, None, till).result:
+        return "results differ"
+    if changed.result["total"] != cached["total"] + 1:
+        return "closed issue not counted"
+    if changed.not_modified == changed.requests:
+        return "all requests answered by 304"
+    again = Run(server, cache_dir, till)
+    if again.result != changed.result or again.not_modified != again.requests:
+        return "changed pages not stored"
+
+
+def check_frozen(server: FixtureServer, cache_dir: str, till: arrow.Arrow):
+    """
+    Pages of finished window cached after it ended are reused without any request.
+    """
+    till = till.shift(days=-1)
+    expected = Run(server, None, till).result
+    Run(server, cache_dir, till, frozen_till=till.int_timestamp)
+    frozen = Run(server, cache_dir, till, frozen_till=till.int_timestamp)
+    if frozen.result != expected:
+        return "results differ"
+    if frozen.requests:
+        return "sent {} requests instead of 0".format(frozen.requests)
+
+
+def check_cached_before_till(server: FixtureServer, cache_dir: str, till: arrow.Arrow):
+    """
+    Pages cached before the window ended are revalidated, even if the window is finished now.
+    """
+    # Pages cached three days ago for window, which ended yesterday
+    stored = till.shift(days=-3)
+    till = till.shift(days=-1)
+    Run(server, cache_dir, till)
+    response_cache = ResponseCache(cache_dir)
+    with response_cache.connection:
+        response_cache.connection.execute("UPDATE responses SET stored_at = ?", (stored.int_timestamp,))
+    response_cache.close()
+    # Issue closed after the pages were cached, but before the window ended
+    close_issue(server, stored.shift(days=1).int_timestamp)
+
+    frozen = Run(server, cache_dir, till, frozen_till=till.int_timestamp)
+    if frozen.result != Run(server, None, till).result:
+        return "results differ, issue closed after caching is missing"
+    if not frozen.requests:
+        return "no request sent"
+    again = Run(server, cache_dir, till, frozen_till=till.int_timestamp)
+    if again.result != frozen.result or again.requests:
+        return "revalidated pages not reused, sent {} requests".format(again.requests)
+
+
+CHECKS = [check_not_modified, check_changed, check_frozen, check_cached_before_till]
+
+
+@click.command()
+@click.option("--issues", default=2000, help="Number of synthetic issues in the repository.")
+def main(issues: int):
+    """
+    Run all the checks and exit with status 1 if any of them failed.
+    """
+    now = int(time.time())
+    till = arrow.get(now)
+    failed = []
+    with FixtureServer({}, etag=True) as server:
+        get_statistics.PAGURE_URL = server.url
+        for check in CHECKS:
+            # Every check starts with the same issues and empty cache
+            server.repositories["fixture"] = synthetic_issues(issues, now)
+            cache_dir = tempfile.mkdtemp()
+            try:
+                error = check(server, cache_dir, till)
+            finally:
+                shutil.rmtree(cache_dir)
+            if error:
+                failed.append(check.__name__)
+                click.echo("{:26} FAILED: {}".format(check.__name__, error))
+            else:
+                click.echo("{:26} ok".format(check.__name__))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Check of the retries of failed requests against the local stub of pagure API.
+
+The stub server injects failures and every check verifies that the requests
+are retried, that `Retry-After` header is respected, that retries stop when
+the retry budget or the number of retries of one request is used up and that
+the command line client reports failed requests as errors.
+
+Usage: python benchmarks/check_retries.py
+"""
+import os
+import sys
+import time
+
+import arrow
+import click
+from click.testing import CliRunner
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixture_server import FAILURE_CODES, FixtureServer, synthetic_issues  # noqa: E402
+from pagure_api_scripts import get_statistics  # noqa: E402
+from pagure_api_scripts.pagure_client import PagureClient  # noqa: E402
+from pagure_api_scripts.request_scheduler import PagureRequestError, RequestScheduler  # noqa: E402
+
+# Delay requested by `Retry-After` header in the check of the header
+RETRY_AFTER = 1
+
+
+def new_client(**scheduler_args) -> PagureClient:
+    """
+    Create client without rate limiting and with short backoff, so only `Retry-After` could slow it down.
+    """
+    scheduler_args.setdefault("backoff", 0.01)
+    return PagureClient(scheduler=RequestScheduler(rate=0, **scheduler_args))
+
+
+def check_retries(server: FixtureServer, till: arrow.Arrow, since: arrow.Arrow, expected: dict):
+    """
+    Statistics retrieved with random failures are the same as without them.
+    """
+    server.failure_rate = 0.5
+    try:
+        for workers in (1, 4):
+            server.failures = 0
+            client = new_client(max_retries=10, retry_budget=1000)
+            result = get_statistics.open_and_closed_issues(till, since, "fixture", workers=workers, client=client)
+            client.close()
+            if result != expected:
+                return "results with {} workers differ".format(workers)
+            if not server.failures:
+                return "no failure was injected"
+
+        try:
+            # Import here, aiohttp is optional
+            from pagure_api_scripts import async_statistics
+            result = async_statistics.collect_statistics(
+                till, since, ("fixture",), scheduler=RequestScheduler(rate=0, max_retries=10, retry_budget=1000, backoff=0.01)
+            )
+        except RuntimeError:
+            click.echo("  asynchronous engine skipped, aiohttp is not installed")
+        else:
+            if result["fixture"] != expected:
+                return "results of the asynchronous engine differ"
+    finally:
+        server.failure_rate = 0
+
+
+def check_retry_after(server: FixtureServer, till: arrow.Arrow, since: arrow.Arrow, expected: dict):
+    """
+    Request throttled by 429 with `Retry-After` is retried after the requested delay.
+    """
+    server.fail_first = 1
+    server.failure_codes = (429,)
+    server.retry_after = str(RETRY_AFTER)
+    try:
+        client = new_client()
+        start = time.perf_counter()
+        result = get_statistics.open_and_closed_issues(till, since, "fixture", client=client)
+        elapsed = time.perf_counter() - start
+        client.close()
+    finally:
+        server.failure_codes = FAILURE_CODES
+        server.retry_after = None
+    if result != expected:
+        return "results differ"
+    if elapsed < RETRY_AFTER:
+        return "retried after {:.2f}s instead of {}s".format(elapsed, RETRY_AFTER)
+
+
+def check_budget(server: FixtureServer, till: arrow.Arrow, since: arrow.Arrow, expected: dict):
+    """
+    Retries stop when the retry budget is used up, even if the request could be retried more times.
+    """
+    return _check_exhausted(server, since, max_retries=10, retry_budget=3, requests=4)
+
+
+def check_max_retries(server: FixtureServer, till: arrow.Arrow, since: arrow.Arrow, expected: dict):
+    """
+    Retries of one request stop after max_retries.
+    """
+    return _check_exhausted(server, since, max_retries=2, retry_budget=100, requests=3)
+
+
+def check_not_retried(server: FixtureServer, till: arrow.Arrow, since: arrow.Arrow, expected: dict):
+    """
+    Request for repository which doesn't exist fails with 404 without retries.
+    """
+    requests = server.requests
+    client = new_client()
+    try:
+        get_statistics.closed_issues(till, since, "missing", client=client)
+    except PagureRequestError as error:
+        if error.status_code != 404:
+            return "failed with status code {}".format(error.status_code)
+    else:
+        return "no error raised"
+    finally:
+        client.close()
+    if server.requests - requests != 1:
+        return "sent {} requests instead of 1".format(server.requests - requests)
+
+
+def check_cli(server: FixtureServer, till: arrow.Arrow, since: arrow.Arrow, expected: dict):
+    """
+    Command line client reports failed request as error instead of traceback.
+    """
+    # Import here, only this check needs the command line client
+    import pagure_api_scripts_cli
+
+    pagure_api_scripts_cli.cli.add_command(pagure_api_scripts_cli.closed_issues)
+    result = CliRunner().invoke(pagure_api_scripts_cli.cli, ["--rate", "0", "closed-issues", "missing"])
+    if result.exit_code != 1 or not isinstance(result.exception, SystemExit):
+        return "exited with {} and {!r}".format(result.exit_code, result.exception)
+    if "Error: Status code '404'" not in result.output:
+        return "unexpected output {!r}".format(result.output)
+
+
+def _check_exhausted(server: FixtureServer, since: arrow.Arrow, max_retries: int, retry_budget: int, requests: int):
+    """
+    Request failing every time raises error after the expected number of requests.
+    """
+    server.failure_rate = 1
+    server.failure_codes = (503,)
+    start = server.requests
+    client = new_client(max_retries=max_retries, retry_budget=retry_budget)
+    try:
+        get_statistics.get_page(get_statistics.issues_url("fixture", since.int_timestamp), client=client)
+    except PagureRequestError as error:
+        if error.status_code != 503:
+            return "failed with status code {}".format(error.status_code)
+    else:
+        return "no error raised"
+    finally:
+        client.close()
+        server.failure_rate = 0
+        server.failure_codes = FAILURE_CODES
+    if server.requests - start != requests:
+        return "sent {} requests instead of {}".format(server.requests - start, requests)
+
+
+CHECKS = [check_retries, check_retry_after, check_budget, check_max_retries, check_not_retried, check_cli]
+
+
+@click.command()
+@click.option("--issues", default=2000, help="Number of synthetic issues in the repository.")
+@click.option("--days-ago", default=180, help="Length of the window in days.")
+def main(issues: int, days_ago: int):
+    """
+    Run all the checks and exit with status 1 if any of them failed.
+    """
+    now = int(time.time())
+    till = arrow.get(now)
+    since = till.shift(days=-days_ago)
+    failed = []
+    with FixtureServer({"fixture": synthetic_issues(issues, now)}) as server:
+        get_statistics.PAGURE_URL = server.url
+        client = new_client()
+        expected = get_statistics.open_and_closed_issues(till, since, "fixture", client=client)
+        client.close()
+
+        for check in CHECKS:
+            error = check(server, till, since, expected)
+            if error:
+                failed.append(check.__name__)
+                click.echo("{:20} FAILED: {}".format(check.__name__, error))
+            else:
+                click.echo("{:20} ok".format(check.__name__))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
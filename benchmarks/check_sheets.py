@@ -0,0 +1,372 @@
+"""
+Check of the Google Spreadsheet update against fake Sheets service.
+
+The fake service applies `spreadsheets.batchUpdate` requests to in-memory grid
+the same way Google Sheets does, every batch is applied whole or rejected
+by 400 status code. The sheet rendered from the sample data is compared with
+`expected_sheet.json`, cells, formats and merges rendered from the same data
+by the original implementation, and the new sheet is checked to be created
+even if its random id is already used by another sheet.
+
+Usage: python benchmarks/check_sheets.py
+"""
+import contextlib
+import copy
+import io
+import json
+import os
+import random
+import sys
+
+import arrow
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Sheet rendered from `SAMPLE_DATA` by the original implementation
+EXPECTED_SHEET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "expected_sheet.json")
+
+# Data of two repositories, which contain all the blocks of the sheet
+SAMPLE_DATA = {
+    "since": arrow.get(2023, 10, 1),
+    "till": arrow.get(2023, 10, 8),
+    "repositories": {
+        "fedora-infrastructure": {
+            "Opened issues": 98,
+            "Closed issues": {
+                "total": 66,
+                "closed": 66,
+                "maximum_ttc": 89,
+                "minimum_ttc": 0,
+                "average_ttc": 45.74242424242424,
+                "median_ttc": 45.0,
+                "resolution": {
+                    "Fixed with Explanation": 8,
+                    "It's all good": 8,
+                    "Fixed": 13,
+                    "Invalid": 14,
+                    "Duplicate": 11,
+                    "Upstream": 12,
+                },
+                "gain": {"no_tag": 33, "low-gain": 11, "medium-gain": 11, "high-gain": 11},
+                "trouble": {"no_tag": 31, "low-trouble": 12, "medium-trouble": 11, "high-trouble": 12},
+                "ops": 16,
+                "dev": 16,
+            },
+        },
+        "fedora-infra/releng": {
+            "Opened issues": 3,
+            "Closed issues": {
+                "total": 5,
+                "closed": 5,
+                "maximum_ttc": 12,
+                "minimum_ttc": 1,
+                "average_ttc": 4.4,
+                "median_ttc": 3,
+                "resolution": {
+                    "Spam": 1,
+                    "Fixed": 2,
+                    "Unknown resolution": 1,
+                    "Get back later": 1,
+                },
+                "gain": {"no_tag": 5, "low-gain": 0, "medium-gain": 0, "high-gain": 0},
+                "trouble": {"no_tag": 4, "low-trouble": 1, "medium-trouble": 0, "high-trouble": 0},
+                "ops": 0,
+                "dev": 5,
+            },
+        },
+    },
+}
+
+# Fields written by `updateCells` with "*"
+ALL_FIELDS = ("userEnteredValue", "userEnteredFormat")
+
+
+class FakeRequest:
+    """
+    Request of the fake service, the callback is called when the request is executed.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def execute(self):
+        return self.callback()
+
+
+class FakeSheets:
+    """
+    Fake Sheets service with one spreadsheet.
+
+    Attributes:
+      sheets: Dictionary with sheet id as key and sheet as value, sheet is dictionary
+        with "title", "cells" ((row, column) as key and cell data as value), "merges"
+        and "resized"
+      batches: Number of executed `batchUpdate` requests, including the rejected ones
+    """
+
+    def __init__(self, sheets: dict):
+        """
+        Create spreadsheet with empty sheets.
+
+        Params:
+          sheets: Dictionary with sheet id as key and title as value
+        """
+        self.sheets = {
+            sheet_id: {"title": title, "cells": {}, "merges": [], "resized": False}
+            for sheet_id, title in sheets.items()
+        }
+        self.batches = 0
+
+    def spreadsheets(self):
+        return self
+
+    def get(self, spreadsheetId: str, fields: str = None):
+        return FakeRequest(
+            lambda: {"sheets": [{"properties": {"sheetId": sheet_id}} for sheet_id in self.sheets]}
+        )
+
+    def batchUpdate(self, spreadsheetId: str, body: dict):
+        return FakeRequest(lambda: self._batch_update(body))
+
+    def _batch_update(self, body: dict) -> dict:
+        """
+        Apply all the requests or none of them.
+        """
+        self.batches = self.batches + 1
+        sheets = copy.deepcopy(self.sheets)
+        replies = []
+        for request in body["requests"]:
+            kind, params = next(iter(request.items()))
+            replies.append(getattr(self, "_" + kind)(sheets, params))
+        self.sheets = sheets
+        return {"replies": replies}
+
+    def _addSheet(self, sheets: dict, params: dict) -> dict:
+        properties = dict(params["properties"])
+        if "sheetId" not in properties:
+            properties["sheetId"] = max(sheets) + 1
+        if properties["sheetId"] in sheets:
+            _reject("Sheet with id {} already exists.".format(properties["sheetId"]))
+        if any(sheet["title"] == properties["title"] for sheet in sheets.values()):
+            _reject("Sheet with name \"{}\" already exists.".format(properties["title"]))
+        sheets[properties["sheetId"]] = {"title": properties["title"], "cells": {}, "merges": [], "resized": False}
+        return {"addSheet": {"properties": properties}}
+
+    def _updateCells(self, sheets: dict, params: dict) -> dict:
+        rows = params["rows"]
+        if "range" in params:
+            sheet, top, left, bottom, right = _grid(sheets, params["range"])
+        else:
+            sheet = _sheet(sheets, params["start"]["sheetId"])
+            top = params["start"].get("rowIndex", 0)
+            left = params["start"].get("columnIndex", 0)
+            bottom = top + len(rows)
+            right = left + max(len(row.get("values", [])) for row in rows)
+        fields = ALL_FIELDS if params["fields"] == "*" else params["fields"].split(",")
+        for row in range(top, bottom):
+            values = rows[row - top].get("values", []) if row - top < len(rows) else []
+            for column in range(left, right):
+                data = values[column - left] if column - left < len(values) else {}
+                _write(sheet, row, column, data, fields)
+        return {}
+
+    def _repeatCell(self, sheets: dict, params: dict) -> dict:
+        sheet, top, left, bottom, right = _grid(sheets, params["range"])
+        for row in range(top, bottom):
+            for column in range(left, right):
+                _write(sheet, row, column, params["cell"], params["fields"].split(","))
+        return {}
+
+    def _mergeCells(self, sheets: dict, params: dict) -> dict:
+        sheet, top, left, bottom, right = _grid(sheets, params["range"])
+        sheet["merges"].append([top, left, bottom, right])
+        return {}
+
+    def _autoResizeDimensions(self, sheets: dict, params: dict) -> dict:
+        _sheet(sheets, params["dimensions"]["sheetId"])["resized"] = True
+        return {}
+
+    def render(self, sheet_id: int) -> dict:
+        """
+        Render the sheet to JSON serializable dictionary independent of the order of the requests.
+        """
+        sheet = self.sheets[sheet_id]
+        return {
+            "title": sheet["title"],
+            "cells": [
+                [row, column, data]
+                for (row, column), data in sorted(sheet["cells"].items())
+                if data
+            ],
+            "merges": sorted(sheet["merges"]),
+            "resized": sheet["resized"],
+        }
+
+
+def _reject(message: str):
+    """
+    Raise the error returned by Sheets API for invalid request.
+    """
+    # Import here, google libraries are optional
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    content = json.dumps({"error": {"code": 400, "message": "Invalid requests: " + message}})
+    raise HttpError(httplib2.Response({"status": 400}), content.encode("utf-8"))
+
+
+def _sheet(sheets: dict, sheet_id: int) -> dict:
+    """
+    Return the sheet, missing sheet is rejected.
+    """
+    if sheet_id not in sheets:
+        _reject("No grid with id: {}".format(sheet_id))
+    return sheets[sheet_id]
+
+
+def _grid(sheets: dict, grid_range: dict) -> tuple:
+    """
+    Return the sheet and top, left, bottom and right index of `GridRange`.
+    """
+    return (
+        _sheet(sheets, grid_range["sheetId"]),
+        grid_range["startRowIndex"], grid_range["startColumnIndex"],
+        grid_range["endRowIndex"], grid_range["endColumnIndex"],
+    )
+
+
+def _write(sheet: dict, row: int, column: int, data: dict, fields):
+    """
+    Write the fields of cell data to the cell, fields missing in data are cleared.
+    """
+    cell = sheet["cells"].setdefault((row, column), {})
+    for field in fields:
+        if field in data:
+            cell[field] = data[field]
+        else:
+            cell.pop(field, None)
+
+
+def add_sheet(google_docs, service: FakeSheets) -> str:
+    """
+    Add the sheet with sample data by the fake service.
+
+    Returns:
+      Output printed by `add_new_sheet`.
+    """
+    google_docs.get_service = lambda: service
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        google_docs.add_new_sheet(SAMPLE_DATA, "spreadsheet")
+    return output.getvalue()
+
+
+def new_sheet(service: FakeSheets, existing: dict):
+    """
+    Return id of the sheet added to the service, None if there is none.
+    """
+    added = [sheet_id for sheet_id in service.sheets if sheet_id not in existing]
+    return added[0] if added else None
+
+
+def check_grid(google_docs, expected: dict):
+    """
+    Sheet rendered from the sample data matches the expected sheet.
+    """
+    existing = {0: "Sheet1"}
+    service = FakeSheets(existing)
+    output = add_sheet(google_docs, service)
+    sheet_id = new_sheet(service, existing)
+    if sheet_id is None:
+        return "sheet not added, {!r}".format(output)
+    if service.batches != 1:
+        return "sent {} batches instead of 1".format(service.batches)
+    return _compare(service.render(sheet_id), expected)
+
+
+def check_id_collision(google_docs, expected: dict):
+    """
+    Sheet is added with another id when its random id is already used.
+    """
+    random.seed(1)
+    taken = google_docs.sheet_id()
+    random.seed(1)
+    existing = {0: "Sheet1", taken: "Used id"}
+    service = FakeSheets(existing)
+    output = add_sheet(google_docs, service)
+    sheet_id = new_sheet(service, existing)
+    if sheet_id is None:
+        return "sheet not added, {!r}".format(output)
+    if service.batches != 2:
+        return "sent {} batches instead of 2".format(service.batches)
+    if service.render(taken)["cells"]:
+        return "sheet with the same id was changed"
+    return _compare(service.render(sheet_id), expected)
+
+
+def check_title_collision(google_docs, expected: dict):
+    """
+    Sheet with the same title is reported without retries.
+    """
+    existing = {0: expected["title"]}
+    service = FakeSheets(existing)
+    output = add_sheet(google_docs, service)
+    if new_sheet(service, existing) is not None or service.sheets[0]["cells"]:
+        return "spreadsheet was changed"
+    if service.batches != 1:
+        return "sent {} batches instead of 1".format(service.batches)
+    if "already exists" not in output:
+        return "unexpected output {!r}".format(output)
+
+
+def _compare(rendered: dict, expected: dict):
+    """
+    Describe the first difference between the rendered and expected sheet.
+    """
+    rendered = json.loads(json.dumps(rendered))
+    for key in ("title", "merges", "resized"):
+        if rendered[key] != expected[key]:
+            return "{} differ: {!r} != {!r}".format(key, rendered[key], expected[key])
+    cells = {(row, column): data for row, column, data in rendered["cells"]}
+    expected_cells = {(row, column): data for row, column, data in expected["cells"]}
+    for position in sorted(set(cells) | set(expected_cells)):
+        if cells.get(position) != expected_cells.get(position):
+            return "cell {} differs: {!r} != {!r}".format(
+                position, cells.get(position), expected_cells.get(position)
+            )
+
+
+CHECKS = [check_grid, check_id_collision, check_title_collision]
+
+
+@click.command()
+def main():
+    """
+    Run all the checks and exit with status 1 if any of them failed.
+    """
+    try:
+        # Import here, google libraries are optional
+        from pagure_api_scripts import google_docs
+    except ImportError:
+        click.echo("Google libraries are not installed, install them by `pip install -r requirements`")
+        sys.exit(1)
+
+    with open(EXPECTED_SHEET) as expected_file:
+        expected = json.load(expected_file)
+
+    failed = []
+    for check in CHECKS:
+        error = check(google_docs, expected)
+        if error:
+            failed.append(check.__name__)
+            click.echo("{:22} FAILED: {}".format(check.__name__, error))
+        else:
+            click.echo("{:22} ok".format(check.__name__))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
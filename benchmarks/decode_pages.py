@@ -0,0 +1,140 @@
+"""
+Benchmark of decoding the pages of issues by the installed JSON backends.
+
+Generates pages resembling the pages returned by pagure API, with issue
+content, comments and user objects, and measures how long it takes to decode
+them and to parse them into records by every installed backend.
+
+Usage: python benchmarks/decode_pages.py --pages 50 --repeat 5
+"""
+import json
+import os
+import random
+import sys
+import timeit
+
+import arrow
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pagure_api_scripts import page_decoder  # noqa: E402
+from pagure_api_scripts.get_statistics import PER_PAGE, parse_page  # noqa: E402
+
+TAGS = ["low-gain", "medium-gain", "high-gain", "low-trouble", "medium-trouble", "high-trouble", "ops", "dev"]
+
+
+def user(name: str) -> dict:
+    """
+    Create user object as returned by pagure API.
+    """
+    return {"name": name, "fullname": name.title() + " User", "url_path": "user/" + name}
+
+
+def generate_page(number: int, pages: int, now: int) -> bytes:
+    """
+    Create one page of issues as returned by pagure API.
+
+    Params:
+      number: Number of the page
+      pages: Number of all pages
+      now: Timestamp of the newest issue
+
+    Returns:
+      JSON encoded page.
+    """
+    issues = []
+    for index in range(PER_PAGE):
+        created = now - random.randint(0, 365 * 86400)
+        closed = created + random.randint(0, 90 * 86400) if random.random() < 0.7 else None
+        issues.append({
+            "id": (pages - number) * PER_PAGE + index,
+            "title": "Issue title " * 5,
+            "content": "Description of the issue. " * 40,
+            "status": "Closed" if closed else "Open",
+            "close_status": random.choice(["Fixed", "Invalid", "Duplicate"]) if closed else None,
+            "date_created": str(created),
+            "closed_at": str(closed) if closed else None,
+            "last_updated": str(closed or created),
+            "tags": random.sample(TAGS, random.randint(0, 4)),
+            "milestone": None,
+            "priority": None,
+            "private": False,
+            "blocks": [],
+            "depends": [],
+            "custom_fields": [],
+            "related_prs": [],
+            "user": user("reporter"),
+            "assignee": user("assignee") if random.random() < 0.5 else None,
+            "closed_by": user("closer") if closed else None,
+            "comments": [
+                {
+                    "id": comment,
+                    "comment": "Comment on the issue. " * 20,
+                    "date_created": str(created + comment * 3600),
+                    "edited_on": None,
+                    "editor": None,
+                    "notification": False,
+                    "parent": None,
+                    "reactions": {},
+                    "user": user("commenter"),
+                }
+                for comment in range(random.randint(0, 6))
+            ],
+        })
+    return json.dumps({
+        "args": {"status": "all", "page": number, "per_page": PER_PAGE},
+        "issues": issues,
+        "pagination": {
+            "first": "first",
+            "last": "last",
+            "next": "next" if number < pages else None,
+            "page": number,
+            "pages": pages,
+            "per_page": PER_PAGE,
+            "prev": None,
+        },
+        "total_issues": pages * PER_PAGE,
+    }).encode()
+
+
+@click.command()
+@click.option("--pages", default=50, help="How many pages to generate.")
+@click.option("--repeat", default=5, help="How many times to repeat the measurement, the best time is reported.")
+def main(pages: int, repeat: int):
+    """
+    Measure decoding of the pages by every installed backend.
+    """
+    random.seed(0)
+    now = arrow.utcnow().int_timestamp
+    contents = [generate_page(number, pages, now) for number in range(1, pages + 1)]
+    till = arrow.get(now)
+    since = till.shift(days=-30)
+
+    click.echo("{} pages, {:.1f} MB of JSON".format(pages, sum(map(len, contents)) / 1e6))
+    backends = ["json"]
+    if page_decoder.orjson is not None:
+        backends.append("orjson")
+    if page_decoder.msgspec is not None:
+        backends.append("msgspec")
+
+    baseline = None
+    for backend in backends:
+        decode = min(timeit.repeat(
+            lambda: [page_decoder.decode_page(content, backend) for content in contents],
+            number=1, repeat=repeat
+        ))
+        parse = min(timeit.repeat(
+            lambda: [
+                parse_page(page_decoder.decode_page(content, backend), till, since)
+                for content in contents
+            ],
+            number=1, repeat=repeat
+        ))
+        baseline = baseline or decode
+        click.echo("{:8} decode {:7.1f} ms ({:4.1f}x)  decode and parse {:7.1f} ms".format(
+            backend, decode * 1000, baseline / decode, parse * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Local stub of the pagure API used by the benchmarks.
+
+Serves paginated `/api/0/<repo>/issues` responses from synthetic issues or from
+issues recorded from real pagure, with configurable latency and page size.
+Supports `status`, `since`, `page` and `per_page` parameters the same way pagure does.
+Failures could be injected, the server then answers some of the requests with error
+status codes, optionally with `Retry-After` header, to exercise the retries.
+With `etag` every page is sent with `ETag` header and conditional requests for pages
+which didn't change are answered by `304 Not Modified`, to exercise the response cache.
+
+Usage:
+  python benchmarks/fixture_server.py serve --issues 5000 --latency 0.05
+  python benchmarks/fixture_server.py record fedora-infra recorded.json
+  python benchmarks/fixture_server.py serve --recorded recorded.json
+  python benchmarks/fixture_server.py serve --failure-rate 0.2 --retry-after 1
+  python benchmarks/fixture_server.py serve --etag
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import click
+import requests
+
+# Default number of issues on one page, same as pagure
+DEFAULT_PER_PAGE = 20
+
+# Maximum number of issues on one page, same as pagure
+MAX_PER_PAGE = 100
+
+TAGS = ["low-gain", "medium-gain", "high-gain", "low-trouble", "medium-trouble", "high-trouble", "ops", "dev"]
+
+# Status codes of injected failures
+FAILURE_CODES = (429, 500, 503)
+
+RESOLUTIONS = ["Fixed", "Invalid", "Duplicate", "Insufficient data", "Upstream", "Fixed with Explanation"]
+
+
+def user(name: str) -> dict:
+    """
+    Create user object as returned by pagure API.
+    """
+    return {"name": name, "fullname": name.title() + " User", "url_path": "user/" + name}
+
+
+def synthetic_issues(
+        count: int, now: int, days: int = 365, comments: int = 3, content_size: int = 1000,
+        seed: int = 0
+):
+    """
+    Create issues resembling the issues returned by pagure API.
+
+    Params:
+      count: Number of issues
+      now: Timestamp of the newest issue
+      days: Issues are created in this many days before now. Default: 365
+      comments: Maximum number of comments of one issue. Default: 3
+      content_size: Size of the issue content and comments in characters. Default: 1000
+      seed: Seed of the random generator, same seed creates the same issues. Default: 0
+
+    Returns:
+      List of issues ordered from the newest, same as pagure does.
+    """
+    generator = random.Random(seed)
+    issues = []
+    for number in range(1, count + 1):
+        created = now - generator.randint(0, days * 86400)
+        closed = created + generator.randint(0, 90 * 86400)
+        if closed > now or generator.random() < 0.3:
+            closed = None
+        updated = min(max(created, closed or 0) + generator.randint(0, 5 * 86400), now)
+        issues.append({
+            "id": number,
+            "title": "Issue title " * 5,
+            "content": ("x" * content_size),
+            "status": "Closed" if closed else "Open",
+            "close_status": generator.choice(RESOLUTIONS) if closed else None,
+            "date_created": str(created),
+            "closed_at": str(closed) if closed else None,
+            "last_updated": str(updated),
+            "tags": generator.sample(TAGS, generator.randint(0, 4)),
+            "milestone": None,
+            "priority": None,
+            "private": False,
+            "blocks": [],
+            "depends": [],
+            "custom_fields": [],
+            "related_prs": [],
+            "user": user("reporter"),
+            "assignee": user("assignee") if generator.random() < 0.5 else None,
+            "closed_by": user("closer") if closed else None,
+            "comments": [
+                {
+                    "id": comment,
+                    "comment": "y" * content_size,
+                    "date_created": str(created + comment * 3600),
+                    "edited_on": None,
+                    "editor": None,
+                    "notification": False,
+                    "parent": None,
+                    "reactions": {},
+                    "user": user("commenter"),
+                }
+                for comment in range(generator.randint(0, comments))
+            ],
+        })
+    issues.sort(key=lambda issue: int(issue["date_created"]), reverse=True)
+    return issues
+
+
+def render_page(issues: list, page: int, per_page: int, url: str, args: dict) -> bytes:
+    """
+    Create the page of issues as returned by pagure API.
+
+    Params:
+      issues: All issues matching the request
+      page: Number of the page
+      per_page: Number of issues on one page
+      url: Url of the request without parameters
+      args: Parameters of the request
+
+    Returns:
+      JSON encoded page.
+    """
+    pages = max(1, (len(issues) + per_page - 1) // per_page)
+
+    def page_url(number):
+        return url + "?" + urlencode(dict(args, page=number, per_page=per_page))
+
+    return json.dumps({
+        "args": dict(args, page=page, per_page=per_page),
+        "issues": issues[(page - 1) * per_page:page * per_page],
+        "pagination": {
+            "first": page_url(1),
+            "last": page_url(pages),
+            "next": page_url(page + 1) if page < pages else None,
+            "page": page,
+            "pages": pages,
+            "per_page": per_page,
+            "prev": page_url(page - 1) if page > 1 else None,
+        },
+        "total_issues": len(issues),
+    }).encode()
+
+
+class FixtureServer:
+    """
+    Stub pagure API running in background thread.
+
+    Attributes:
+      repositories: Dictionary with repository as key and list of issues as value
+      latency: Delay of every response in seconds
+      failure_rate: Probability that the request is answered by injected failure
+      fail_first: Number of the next requests, which are answered by injected failure
+      failure_codes: Status codes of injected failures, one is chosen at random for every failure
+      retry_after: Value of `Retry-After` header sent with injected failures, None doesn't send it
+      etag: Send `ETag` header and answer conditional requests for unchanged pages by 304
+      requests: Number of requests served
+      failures: Number of injected failures served
+      not_modified: Number of requests answered by 304
+      url: Url of the server, use it instead of `get_statistics.PAGURE_URL`
+    """
+
+    def __init__(
+            self, repositories: dict, latency: float = 0, host: str = "127.0.0.1", port: int = 0,
+            failure_rate: float = 0, fail_first: int = 0, failure_codes: tuple = FAILURE_CODES,
+            retry_after: str = None, etag: bool = False, seed: int = 0
+    ):
+        """
+        Create the server, it's not started yet.
+
+        Params:
+          repositories: Dictionary with repository as key and list of issues as value
+          latency: Delay of every response in seconds. Default: 0
+          host: Address to listen on. Default: "127.0.0.1"
+          port: Port to listen on. Default 0 will use any free port.
+          failure_rate: Probability that the request is answered by injected failure. Default: 0
+          fail_first: Number of the next requests answered by injected failure. Default: 0
+          failure_codes: Status codes of injected failures. Default: `FAILURE_CODES`
+          retry_after: Value of `Retry-After` header sent with injected failures.
+                       Default None doesn't send the header.
+          etag: Send `ETag` header and answer conditional requests for unchanged pages
+                by `304 Not Modified`. Default: False
+          seed: Seed of the random generator deciding the failures. Default: 0
+        """
+        self.repositories = repositories
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_first = fail_first
+        self.failure_codes = failure_codes
+        self.retry_after = retry_after
+        self.etag = etag
+        self.requests = 0
+        self.failures = 0
+        self.not_modified = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = "http://{}:{}/".format(host, self._server.server_port)
+
+    def start(self):
+        """
+        Start serving in background thread.
+
+        Returns:
+          This server.
+        """
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def issues(self, repository: str, status: str, since: int):
+        """
+        Return the issues matching the request.
+
+        Params:
+          repository: Repository namespace
+          status: Status of the issues, "all" for every issue
+          since: Only issues updated since this timestamp are returned
+
+        Returns:
+          List of issues or None if the repository doesn't exist.
+        """
+        issues = self.repositories.get(repository)
+        if issues is None:
+            return None
+        return [
+            issue for issue in issues
+            if int(issue["last_updated"]) >= since
+            and (status.lower() == "all" or issue["status"].lower() == status.lower())
+        ]
+
+    def failure(self):
+        """
+        Decide whether the request is answered by injected failure.
+
+        Returns:
+          Status code of the failure or None if the request should be served.
+        """
+        with self._lock:
+            if self.fail_first > 0:
+                self.fail_first = self.fail_first - 1
+            elif not self.failure_rate or self._random.random() >= self.failure_rate:
+                return None
+            self.failures = self.failures + 1
+            return self._random.choice(self.failure_codes)
+
+    def _handler(self):
+        """
+        Create request handler class bound to this server.
+        """
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with fixture._lock:
+                    fixture.requests = fixture.requests + 1
+                if fixture.latency:
+                    time.sleep(fixture.latency)
+
+                status_code = fixture.failure()
+                if status_code is not None:
+                    self.send_response(status_code)
+                    if fixture.retry_after is not None:
+                        self.send_header("Retry-After", fixture.retry_after)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                parsed = urlparse(self.path)
+                args = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                body = None
+                if parsed.path.startswith("/api/0/") and parsed.path.endswith("/issues"):
+                    repository = parsed.path[len("/api/0/"):-len("/issues")]
+                    issues = fixture.issues(
+                        repository, args.get("status", "Open"), int(args.get("since", 0))
+                    )
+                    if issues is not None:
+                        page = int(args.pop("page", 1))
+                        per_page = min(int(args.pop("per_page", DEFAULT_PER_PAGE)), MAX_PER_PAGE)
+                        url = "http://{}:{}{}".format(*self.server.server_address[:2], parsed.path)
+                        body = render_page(issues, page, per_page, url, args)
+
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                etag = None
+                if fixture.etag:
+                    etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+                    if self.headers.get("If-None-Match") == etag:
+                        with fixture._lock:
+                            fixture.not_modified = fixture.not_modified + 1
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                self.send_response(200)
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def load_recorded(path: str) -> dict:
+    """
+    Load issues recorded by `record`.
+
+    Params:
+      path: Path to the recorded file
+
+    Returns:
+      Dictionary with repository as key and list of issues as value.
+    """
+    with open(path) as recorded:
+        return json.load(recorded)
+
+
+@click.group()
+def cli():
+    """
+    Stub pagure API for benchmarks.
+    """
+
+
+@cli.command()
+@click.option("--issues", default=5000, help="Number of synthetic issues in every repository.")
+@click.option("--comments", default=3, help="Maximum number of comments of synthetic issue.")
+@click.option("--content-size", default=1000, help="Size of the content of synthetic issue in characters.")
+@click.option("--recorded", default=None, help="Serve issues recorded by the record command instead of synthetic issues.")
+@click.option("--latency", default=0.0, help="Delay of every response in seconds.")
+@click.option("--port", default=8080, help="Port to listen on.")
+@click.option("--failure-rate", default=0.0, help="Probability that the request is answered by error status code.")
+@click.option("--retry-after", default=None, help="Value of Retry-After header sent with the errors.")
+@click.option("--etag", is_flag=True, help="Send ETag header and answer conditional requests by 304.")
+@click.argument("repositories", nargs=-1)
+def serve(
+        issues: int, comments: int, content_size: int, recorded: str, latency: float, port: int,
+        failure_rate: float, retry_after: str, etag: bool, repositories: tuple
+):
+    """
+    Serve the issues until interrupted.
+    """
+    if recorded:
+        data = load_recorded(recorded)
+    else:
+        now = int(time.time())
+        data = {
+            repository: synthetic_issues(issues, now, comments=comments, content_size=content_size, seed=index)
+            for index, repository in enumerate(repositories or ("fixture",))
+        }
+    server = FixtureServer(
+        data, latency=latency, port=port, failure_rate=failure_rate, retry_after=retry_after,
+        etag=etag
+    )
+    click.echo("Serving {} at {}".format(", ".join(data), server.url))
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+@cli.command()
+@click.option("--url", default="https://pagure.io/", help="Url of pagure to record from.")
+@click.argument("repository")
+@click.argument("path")
+def record(url: str, repository: str, path: str):
+    """
+    Record all the issues of the repository from pagure into file.
+    """
+    issues = []
+    next_page = "{}api/0/{}/issues?status=all&per_page={}".format(url, repository, MAX_PER_PAGE)
+    while next_page:
+        response = requests.get(next_page, timeout=60)
+        response.raise_for_status()
+        page = response.json()
+        issues.extend(page["issues"])
+        next_page = page["pagination"]["next"]
+        click.echo("Recorded {} issues".format(len(issues)))
+
+    data = load_recorded(path) if _exists(path) else {}
+    data[repository] = issues
+    with open(path, "w") as recorded:
+        json.dump(data, recorded)
+
+
+def _exists(path: str) -> bool:
+    """
+    Check if the file exists.
+    """
+    try:
+        open(path).close()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    cli()
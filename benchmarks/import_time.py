@@ -0,0 +1,130 @@
+"""
+Import time benchmark of the command line client.
+
+Imports the module in fresh interpreter with `python -X importtime` `--rounds` times
+and reports the minimum and median import time and the slowest imported packages.
+Results are appended to the same JSON history file as `run_benchmarks.py` and compared
+with the last run with the same parameters. Heavy optional dependencies, which only
+some commands need, must not be imported at startup, the run fails when they are.
+
+Usage: python benchmarks/import_time.py --rounds 10
+"""
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import DEFAULT_HISTORY, git_commit, load_history, previous_run  # noqa: E402
+
+# Root of the repository, the imported module is looked up there
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages which must not be imported when the command line client starts
+LAZY_PACKAGES = ["aiohttp", "google_auth_oauthlib", "googleapiclient", "numpy", "pyarrow", "pyinstrument"]
+
+
+def import_time(module: str) -> list:
+    """
+    Import the module in fresh interpreter and collect import time of every package.
+
+    Params:
+      module: Name of the module to import
+
+    Returns:
+      List of (package, self time, cumulative time, depth) tuples in the order
+      printed by `python -X importtime`, times are in seconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        capture_output=True, text=True, check=True, cwd=ROOT
+    )
+    packages = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        packages.append((name.strip(), int(self_time) / 1000000, int(cumulative) / 1000000, depth))
+    return packages
+
+
+@click.command()
+@click.option("--module", default="pagure_api_scripts_cli", help="Module to import.")
+@click.option("--rounds", default=10, help="How many times to import the module.")
+@click.option("--top", default=15, help="How many of the slowest packages to show.")
+@click.option("--history", "history_path", default=DEFAULT_HISTORY, help="JSON file with results of previous runs.")
+@click.option("--no-save", is_flag=True, help="Don't append the results to the history file.")
+@click.option("--threshold", default=0.1, help="Relative slowdown of median reported as regression.")
+@click.option("--fail-on-regression", is_flag=True, help="Exit with status 1 when the import is slower.")
+def main(
+        module: str, rounds: int, top: int, history_path: str, no_save: bool,
+        threshold: float, fail_on_regression: bool
+):
+    """
+    Measure the import time, compare it with the previous run and save it to history.
+    """
+    totals = []
+    for _ in range(rounds):
+        packages = import_time(module)
+        totals.append(next(cumulative for name, _, cumulative, _ in packages if name == module))
+
+    # Packages imported directly by the module in the last round, they are printed before it
+    direct = []
+    for package in packages:
+        if package[3] == 0:
+            if package[0] == module:
+                break
+            direct = []
+        elif package[3] == 1:
+            direct.append(package)
+    for name, _, cumulative, _ in sorted(direct, key=lambda package: -package[2])[:top]:
+        click.echo("  {:40} {:9.2f} ms".format(name, cumulative * 1000))
+
+    name = "import[{}]".format(module)
+    result = {"min": min(totals), "median": statistics.median(totals), "rounds": rounds}
+    parameters = {"import": module}
+    run = {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "parameters": parameters,
+        "results": {name: result},
+    }
+    history = load_history(history_path)
+    previous = previous_run(history, parameters)
+
+    line = "{:26} min {:9.2f} ms  median {:9.2f} ms".format(name, result["min"] * 1000, result["median"] * 1000)
+    regression = False
+    if previous and name in previous["results"]:
+        change = result["median"] / previous["results"][name]["median"] - 1
+        line = line + "  {:+6.1%} vs {}".format(change, previous["commit"])
+        if change > threshold:
+            regression = True
+            line = line + "  REGRESSION"
+    click.echo(line)
+
+    imported = {name.split(".")[0] for name, _, _, _ in packages}
+    eager = [package for package in LAZY_PACKAGES if package in imported]
+
+    if not no_save:
+        history.append(run)
+        with open(history_path, "w") as history_file:
+            json.dump(history, history_file, indent=2)
+        click.echo("Results saved to {}".format(history_path))
+
+    if eager:
+        click.echo("Imported at startup, but should be imported lazily: {}".format(", ".join(eager)))
+        sys.exit(1)
+    if regression and fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Benchmarks of pagure_api_scripts against the local stub of pagure API.
+
+Every case is run `--rounds` times and the minimum and median time is reported.
+Results are appended to JSON history file and compared with the last run
+with the same parameters, cases slower by more than `--threshold` are reported
+as regressions.
+
+Cases:
+  get_page_data: Retrieve and parse every page of the repository one by one
+  aggregate_stats: Aggregate already parsed closed issues
+  open_issues: Full open_issues flow, with 1 and 4 workers
+  closed_issues: Full closed_issues flow, with 1 and 4 workers
+  build_requests: Build requests for google spreadsheet with `--repositories` repositories
+
+Usage: python benchmarks/run_benchmarks.py --issues 5000 --latency 0.01 --rounds 5
+"""
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import arrow
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixture_server import FixtureServer, load_recorded, synthetic_issues  # noqa: E402
+from pagure_api_scripts import get_statistics, page_decoder  # noqa: E402
+from pagure_api_scripts.pagure_client import PagureClient  # noqa: E402
+from pagure_api_scripts.request_scheduler import RequestScheduler  # noqa: E402
+
+# Default history file, next to this script
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.json")
+
+
+def measure(function, rounds: int) -> dict:
+    """
+    Run the function repeatedly and measure it.
+
+    Params:
+      function: Function without arguments to measure
+      rounds: How many times to run the function
+
+    Returns:
+      Dictionary with minimum and median time in seconds.
+    """
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "rounds": rounds}
+
+
+def new_client() -> PagureClient:
+    """
+    Create client without rate limiting, the stub server doesn't need to be protected.
+    """
+    return PagureClient(scheduler=RequestScheduler(rate=0))
+
+
+def cases(repository: str, till: arrow.Arrow, since: arrow.Arrow, repositories: int):
+    """
+    Create the benchmark cases. `get_statistics.PAGURE_URL` must point to the stub server.
+
+    Params:
+      repository: Repository to retrieve the issues from
+      till: Till date for the issues
+      since: Since date for the issues
+      repositories: Number of repositories in the spreadsheet for build_requests
+
+    Returns:
+      Dictionary with name of the case as key and function without arguments as value.
+    """
+    client = new_client()
+    url = get_statistics.issues_url(repository, int(since.timestamp()), status="Closed")
+    pages = get_statistics.get_page(url, client=client)["pagination"]["pages"]
+    urls = [url + "&page=" + str(number) for number in range(1, pages + 1)]
+
+    def get_page_data():
+        for page_url in urls:
+            get_statistics.get_page_data(page_url, till, since, client=client)
+
+    records = []
+    for page_url in urls:
+        records.extend(get_statistics.get_page_data(page_url, till, since, client=client)["issues"])
+
+    def flow(function, workers):
+        return lambda: function(till, since, repository, workers=workers, client=client)
+
+    benchmarks = {
+        "get_page_data": get_page_data,
+        "aggregate_stats": lambda: get_statistics.aggregate_stats({"issues": records}),
+        "open_issues[workers=1]": flow(get_statistics.open_issues, 1),
+        "open_issues[workers=4]": flow(get_statistics.open_issues, 4),
+        "closed_issues[workers=1]": flow(get_statistics.closed_issues, 1),
+        "closed_issues[workers=4]": flow(get_statistics.closed_issues, 4),
+    }
+
+    try:
+        # Import here, google libraries are optional for the benchmarks
+        from pagure_api_scripts import google_docs
+    except ImportError:
+        click.echo("Skipping build_requests, google libraries are not installed")
+        return benchmarks
+
+    result = get_statistics.open_and_closed_issues(till, since, repository, client=client)
+    data = {"since": since, "till": till, "repositories": {}}
+    for number in range(repositories):
+        data["repositories"]["{}-{}".format(repository, number)] = {
+            "Opened issues": result["open"]["total"],
+            "Closed issues": result["closed"],
+        }
+    benchmarks["build_requests"] = lambda: google_docs.build_requests(data)
+    return benchmarks
+
+
+def git_commit() -> str:
+    """
+    Return the current git commit or None if not in git repository.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path: str) -> list:
+    """
+    Load previous runs from the history file.
+
+    Params:
+      path: Path to the history file
+
+    Returns:
+      List of runs, empty if the file doesn't exist.
+    """
+    try:
+        with open(path) as history:
+            return json.load(history)
+    except FileNotFoundError:
+        return []
+
+
+def previous_run(history: list, parameters: dict):
+    """
+    Find the last run with the same parameters.
+
+    Params:
+      history: List of runs
+      parameters: Parameters of the current run
+
+    Returns:
+      The run or None if there isn't any.
+    """
+    for run in reversed(history):
+        if run["parameters"] == parameters:
+            return run
+    return None
+
+
+@click.command()
+@click.option("--issues", default=2000, help="Number of synthetic issues in the repository.")
+@click.option("--comments", default=3, help="Maximum number of comments of synthetic issue.")
+@click.option("--content-size", default=1000, help="Size of the content of synthetic issue in characters.")
+@click.option("--recorded", default=None, help="Use issues recorded by `fixture_server.py record` instead of synthetic issues.")
+@click.option("--repository", default="fixture", help="Repository to use from the recorded file.")
+@click.option("--latency", default=0.0, help="Delay of every response of the stub server in seconds.")
+@click.option("--days-ago", default=90, help="Length of the window in days.")
+@click.option("--repositories", default=10, help="Number of repositories in the spreadsheet for build_requests.")
+@click.option("--rounds", default=5, help="How many times to run every case.")
+@click.option("--only", multiple=True, help="Run only cases starting with this name, could be repeated.")
+@click.option("--history", "history_path", default=DEFAULT_HISTORY, help="JSON file with results of previous runs.")
+@click.option("--no-save", is_flag=True, help="Don't append the results to the history file.")
+@click.option("--threshold", default=0.1, help="Relative slowdown of median reported as regression.")
+@click.option("--fail-on-regression", is_flag=True, help="Exit with status 1 when there is any regression.")
+def main(
+        issues: int, comments: int, content_size: int, recorded: str, repository: str,
+        latency: float, days_ago: int, repositories: int, rounds: int, only: tuple,
+        history_path: str, no_save: bool, threshold: float, fail_on_regression: bool
+):
+    """
+    Run the benchmarks, compare them with the previous run and save them to history.
+    """
+    if recorded:
+        data = load_recorded(recorded)
+        now = max(int(issue["last_updated"]) for issue in data[repository])
+    else:
+        now = int(time.time())
+        data = {repository: synthetic_issues(issues, now, comments=comments, content_size=content_size)}
+    till = arrow.get(now)
+    since = till.shift(days=-days_ago)
+
+    parameters = {
+        "issues": len(data[repository]),
+        "recorded": os.path.basename(recorded) if recorded else None,
+        "comments": comments,
+        "content_size": content_size,
+        "latency": latency,
+        "days_ago": days_ago,
+        "repositories": repositories,
+    }
+    run = {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "decoder": page_decoder.backend(),
+        "parameters": parameters,
+        "results": {},
+    }
+    history = load_history(history_path)
+    previous = previous_run(history, parameters)
+
+    regressions = []
+    with FixtureServer(data, latency=latency) as server:
+        get_statistics.PAGURE_URL = server.url
+        for name, function in cases(repository, till, since, repositories).items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            result = measure(function, rounds)
+            run["results"][name] = result
+
+            line = "{:26} min {:9.2f} ms  median {:9.2f} ms".format(
+                name, result["min"] * 1000, result["median"] * 1000)
+            if previous and name in previous["results"]:
+                change = result["median"] / previous["results"][name]["median"] - 1
+                line = line + "  {:+6.1%} vs {}".format(change, previous["commit"])
+                if change > threshold:
+                    regressions.append(name)
+                    line = line + "  REGRESSION"
+            click.echo(line)
+
+    if not no_save:
+        history.append(run)
+        with open(history_path, "w") as history_file:
+            json.dump(history, history_file, indent=2)
+        click.echo("Results saved to {}".format(history_path))
+
+    if regressions:
+        click.echo("Regressions: {}".format(", ".join(regressions)))
+        if fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Incremental aggregation of issue statistics used by pagure_api_scripts.
+
+The aggregator is filled one issue at a time and aggregators filled
+from different pages or repositories could be merged together without
+going through the issues again. Aggregators could be pickled and sent
+between processes.
+"""
+from pagure_api_scripts.issue_record import (
+    GAIN_NAMES, IssueRecord, TROUBLE_NAMES, resolution_code, resolution_name
+)
+from pagure_api_scripts.ttc_statistics import ttc_statistics_from_counts
+
+# Name used in time to close breakdown for closed issues without resolution
+NO_RESOLUTION = "no_resolution"
+
+
+class IssueAggregator:
+    """
+    Running statistics of the issues.
+
+    Time to close values are kept as counts of each value in days for each resolution,
+    which is enough to compute maximum, minimum, average and median exactly.
+
+    Attributes:
+      closed: Are we aggregating closed or open issues
+      total: Number of issues added
+      closed_count: Number of issues with resolution
+      resolution: Count of each resolution code in order of first appearance
+      gain: Count of each gain code
+      trouble: Count of each trouble code
+      ops: Number of issues with ops tag
+      dev: Number of issues with dev tag
+      time_to_close: Count of each resolution code and time to close value pair
+    """
+
+    def __init__(self, closed: bool = True):
+        """
+        Create empty aggregator.
+
+        Params:
+          closed: Should we aggregate closed or open issues. Default: True
+        """
+        self.closed = closed
+        self.total = 0
+        self.closed_count = 0
+        self.resolution = {}
+        self.gain = [0] * len(GAIN_NAMES)
+        self.trouble = [0] * len(TROUBLE_NAMES)
+        self.ops = 0
+        self.dev = 0
+        self.time_to_close = {}
+
+    def add(self, record: IssueRecord):
+        """
+        Add one issue to the statistics.
+
+        Params:
+          record: Record returned by `get_statistics.parse_issue`
+        """
+        self.total = self.total + 1
+
+        if self.closed:
+            # time to close
+            key = (record.resolution, record.time_to_close)
+            self.time_to_close[key] = self.time_to_close.get(key, 0) + 1
+
+        # resolution
+        # Skip the issues that are not closed
+        if record.resolution:
+            self.resolution[record.resolution] = self.resolution.get(record.resolution, 0) + 1
+            self.closed_count = self.closed_count + 1
+
+        self.gain[record.gain] = self.gain[record.gain] + 1
+        self.trouble[record.trouble] = self.trouble[record.trouble] + 1
+
+        # ops
+        if record.ops:
+            self.ops = self.ops + 1
+
+        # dev
+        if record.dev:
+            self.dev = self.dev + 1
+
+    def merge(self, other: "IssueAggregator"):
+        """
+        Add statistics from other aggregator to this one.
+
+        The result is the same as if the issues added to other aggregator
+        were added to this one after its own issues.
+
+        Params:
+          other: Aggregator to merge
+
+        Returns:
+          This aggregator.
+        """
+        self.total = self.total + other.total
+        self.closed_count = self.closed_count + other.closed_count
+        self.ops = self.ops + other.ops
+        self.dev = self.dev + other.dev
+        self.gain = [mine + theirs for mine, theirs in zip(self.gain, other.gain)]
+        self.trouble = [mine + theirs for mine, theirs in zip(self.trouble, other.trouble)]
+        for mine, theirs in (
+                (self.resolution, other.resolution),
+                (self.time_to_close, other.time_to_close),
+        ):
+            for key, value in theirs.items():
+                mine[key] = mine.get(key, 0) + value
+
+        return self
+
+    def __getstate__(self):
+        """
+        Return the state for pickling.
+
+        Resolution codes are only valid in the process which created them,
+        so they are replaced by resolution names.
+        """
+        state = self.__dict__.copy()
+        state["resolution"] = [
+            (resolution_name(code), count) for code, count in self.resolution.items()
+        ]
+        state["time_to_close"] = [
+            (resolution_name(code), value, count)
+            for (code, value), count in self.time_to_close.items()
+        ]
+        return state
+
+    def __setstate__(self, state: dict):
+        """
+        Restore the pickled state, resolution names are replaced by codes of this process.
+        """
+        state["resolution"] = {
+            resolution_code(name): count for name, count in state["resolution"]
+        }
+        state["time_to_close"] = {
+            (resolution_code(name), value): count for name, value, count in state["time_to_close"]
+        }
+        self.__dict__.update(state)
+
+    def result(self):
+        """
+        Return the aggregated statistics.
+
+        Returns:
+          Dict with statistics. See `get_statistics.aggregate_stats` for the example.
+        """
+        aggregated_data = {
+            "total": self.total,
+            "closed": self.closed_count,
+            "maximum_ttc": 0,
+            "minimum_ttc": 0,
+            "average_ttc": 0,
+            "median_ttc": 0,
+            "resolution": {
+                resolution_name(code): count for code, count in self.resolution.items()
+            },
+            "gain": dict(zip(GAIN_NAMES, self.gain)),
+            "trouble": dict(zip(TROUBLE_NAMES, self.trouble)),
+            "ops": self.ops,
+            "dev": self.dev,
+        }
+
+        if self.closed and self.time_to_close:
+            time_to_close = {}
+            for (_, value), count in self.time_to_close.items():
+                time_to_close[value] = time_to_close.get(value, 0) + count
+            values = sorted(time_to_close)
+            count = sum(time_to_close.values())
+            aggregated_data["maximum_ttc"] = values[-1]
+            aggregated_data["minimum_ttc"] = values[0]
+            aggregated_data["average_ttc"] = sum(
+                value * time_to_close[value] for value in values
+            ) / count
+            aggregated_data["median_ttc"] = self._median(time_to_close, values, count)
+            aggregated_data.update(self._ttc_statistics())
+
+        return aggregated_data
+
+    def _ttc_statistics(self):
+        """
+        Compute percentiles, histogram and per resolution breakdown of time to close.
+
+        Returns:
+          Output of `ttc_statistics.ttc_statistics_from_counts`.
+        """
+        counts = {}
+        # Keep resolutions in the same order as in resolution counts
+        rank = {code: index for index, code in enumerate(self.resolution)}
+        for (code, value), count in sorted(
+                self.time_to_close.items(), key=lambda item: rank.get(item[0][0], len(rank))
+        ):
+            group = counts.setdefault(resolution_name(code) or NO_RESOLUTION, {})
+            group[value] = group.get(value, 0) + count
+
+        return ttc_statistics_from_counts(counts)
+
+    def _median(self, time_to_close: dict, values: list, count: int):
+        """
+        Compute median the same way as `statistics.median` does.
+
+        Params:
+          time_to_close: Count of each time to close value
+          values: Sorted time to close values
+          count: Number of time to close values including repeated ones
+
+        Returns:
+          Median of time to close.
+        """
+        lower = None
+        seen = 0
+        for value in values:
+            seen = seen + time_to_close[value]
+            # Middle element for odd count
+            if count % 2 == 1 and seen > count // 2:
+                return value
+            # Two middle elements for even count
+            if count % 2 == 0:
+                if lower is None and seen >= count // 2:
+                    lower = value
+                if seen > count // 2:
+                    return (lower + value) / 2
@@ -0,0 +1,216 @@
+"""
+Asynchronous engine for collecting statistics from multiple repositories at once.
+
+All the pages of all the repositories are retrieved concurrently, limited by the
+global concurrency limit and by the limit of connections per host.
+The results have the same shape as `get_statistics.open_and_closed_issues`.
+Requests are rate limited and retried by `request_scheduler.RequestScheduler`.
+
+Requires aiohttp, which is optional dependency of pagure_api_scripts.
+It's imported by `collect_statistics`, so importing this module stays cheap.
+"""
+import asyncio
+import logging
+
+import arrow
+
+from pagure_api_scripts.aggregator import IssueAggregator
+from pagure_api_scripts.get_statistics import add_open_and_closed, issues_url
+from pagure_api_scripts.instrumentation import get_instrumentation
+from pagure_api_scripts.page_decoder import decode_page
+from pagure_api_scripts.pagure_client import FetchMetrics
+from pagure_api_scripts.request_scheduler import PagureRequestError, RequestScheduler
+
+# Imported on the first call of `collect_statistics`, aiohttp is slow to import
+aiohttp = None
+
+# Default number of requests running at the same time
+DEFAULT_CONCURRENCY = 20
+
+# Default number of connections to one host
+DEFAULT_PER_HOST = 10
+
+_logger = logging.getLogger(__name__)
+
+
+def collect_statistics(
+        till: arrow.Arrow, since: arrow.Arrow, repositories: tuple,
+        concurrency: int = DEFAULT_CONCURRENCY, per_host: int = DEFAULT_PER_HOST,
+        timeout: float = 30, scheduler: RequestScheduler = None, metrics: FetchMetrics = None
+):
+    """
+    Get open and closed issues statistics for all the repositories concurrently.
+
+    Params:
+      till: Limit results to the day set by this argument
+      since: Limit the result from this date
+      repositories: Repository namespaces to check
+      concurrency: How many requests could run at the same time
+      per_host: How many connections could be opened to one host
+      timeout: Timeout for the requests in seconds
+      scheduler: Scheduler for the requests. Default None will create scheduler
+                 with default limits.
+      metrics: Counters of retrieved pages and issues to update. Default: None
+
+    Returns:
+      Dictionary with repository as key and output of `get_statistics.open_and_closed_issues`
+      as value. Repositories are in the same order as provided.
+
+    Raises:
+      PagureRequestError: If any page couldn't be retrieved even after retries.
+    """
+    _import_aiohttp()
+
+    if scheduler is None:
+        scheduler = RequestScheduler()
+    if metrics is None:
+        metrics = FetchMetrics()
+
+    return asyncio.run(
+        _collect_statistics(
+            till, since, repositories, concurrency, per_host, timeout, scheduler, metrics
+        )
+    )
+
+
+def _import_aiohttp():
+    """
+    Import aiohttp into this module, if it wasn't imported yet.
+
+    Raises:
+      RuntimeError: If aiohttp is not installed.
+    """
+    global aiohttp
+    if aiohttp is None:
+        try:
+            import aiohttp
+        except ImportError:
+            raise RuntimeError("The asynchronous engine requires aiohttp. Install it by `pip install aiohttp`.")
+
+
+async def _collect_statistics(
+        till: arrow.Arrow, since: arrow.Arrow, repositories: tuple, concurrency: int,
+        per_host: int, timeout: float, scheduler: RequestScheduler, metrics: FetchMetrics
+):
+    """
+    Coroutine doing the work for `collect_statistics`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+    async with aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as session:
+        results = await asyncio.gather(*(
+            _repository_statistics(session, semaphore, scheduler, metrics, till, since, repository)
+            for repository in repositories
+        ))
+
+    return dict(zip(repositories, results))
+
+
+async def _repository_statistics(
+        session, semaphore: asyncio.Semaphore, scheduler: RequestScheduler, metrics: FetchMetrics,
+        till: arrow.Arrow, since: arrow.Arrow, repository: str
+):
+    """
+    Retrieve all the pages for the repository and aggregate them.
+
+    The first page is retrieved to find out the number of pages from `pagination.pages`,
+    the rest of the pages is retrieved concurrently. Every page is added to the statistics
+    as soon as it and all the pages before it are retrieved.
+
+    Params:
+      session: Session used for the requests
+      semaphore: Semaphore limiting the concurrency
+      scheduler: Scheduler for the requests
+      metrics: Counters of retrieved pages and issues to update
+      till: Limit results to the day set by this argument
+      since: Limit the result from this date
+      repository: Repository namespace to check
+
+    Returns:
+      Output of `get_statistics.open_and_closed_issues`.
+    """
+    url = issues_url(repository, since.int_timestamp)
+    open_aggregator = IssueAggregator(closed=False)
+    closed_aggregator = IssueAggregator()
+
+    page = await _get_page(session, semaphore, scheduler, url)
+    tasks = [
+        asyncio.ensure_future(_get_page(session, semaphore, scheduler, url + "&page=" + str(number)))
+        for number in range(2, page["pagination"]["pages"] + 1)
+    ]
+    try:
+        metrics.add_page(page)
+        add_open_and_closed(open_aggregator, closed_aggregator, page["issues"], till, since)
+        for task in tasks:
+            page = await task
+            metrics.add_page(page)
+            add_open_and_closed(open_aggregator, closed_aggregator, page["issues"], till, since)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return {
+        "open": open_aggregator.result(),
+        "closed": closed_aggregator.result(),
+    }
+
+
+async def _get_page(session, semaphore: asyncio.Semaphore, scheduler: RequestScheduler, url: str):
+    """
+    Retrieve the page returned by pagination.
+
+    The request waits for its turn given by the scheduler and failed requests
+    are retried as long as the scheduler allows it. Every attempt is measured
+    by `instrumentation.get_instrumentation`.
+
+    Params:
+      session: Session used for the request
+      semaphore: Semaphore limiting the concurrency
+      scheduler: Scheduler for the requests
+      url: Url for the page
+
+    Returns:
+      Page as returned by pagure API.
+
+    Raises:
+      PagureRequestError: If the page couldn't be retrieved even after retries.
+    """
+    instrumentation = get_instrumentation()
+    attempt = 0
+    while True:
+        delay = scheduler.acquire()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        try:
+            async with semaphore:
+                with instrumentation.request_timer():
+                    async with session.get(url) as r:
+                        content = await r.read()
+                        status = r.status
+                        retry_after = r.headers.get("Retry-After")
+            if status == 200:
+                instrumentation.count("bytes", len(content))
+                with instrumentation.timer("decode"):
+                    page = decode_page(content)
+                scheduler.success()
+                return page
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            delay = scheduler.retry_delay(attempt)
+            if delay is None:
+                raise PagureRequestError(url, reason=str(error)) from error
+            _logger.warning("Request for url '{}' failed: {}. Retrying in {:.1f}s".format(
+                url, error, delay))
+        else:
+            delay = scheduler.retry_delay(attempt, status, retry_after)
+            if delay is None:
+                _logger.error("Status code '{}' returned for url '{}'.".format(status, url))
+                raise PagureRequestError(url, status)
+            _logger.warning("Status code '{}' returned for url '{}'. Retrying in {:.1f}s".format(
+                status, url, delay))
+
+        instrumentation.count("retries")
+        await asyncio.sleep(delay)
+        attempt = attempt + 1
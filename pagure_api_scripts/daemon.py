@@ -0,0 +1,393 @@
+"""
+Long-running daemon answering statistics queries from warm in-memory index of issues.
+
+Issues of every served repository are kept in memory and refreshed on schedule,
+every refresh only retrieves the issues updated since the last one. Queries for
+any window are then computed from `time_index.TimeIndex` without asking pagure,
+with the same results as `get_statistics.open_issues` and `get_statistics.closed_issues`,
+only up to `refresh` seconds old.
+
+The queries are answered over HTTP, on TCP port or on Unix socket:
+  GET /open-issues?repository=<namespace>&days_ago=30&till=31.12.2021
+  GET /closed-issues?repository=<namespace>&days_ago=30&till=31.12.2021
+  GET /open-and-closed-issues?repository=<namespace>&days_ago=30&till=31.12.2021
+  GET /status
+  GET /metrics
+"""
+import json
+import logging
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import arrow
+
+from pagure_api_scripts.get_statistics import fetch_pages, issues_url
+from pagure_api_scripts.instrumentation import get_instrumentation
+from pagure_api_scripts.issue_cache import SYNC_OVERLAP
+from pagure_api_scripts.pagure_client import PagureClient, get_default_client
+from pagure_api_scripts.request_scheduler import PagureRequestError
+from pagure_api_scripts.time_index import TimeIndex
+
+# Default number of seconds between refreshes of the index
+DEFAULT_REFRESH = 10 * 60
+
+# Default number of days of history loaded for newly served repository
+DEFAULT_HISTORY_DAYS = 365
+
+# Default number of days for queries without days_ago
+DEFAULT_DAYS_AGO = 30
+
+# Default port of the HTTP API
+DEFAULT_PORT = 8080
+
+_logger = logging.getLogger(__name__)
+
+
+class RepositoryIndex:
+    """
+    Issues of one repository kept in memory.
+
+    Attributes:
+      repository: Repository namespace
+      since: All issues updated since this timestamp are in the index, None before the first sync
+      synced_at: Timestamp of the start of the last sync, None before the first sync
+    """
+
+    def __init__(self, repository: str):
+        """
+        Create empty index.
+
+        Params:
+          repository: Repository namespace
+        """
+        self.repository = repository
+        self.since = None
+        self.synced_at = None
+        self._issues = {}
+        self._time_index = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def sync(self, since: int = None, workers: int = 1, client: PagureClient = None):
+        """
+        Retrieve the issues changed since the last sync and store them in the index.
+
+        If the index doesn't contain the issues since the requested timestamp yet,
+        all issues updated since that timestamp are retrieved. Queries are answered
+        from the old issues while the sync is running.
+
+        Params:
+          since: The index needs to contain all issues updated since this timestamp.
+                 Default None keeps the current range.
+          workers: How many pages to fetch in parallel. Default: 1
+          client: Client used for the requests. Default None will use the shared client.
+        """
+        with self._sync_lock:
+            # Other thread could have loaded the range while this one was waiting
+            if since is not None and self.since is not None and since >= self.since:
+                return
+
+            synced_at = arrow.utcnow().int_timestamp
+            if self.since is None or (since is not None and since < self.since):
+                fetch_since = since
+                covered_since = since
+            else:
+                fetch_since = self.synced_at - SYNC_OVERLAP
+                covered_since = self.since
+
+            _logger.info("Syncing issues from '{}' updated since {}".format(self.repository, fetch_since))
+
+            issues = {}
+            for page in fetch_pages(issues_url(self.repository, fetch_since), workers=workers, client=client):
+                for issue in page["issues"]:
+                    issues[issue["id"]] = {
+                        "id": issue["id"],
+                        "status": issue.get("status"),
+                        "date_created": int(issue["date_created"]) if issue["date_created"] else None,
+                        "closed_at": int(issue["closed_at"]) if issue["closed_at"] else None,
+                        "close_status": issue.get("close_status"),
+                        "tags": issue["tags"],
+                        "last_updated": int(issue.get("last_updated") or issue["date_created"] or 0),
+                    }
+
+            with self._lock:
+                self._issues.update(issues)
+                self._time_index = None
+                self.since = covered_since
+                self.synced_at = synced_at
+
+    def time_index(self) -> TimeIndex:
+        """
+        Return the issues indexed by the dates of creation and closing.
+
+        The index is built on the first query after every sync.
+
+        Returns:
+          Index of all the issues.
+        """
+        with self._lock:
+            if self._time_index is None:
+                self._time_index = TimeIndex(self._issues.values())
+            return self._time_index
+
+    def __len__(self):
+        return len(self._issues)
+
+
+class IssueIndex:
+    """
+    Indexes of all the served repositories.
+
+    Attributes:
+      client: Client used for the requests
+      workers: How many pages to fetch in parallel
+      history_days: Number of days of history loaded for newly served repository
+    """
+
+    def __init__(
+            self, client: PagureClient = None, workers: int = 1,
+            history_days: int = DEFAULT_HISTORY_DAYS
+    ):
+        """
+        Create index without any repository.
+
+        Params:
+          client: Client used for the requests. Default None will use the shared client.
+          workers: How many pages to fetch in parallel. Default: 1
+          history_days: Number of days of history loaded for newly served repository.
+                        Default: `DEFAULT_HISTORY_DAYS`
+        """
+        self.client = client if client is not None else get_default_client()
+        self.workers = workers
+        self.history_days = history_days
+        self._repositories = {}
+        self._lock = threading.Lock()
+
+    def repository(self, repository: str, since: int = None) -> RepositoryIndex:
+        """
+        Return index of the repository, which contains all issues updated since the timestamp.
+
+        Repository which wasn't served yet is loaded with `history_days` of history,
+        or more if requested.
+
+        Params:
+          repository: Repository namespace
+          since: The index needs to contain all issues updated since this timestamp.
+                 Default None will only load new repository.
+
+        Returns:
+          Index of the repository.
+
+        Raises:
+          PagureRequestError: If the issues couldn't be retrieved.
+        """
+        with self._lock:
+            index = self._repositories.get(repository)
+            if index is None:
+                index = self._repositories[repository] = RepositoryIndex(repository)
+
+        history_since = arrow.utcnow().shift(days=-self.history_days).int_timestamp
+        if index.since is None:
+            since = history_since if since is None else min(since, history_since)
+        if index.since is None or (since is not None and since < index.since):
+            try:
+                index.sync(since, workers=self.workers, client=self.client)
+            except PagureRequestError:
+                with self._lock:
+                    if index.since is None:
+                        del self._repositories[repository]
+                raise
+        return index
+
+    def refresh(self):
+        """
+        Retrieve the changed issues of all the served repositories.
+
+        Repositories which couldn't be refreshed are logged and left as they are.
+        """
+        with self._lock:
+            indexes = list(self._repositories.values())
+        for index in indexes:
+            if index.since is None:
+                continue
+            try:
+                index.sync(workers=self.workers, client=self.client)
+            except PagureRequestError as error:
+                _logger.error("Refresh of '{}' failed: {}".format(index.repository, error))
+
+    def statistics(self, repository: str, kind: str, till: arrow.Arrow, since: arrow.Arrow) -> dict:
+        """
+        Compute the statistics for the window from the index.
+
+        Params:
+          repository: Repository namespace
+          kind: "open-issues", "closed-issues" or "open-and-closed-issues"
+          till: Limit results to the day set by this argument
+          since: Limit the result from this date
+
+        Returns:
+          Output of the `get_statistics` function with the same name as kind.
+
+        Raises:
+          PagureRequestError: If the issues of new repository couldn't be retrieved.
+        """
+        time_index = self.repository(repository, since.int_timestamp).time_index()
+        if kind == "open-issues":
+            return time_index.statistics(till, since, closed=False)
+        if kind == "closed-issues":
+            return time_index.statistics(till, since)
+        return {
+            "open": time_index.statistics(till, since, closed=False),
+            "closed": time_index.statistics(till, since),
+        }
+
+    def status(self) -> dict:
+        """
+        Return the state of the index.
+
+        Returns:
+          Dictionary with repository as key and dictionary with number of issues,
+          start of the history and time of the last sync as value.
+        """
+        with self._lock:
+            indexes = list(self._repositories.values())
+        return {
+            index.repository: {
+                "issues": len(index),
+                "since": arrow.get(index.since).isoformat() if index.since is not None else None,
+                "synced_at": arrow.get(index.synced_at).isoformat() if index.synced_at is not None else None,
+            }
+            for index in indexes
+        }
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP server listening on Unix socket.
+    """
+    daemon_threads = True
+
+
+def create_server(index: IssueIndex, host: str = "127.0.0.1", port: int = DEFAULT_PORT, socket_path: str = None):
+    """
+    Create HTTP server answering the queries from the index.
+
+    Params:
+      index: Index of the issues
+      host: Address to listen on. Default: "127.0.0.1"
+      port: Port to listen on. Default: `DEFAULT_PORT`
+      socket_path: Listen on this Unix socket instead of the port. Default: None
+
+    Returns:
+      Server, which is not serving yet.
+    """
+    handler = _handler(index)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return _UnixHTTPServer(socket_path, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(
+        index: IssueIndex, refresh: float = DEFAULT_REFRESH, host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT, socket_path: str = None
+):
+    """
+    Answer the queries from the index and refresh it on schedule until interrupted.
+
+    Repositories which are not in the index yet are loaded on the first query.
+
+    Params:
+      index: Index of the issues
+      refresh: Number of seconds between refreshes of the index. Default: `DEFAULT_REFRESH`
+      host: Address to listen on. Default: "127.0.0.1"
+      port: Port to listen on. Default: `DEFAULT_PORT`
+      socket_path: Listen on this Unix socket instead of the port. Default: None
+    """
+    stop = threading.Event()
+
+    def refresh_loop():
+        while not stop.wait(refresh):
+            index.refresh()
+
+    thread = threading.Thread(target=refresh_loop, daemon=True)
+    thread.start()
+    server = create_server(index, host=host, port=port, socket_path=socket_path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def _handler(index: IssueIndex):
+    """
+    Create request handler class answering the queries from the index.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            _logger.debug(format % args)
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            args = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+            path = parsed.path.strip("/")
+
+            if path == "status":
+                self._send_json(200, index.status())
+                return
+            if path == "metrics":
+                self._send(200, get_instrumentation().prometheus("serve").encode(), "text/plain; version=0.0.4")
+                return
+            if path not in ("open-issues", "closed-issues", "open-and-closed-issues"):
+                self._send_json(404, {"error": "Unknown path '{}'".format(parsed.path)})
+                return
+
+            if "repository" not in args:
+                self._send_json(400, {"error": "Parameter 'repository' is required"})
+                return
+            try:
+                till = arrow.get(args["till"], "DD.MM.YYYY") if "till" in args else arrow.utcnow()
+                since = till.shift(days=-int(args.get("days_ago", DEFAULT_DAYS_AGO)))
+            except ValueError as error:
+                self._send_json(400, {"error": str(error)})
+                return
+
+            try:
+                with get_instrumentation().timer("query"):
+                    data = index.statistics(args["repository"], path, till, since)
+            except PagureRequestError as error:
+                self._send_json(502, {"error": str(error)})
+                return
+
+            self._send_json(200, {
+                "repository": args["repository"],
+                "since": since.isoformat(),
+                "till": till.isoformat(),
+                "synced_at": index.status()[args["repository"]]["synced_at"],
+                "statistics": data,
+            })
+
+        def _send_json(self, status: int, data):
+            self._send(status, json.dumps(data).encode(), "application/json")
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
@@ -0,0 +1,366 @@
+"""
+Export of issues and aggregated statistics to files used by pagure_api_scripts.
+
+Every issue is written to the issues file as soon as it's retrieved and
+statistics for every window are written when the repository is done, so
+nothing more than the aggregators is kept in memory.
+Supported formats are CSV, JSON Lines and Parquet, which requires pyarrow,
+optional dependency of pagure_api_scripts. It's imported only when Parquet file is opened.
+"""
+import csv
+import json
+
+import arrow
+
+from pagure_api_scripts.get_statistics import fetch_issues, time_to_close
+from pagure_api_scripts.history import HistoryAggregator, windows
+from pagure_api_scripts.issue_cache import IssueCache
+from pagure_api_scripts.issue_record import GAIN_NAMES, TROUBLE_NAMES, resolution_name
+from pagure_api_scripts.pagure_client import PagureClient
+from pagure_api_scripts.ttc_statistics import PERCENTILES, histogram_labels
+
+# Imported by the first `ParquetWriter`, pyarrow is slow to import
+pyarrow = None
+
+# Columns of the issues file with their types
+ISSUE_FIELDS = [
+    ("repository", str),
+    ("id", int),
+    ("status", str),
+    ("date_created", int),
+    ("closed_at", int),
+    ("time_to_close", int),
+    ("resolution", str),
+    ("gain", str),
+    ("trouble", str),
+    ("ops", bool),
+    ("dev", bool),
+]
+
+
+def window_fields():
+    """
+    Return columns of the windows file with their types.
+
+    Statistics of open and closed issues are prefixed by `open_` and `closed_`,
+    nested statistics are flattened with the key as suffix. Resolutions
+    are not known in advance and are stored as JSON string.
+
+    Returns:
+      List of (name, type) tuples.
+    """
+    fields = [
+        ("repository", str),
+        ("since", str),
+        ("till", str),
+    ]
+    for prefix in ("open", "closed"):
+        fields.append((prefix + "_total", int))
+        fields.append((prefix + "_closed", int))
+        if prefix == "closed":
+            for key in ("maximum_ttc", "minimum_ttc", "average_ttc", "median_ttc"):
+                fields.append((prefix + "_" + key, float))
+            for percentile in PERCENTILES:
+                fields.append((prefix + "_p{}_ttc".format(percentile), float))
+            for label in histogram_labels():
+                fields.append((prefix + "_histogram_" + label, int))
+        for name in GAIN_NAMES:
+            fields.append((prefix + "_gain_" + name, int))
+        for name in TROUBLE_NAMES:
+            fields.append((prefix + "_trouble_" + name, int))
+        fields.append((prefix + "_ops", int))
+        fields.append((prefix + "_dev", int))
+        fields.append((prefix + "_resolution", str))
+    return fields
+
+
+class CsvWriter:
+    """
+    Writes rows to CSV file with header.
+    """
+
+    def __init__(self, path: str, fields: list):
+        """
+        Open the file and write the header.
+
+        Params:
+          path: Path to the file
+          fields: List of (name, type) tuples
+        """
+        self._file = open(path, "w", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=[name for name, _ in fields])
+        self._writer.writeheader()
+
+    def write(self, row: dict):
+        """
+        Write one row, missing columns are left empty.
+
+        Params:
+          row: Dictionary with column name as key
+        """
+        self._writer.writerow(row)
+
+    def close(self):
+        """
+        Close the file.
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class JsonLinesWriter:
+    """
+    Writes rows to JSON Lines file, one JSON object on every line.
+    """
+
+    def __init__(self, path: str, fields: list):
+        """
+        Open the file.
+
+        Params:
+          path: Path to the file
+          fields: List of (name, type) tuples
+        """
+        self._file = open(path, "w")
+        self._names = [name for name, _ in fields]
+
+    def write(self, row: dict):
+        """
+        Write one row, missing columns are written as null.
+
+        Params:
+          row: Dictionary with column name as key
+        """
+        self._file.write(json.dumps({name: row.get(name) for name in self._names}))
+        self._file.write("\n")
+
+    def close(self):
+        """
+        Close the file.
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _import_pyarrow():
+    """
+    Import pyarrow into this module, if it wasn't imported yet.
+
+    Raises:
+      RuntimeError: If pyarrow is not installed.
+    """
+    global pyarrow
+    if pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow. Install it by `pip install pyarrow`.")
+
+
+class ParquetWriter:
+    """
+    Writes rows to Parquet file, every batch of rows is written as one row group.
+    """
+
+    # Number of rows kept in memory before they are written
+    BATCH_SIZE = 10000
+
+    def __init__(self, path: str, fields: list):
+        """
+        Open the file.
+
+        Params:
+          path: Path to the file
+          fields: List of (name, type) tuples
+        """
+        _import_pyarrow()
+        types = {
+            str: pyarrow.string(),
+            int: pyarrow.int64(),
+            float: pyarrow.float64(),
+            bool: pyarrow.bool_(),
+        }
+        self._schema = pyarrow.schema([(name, types[field_type]) for name, field_type in fields])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        self._rows = []
+
+    def write(self, row: dict):
+        """
+        Write one row, missing columns are written as null.
+
+        Params:
+          row: Dictionary with column name as key
+        """
+        self._rows.append(row)
+        if len(self._rows) >= self.BATCH_SIZE:
+            self._flush()
+
+    def close(self):
+        """
+        Write the remaining rows and close the file.
+        """
+        self._flush()
+        self._writer.close()
+
+    def _flush(self):
+        """
+        Write the rows kept in memory as one row group.
+        """
+        if self._rows:
+            self._writer.write_table(pyarrow.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Supported formats and their writers
+WRITERS = {
+    "csv": CsvWriter,
+    "jsonl": JsonLinesWriter,
+    "parquet": ParquetWriter,
+}
+
+
+def export(
+        till: arrow.Arrow, period: str, count: int, repositories: tuple, output_format: str = "csv",
+        issues_path: str = None, windows_path: str = None, workers: int = 1,
+        client: PagureClient = None, cache: IssueCache = None, frozen_till: int = None
+):
+    """
+    Export issues and statistics for consecutive windows from the repositories to files.
+    All the issues for the whole range are retrieved only once for every repository.
+
+    Params:
+      till: End of the last window
+      period: Length of the window, one of `history.PERIODS`
+      count: Number of windows
+      repositories: Repository namespaces to export
+      output_format: Format of the files, one of `WRITERS`. Default: "csv"
+      issues_path: Path to the file for issues. Default None will not export issues.
+      windows_path: Path to the file for statistics of windows. Default None will not export them.
+      workers: How many pages to fetch in parallel. Default: 1
+      client: Client used for the requests. Default None will use the shared client.
+      cache: Local store of issues to sync and compute from. Default None will retrieve
+             all the issues from pagure.
+      frozen_till: Timestamp of the end of the window, if it ended before the run started,
+                   so its pages could be reused without asking pagure, see `PagureClient.get`.
+                   Default None for window which isn't finished.
+
+    Returns:
+      Dictionary with number of exported rows.
+
+    Example output::
+      {
+        "issues": 1500, # Number of rows in issues file
+        "windows": 8, # Number of rows in windows file
+      }
+    """
+    writer_class = WRITERS[output_format]
+    window_list = windows(till, period, count)
+    issues_writer = writer_class(issues_path, ISSUE_FIELDS) if issues_path else None
+    windows_writer = writer_class(windows_path, window_fields()) if windows_path else None
+    exported = {"issues": 0, "windows": 0}
+
+    try:
+        for repository in repositories:
+            aggregator = HistoryAggregator(window_list)
+            for issue in fetch_issues(
+                    repository, window_list[0][0], workers=workers, client=client, cache=cache,
+                    frozen_till=frozen_till
+            ):
+                record = aggregator.add(issue)
+                if record and issues_writer:
+                    issues_writer.write(issue_row(repository, issue, record))
+                    exported["issues"] = exported["issues"] + 1
+
+            if windows_writer:
+                for window in aggregator.result():
+                    windows_writer.write(window_row(repository, window))
+                    exported["windows"] = exported["windows"] + 1
+    finally:
+        for writer in (issues_writer, windows_writer):
+            if writer:
+                writer.close()
+
+    return exported
+
+
+def issue_row(repository: str, issue: dict, record) -> dict:
+    """
+    Create row of the issues file.
+
+    Params:
+      repository: Repository namespace of the issue
+      issue: Issue as returned by pagure API
+      record: `IssueRecord` of the issue
+
+    Returns:
+      Dictionary with column name as key.
+    """
+    ttc = record.time_to_close
+    if ttc is None and record.closed_at:
+        ttc = time_to_close(issue)
+    return {
+        "repository": repository,
+        "id": record.id,
+        "status": issue.get("status"),
+        "date_created": record.date_created,
+        "closed_at": record.closed_at,
+        "time_to_close": ttc,
+        "resolution": resolution_name(record.resolution),
+        "gain": GAIN_NAMES[record.gain],
+        "trouble": TROUBLE_NAMES[record.trouble],
+        "ops": record.ops,
+        "dev": record.dev,
+    }
+
+
+def window_row(repository: str, window: dict) -> dict:
+    """
+    Create row of the windows file.
+
+    Params:
+      repository: Repository namespace
+      window: Statistics of one window as returned by `history.HistoryAggregator.result`
+
+    Returns:
+      Dictionary with column name as key, see `window_fields`.
+    """
+    row = {
+        "repository": repository,
+        "since": window["since"].isoformat(),
+        "till": window["till"].isoformat(),
+    }
+    for prefix in ("open", "closed"):
+        data = window[prefix]
+        keys = ["total", "closed", "ops", "dev"]
+        # Time to close is not computed for open issues
+        if prefix == "closed":
+            keys.extend(["maximum_ttc", "minimum_ttc", "average_ttc", "median_ttc"])
+        for key in keys:
+            row[prefix + "_" + key] = data[key]
+        for key, value in data.get("percentiles_ttc", {}).items():
+            row[prefix + "_" + key + "_ttc"] = value
+        for key, value in data.get("histogram_ttc", {}).items():
+            row[prefix + "_histogram_" + key] = value
+        for key, value in data["gain"].items():
+            row[prefix + "_gain_" + key] = value
+        for key, value in data["trouble"].items():
+            row[prefix + "_trouble_" + key] = value
+        row[prefix + "_resolution"] = json.dumps(data["resolution"])
+    return row
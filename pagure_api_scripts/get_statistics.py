@@ -2,30 +2,39 @@
 This script will obtains issues from the specified issue tracker
 and print some interesting statistics from those data.
 """
-import statistics
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import arrow
 import requests
 import logging
 
+from pagure_api_scripts.aggregator import IssueAggregator
+from pagure_api_scripts.instrumentation import get_instrumentation
+from pagure_api_scripts.issue_cache import IssueCache
+from pagure_api_scripts.issue_record import GAIN_VALUES, TROUBLE_VALUES, to_record
+from pagure_api_scripts.page_decoder import decode_page
+from pagure_api_scripts.pagure_client import PagureClient, get_default_client
+from pagure_api_scripts.request_scheduler import PagureRequestError
+
 PAGURE_URL = "https://pagure.io/"
 
-GAIN_VALUES = [
-    "low-gain",
-    "medium-gain",
-    "high-gain"
-]
+# Number of issues on one page, this is the maximum allowed by pagure
+PER_PAGE = 100
 
-TROUBLE_VALUES = [
-    "low-trouble",
-    "medium-trouble",
-    "high-trouble"
-]
+# Number of seconds in one day
+DAY = 24 * 60 * 60
 
 _logger = logging.getLogger(__name__)
 
 
-def open_issues(till: arrow.Arrow, since: arrow.Arrow, repository: str):
+def open_issues(
+        till: arrow.Arrow, since: arrow.Arrow, repository: str, workers: int = 1,
+        client: PagureClient = None, cache: IssueCache = None, processes: int = 1,
+        frozen_till: int = None
+):
     """
     Get open issues from the repository and print their count.
 
@@ -33,59 +42,451 @@ def open_issues(till: arrow.Arrow, since: arrow.Arrow, repository: str):
       till: Limit results to the day set by this argument
       since: Limit the result from this date
       repository: Repository namespace to check
+      workers: How many pages to fetch in parallel. Default: 1
+      client: Client used for the requests. Default None will use the shared client.
+      cache: Local store of issues to sync and compute from. Default None will retrieve
+             all the issues from pagure.
+      processes: How many processes parse and aggregate the pages, see
+                 `process_pool.aggregate_pages`. Can't be used with cache. Default: 1
+      frozen_till: Timestamp of the end of the window, if it ended before the run started,
+                   so its pages could be reused without asking pagure, see `PagureClient.get`.
+                   Default None for window which isn't finished.
     """
-    next_page = PAGURE_URL + "api/0/" + repository + "/issues?status=all&since=" + str(since.int_timestamp)
+    if processes > 1:
+        aggregator = _aggregate_in_processes(
+            repository, since, "all", lambda: WindowAggregator(till, since, closed=False),
+            processes, workers, client, cache, frozen_till
+        )
+        return aggregator.open_aggregator.result()
+
+    issues = fetch_issues(
+        repository, since, workers=workers, client=client, cache=cache, frozen_till=frozen_till
+    )
     data = {
-        "issues": [],
-        "total": 0,
+        "issues": filter_issues(issues, till, since, closed=False),
     }
 
-    while next_page:
-        page_data = get_page_data(next_page, till, since, closed=False)
-        # click.echo(json.dumps(page_data, indent=4))
-        data["issues"] = data["issues"] + page_data["issues"]
-        data["total"] = data["total"] + page_data["total"]
-        next_page = page_data["next_page"]
-
     aggregated_data = aggregate_stats(data, closed=False)
 
     return aggregated_data
 
 
-def closed_issues(till: arrow.Arrow, since: arrow.Arrow, repository: str):
+def closed_issues(
+        till: arrow.Arrow, since: arrow.Arrow, repository: str, workers: int = 1,
+        client: PagureClient = None, cache: IssueCache = None, processes: int = 1,
+        frozen_till: int = None
+):
     """
     Get closed issues from the repository and print their count.
 
     Params:
-      days_ago: How many days ago to look for the issues
       till: Limit results to the day set by this argument
       since: Limit the result from this date
       repository: Repository namespace to check
+      workers: How many pages to fetch in parallel. Default: 1
+      client: Client used for the requests. Default None will use the shared client.
+      cache: Local store of issues to sync and compute from. Default None will retrieve
+             all the issues from pagure.
+      processes: How many processes parse and aggregate the pages, see
+                 `process_pool.aggregate_pages`. Can't be used with cache. Default: 1
+      frozen_till: Timestamp of the end of the window, if it ended before the run started,
+                   so its pages could be reused without asking pagure, see `PagureClient.get`.
+                   Default None for window which isn't finished.
     """
-    next_page = PAGURE_URL + "api/0/" + repository + "/issues?status=Closed&since=" + str(since.int_timestamp)
+    if processes > 1:
+        aggregator = _aggregate_in_processes(
+            repository, since, "Closed", lambda: WindowAggregator(till, since, opened=False),
+            processes, workers, client, cache, frozen_till
+        )
+        return aggregator.closed_aggregator.result()
+
+    issues = fetch_issues(
+        repository, since, status="Closed", workers=workers, client=client, cache=cache,
+        frozen_till=frozen_till
+    )
     data = {
-        "issues": [],
-        "total": 0,
+        "issues": filter_issues(issues, till, since),
     }
 
-    while next_page:
-        page_data = get_page_data(next_page, till, since)
-        # click.echo(json.dumps(page_data, indent=4))
-        data["issues"] = data["issues"] + page_data["issues"]
-        data["total"] = data["total"] + page_data["total"]
-        next_page = page_data["next_page"]
-
     aggregated_data = aggregate_stats(data)
 
     return aggregated_data
 
 
+def open_and_closed_issues(
+        till: arrow.Arrow, since: arrow.Arrow, repository: str, workers: int = 1,
+        client: PagureClient = None, cache: IssueCache = None, processes: int = 1,
+        frozen_till: int = None
+):
+    """
+    Get both open and closed issues from the repository in one walk over the pages.
+
+    Closed issues are subset of all issues, so both results are computed from
+    the same `status=all` pages and every issue is downloaded only once.
+
+    Params:
+      till: Limit results to the day set by this argument
+      since: Limit the result from this date
+      repository: Repository namespace to check
+      workers: How many pages to fetch in parallel. Default: 1
+      client: Client used for the requests. Default None will use the shared client.
+      cache: Local store of issues to sync and compute from. Default None will retrieve
+             all the issues from pagure.
+      processes: How many processes parse and aggregate the pages, see
+                 `process_pool.aggregate_pages`. Can't be used with cache. Default: 1
+      frozen_till: Timestamp of the end of the window, if it ended before the run started,
+                   so its pages could be reused without asking pagure, see `PagureClient.get`.
+                   Default None for window which isn't finished.
+
+    Returns:
+      Dictionary with aggregated data for both windows.
+
+    Example output::
+      {
+        "open": {...}, # Same as the output of `open_issues`
+        "closed": {...}, # Same as the output of `closed_issues`
+      }
+    """
+    if processes > 1:
+        return _aggregate_in_processes(
+            repository, since, "all", lambda: WindowAggregator(till, since),
+            processes, workers, client, cache, frozen_till
+        ).result()
+
+    issues = fetch_issues(
+        repository, since, workers=workers, client=client, cache=cache, frozen_till=frozen_till
+    )
+
+    return aggregate_open_and_closed(issues, till, since)
+
+
+def _aggregate_in_processes(
+        repository: str, since: arrow.Arrow, status: str, new_aggregator, processes: int,
+        workers: int, client: PagureClient, cache: IssueCache, frozen_till: int
+):
+    """
+    Aggregate all the issues from the repository in process pool.
+
+    Params:
+      repository: Repository namespace to check
+      since: Only issues updated since this date are retrieved
+      status: Status of the issues to retrieve
+      new_aggregator: Function creating empty aggregator, see `process_pool.aggregate_pages`
+      processes: How many processes parse and aggregate the pages
+      workers: How many pages to fetch in parallel
+      client: Client used for the requests
+      cache: Local store of issues, must be None
+      frozen_till: End of the finished window the issues are for, see `PagureClient.get`
+
+    Returns:
+      Aggregator with all the issues.
+    """
+    # Import here to avoid circular import
+    from pagure_api_scripts.process_pool import aggregate_pages
+
+    if cache:
+        raise ValueError("Issues from the cache can't be aggregated in process pool.")
+
+    return aggregate_pages(
+        issues_url(repository, since.int_timestamp, status=status), new_aggregator, processes,
+        workers=workers, client=client, frozen_till=frozen_till
+    )
+
+
+def aggregate_open_and_closed(issues, till: arrow.Arrow, since: arrow.Arrow):
+    """
+    Aggregate statistics for both open and closed window from the same issues.
+
+    Params:
+      issues: Iterable of issues as returned by pagure API with any status
+      till: Limit results to the day set by this argument
+      since: Limit the result from this date
+
+    Returns:
+      Dictionary with aggregated data for both windows. See `open_and_closed_issues`.
+    """
+    open_aggregator = IssueAggregator(closed=False)
+    closed_aggregator = IssueAggregator()
+
+    add_open_and_closed(open_aggregator, closed_aggregator, issues, till, since)
+
+    with get_instrumentation().timer("aggregate"):
+        return {
+            "open": open_aggregator.result(),
+            "closed": closed_aggregator.result(),
+        }
+
+
+def add_open_and_closed(
+        open_aggregator: IssueAggregator, closed_aggregator: IssueAggregator, issues,
+        till: arrow.Arrow, since: arrow.Arrow
+):
+    """
+    Add the issues to the aggregators for open and closed window.
+
+    Params:
+      open_aggregator: Aggregator for the open window
+      closed_aggregator: Aggregator for the closed window
+      issues: Iterable of issues as returned by pagure API with any status
+      till: Limit results to the day set by this argument
+      since: Limit the result from this date
+    """
+    till, since = epoch_bounds(till, since)
+    filtering = 0.0
+    aggregation = 0.0
+    for issue in issues:
+        start = time.perf_counter()
+        opened = _parse_issue(issue, till, since, closed=False)
+        # The same filter as `status=Closed` is doing on the server
+        closed = _parse_issue(issue, till, since) if issue.get("status") == "Closed" else None
+        filtered = time.perf_counter()
+        if opened:
+            open_aggregator.add(opened)
+        if closed:
+            closed_aggregator.add(closed)
+        filtering = filtering + filtered - start
+        aggregation = aggregation + time.perf_counter() - filtered
+
+    instrumentation = get_instrumentation()
+    instrumentation.add_time("filter", filtering)
+    instrumentation.add_time("aggregate", aggregation)
+
+
+class WindowAggregator:
+    """
+    Statistics of issues opened and closed in one window, filled page by page.
+
+    Aggregators filled from different pages could be merged together,
+    see `process_pool.aggregate_pages`.
+
+    Attributes:
+      till: Limit results to the day set by this argument
+      since: Limit the result from this date
+      open_aggregator: Aggregator of issues opened in the window, None if not needed
+      closed_aggregator: Aggregator of issues closed in the window, None if not needed
+    """
+
+    def __init__(self, till: arrow.Arrow, since: arrow.Arrow, opened: bool = True, closed: bool = True):
+        """
+        Create empty aggregator.
+
+        Params:
+          till: Limit results to the day set by this argument
+          since: Limit the result from this date
+          opened: Aggregate issues opened in the window. Default: True
+          closed: Aggregate issues closed in the window. Default: True
+        """
+        self.till = till
+        self.since = since
+        self.open_aggregator = IssueAggregator(closed=False) if opened else None
+        self.closed_aggregator = IssueAggregator() if closed else None
+
+    def add_issues(self, issues):
+        """
+        Add the issues to the statistics.
+
+        Params:
+          issues: Iterable of issues as returned by pagure API. With both open and closed
+                  aggregators the issues could have any status, with only closed aggregator
+                  they need to be closed.
+        """
+        if self.open_aggregator and self.closed_aggregator:
+            add_open_and_closed(
+                self.open_aggregator, self.closed_aggregator, issues, self.till, self.since
+            )
+        elif self.open_aggregator:
+            add_records(self.open_aggregator, filter_issues(issues, self.till, self.since, closed=False))
+        else:
+            add_records(self.closed_aggregator, filter_issues(issues, self.till, self.since))
+
+    def merge(self, other: "WindowAggregator"):
+        """
+        Add statistics from other aggregator to this one.
+
+        Params:
+          other: Aggregator to merge
+
+        Returns:
+          This aggregator.
+        """
+        if self.open_aggregator:
+            self.open_aggregator.merge(other.open_aggregator)
+        if self.closed_aggregator:
+            self.closed_aggregator.merge(other.closed_aggregator)
+        return self
+
+    def result(self):
+        """
+        Return the aggregated statistics.
+
+        Returns:
+          Dictionary with aggregated data. See `open_and_closed_issues`.
+        """
+        with get_instrumentation().timer("aggregate"):
+            return {
+                "open": self.open_aggregator.result() if self.open_aggregator else None,
+                "closed": self.closed_aggregator.result() if self.closed_aggregator else None,
+            }
+
+
+def filter_issues(issues, till: arrow.Arrow, since: arrow.Arrow, closed: bool = True):
+    """
+    Filter the issues and yield data we care about for each of them.
+    See `parse_page` for the filtering done on the issues.
+
+    Params:
+      issues: Iterable of issues as returned by pagure API
+      till: Till date for the issues
+      since: Since date for the issues
+      closed: Should we get closed or open issues. Default: True
+
+    Returns:
+      Generator of records returned by `parse_issue`.
+    """
+    till, since = epoch_bounds(till, since)
+    filtering = 0.0
+    try:
+        for issue in issues:
+            start = time.perf_counter()
+            record = _parse_issue(issue, till, since, closed=closed)
+            filtering = filtering + time.perf_counter() - start
+            if record:
+                yield record
+    finally:
+        get_instrumentation().add_time("filter", filtering)
+
+
+def add_records(aggregator: IssueAggregator, records):
+    """
+    Add the records to the aggregator, the time is measured as `aggregate` phase.
+
+    Params:
+      aggregator: Aggregator to fill
+      records: Iterable of records returned by `parse_issue`
+    """
+    aggregation = 0.0
+    for record in records:
+        start = time.perf_counter()
+        aggregator.add(record)
+        aggregation = aggregation + time.perf_counter() - start
+    get_instrumentation().add_time("aggregate", aggregation)
+
+
+def fetch_issues(
+        repository: str, since: arrow.Arrow, status: str = "all", workers: int = 1,
+        client: PagureClient = None, cache: IssueCache = None, frozen_till: int = None
+):
+    """
+    Fetch all the issues updated since the date from the repository.
+
+    If the cache is provided, it is synced first and the issues are then read from it.
+
+    Params:
+      repository: Repository namespace to check
+      since: Only issues updated since this date are returned
+      status: Status of the issues to return. Default "all" returns every issue.
+      workers: How many pages to fetch in parallel. Default: 1
+      client: Client used for the requests. Default None will use the shared client.
+      cache: Local store of issues. Default None will retrieve all the issues from pagure.
+      frozen_till: End of the finished window the issues are for, see `PagureClient.get`. Default: None
+
+    Returns:
+      Generator of issues as returned by pagure API.
+    """
+    if cache:
+        cache.sync(repository, since, workers=workers, client=client)
+        yield from cache.issues(repository, since, status=status)
+        return
+
+    url = issues_url(repository, since.int_timestamp, status=status)
+    for page in fetch_pages(url, workers=workers, client=client, frozen_till=frozen_till):
+        yield from page["issues"]
+
+
+def issues_url(repository: str, since: int, status: str = "all") -> str:
+    """
+    Create url of the first page of issues in the repository.
+
+    Pagure filters the issues by status and by the date of the last update,
+    it doesn't support filtering by creation or closing date. The largest
+    page allowed is requested, so there are as few requests as possible.
+
+    Params:
+      repository: Repository namespace
+      since: Only issues updated since this timestamp are returned
+      status: Status of the issues to return. Default "all" returns every issue.
+
+    Returns:
+      Url for the pagure API.
+    """
+    return "{}api/0/{}/issues?status={}&since={}&per_page={}".format(
+        PAGURE_URL, repository, status, since, PER_PAGE
+    )
+
+
+def fetch_pages(url: str, workers: int = 1, client: PagureClient = None, frozen_till: int = None):
+    """
+    Fetch all the pages for the url and yield each of them in order.
+
+    With one worker the pages are retrieved by following `pagination.next`,
+    the next page is retrieved in background while the current one is processed.
+    With more workers the first page is retrieved to find out the number
+    of pages from `pagination.pages` and the rest of the pages is retrieved
+    in parallel. At most twice the number of workers pages are retrieved ahead
+    of the page being processed. The pages are yielded in the same order in both cases.
+    Every page is counted in `client.metrics`.
+
+    Params:
+      url: Url for the first page
+      workers: How many pages to fetch in parallel. Default: 1
+      client: Client used for the requests. Default None will use the shared client.
+      frozen_till: End of the finished window the pages are for, see `PagureClient.get`. Default: None
+
+    Returns:
+      Generator of pages returned by `get_page`.
+    """
+    if client is None:
+        client = get_default_client()
+
+    page = get_page(url, client=client, frozen_till=frozen_till)
+
+    if workers > 1 and page["pagination"]["pages"] > 1:
+        client.metrics.add_page(page)
+        yield page
+        futures = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for number in range(2, page["pagination"]["pages"] + 1):
+                futures.append(executor.submit(
+                    get_page, url + "&page=" + str(number), client=client, frozen_till=frozen_till
+                ))
+                if len(futures) >= workers * 2:
+                    page = futures.popleft().result()
+                    client.metrics.add_page(page)
+                    yield page
+            while futures:
+                page = futures.popleft().result()
+                client.metrics.add_page(page)
+                yield page
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        while page:
+            next_page = page["pagination"]["next"]
+            future = None
+            if next_page:
+                future = executor.submit(get_page, next_page, client=client, frozen_till=frozen_till)
+            client.metrics.add_page(page)
+            yield page
+            page = future.result() if future else None
+
+
 def aggregate_stats(data: dict, closed: bool = True):
     """
     Aggregate informative statistics from the data.
 
     Params:
-      data: Data to sift through.
+      data: Data to sift through. The issues could be any iterable, they are consumed
+            one by one without keeping them in memory.
       closed: Should we aggregate closed or open issues. Default: True
 
     Returns:
@@ -93,6 +494,7 @@ def aggregate_stats(data: dict, closed: bool = True):
 
     Example output::
       {
+        "total": 100, # Number of issues
         "closed": 100, # Number of closed issues
         "maximum_ttc": 100, # Maximum time to close
         "minimum_ttc": 1, # Minimum time to close
@@ -112,88 +514,100 @@ def aggregate_stats(data: dict, closed: bool = True):
         },
         "ops": 10, # How many ops issues were closed
         "dev": 10, # How many dev issues were closed
+        # Only if closed is set to True and there are any issues,
+        # see `ttc_statistics.ttc_statistics_from_counts`
+        "percentiles_ttc": {...}, # Time to close percentiles
+        "histogram_ttc": {...}, # Number of issues in each time to close bucket
+        "resolution_ttc": {...}, # Time to close for each resolution
       }
     """
-    aggregated_data = {
-        "total": data["total"],
-        "closed": 0,
-        "maximum_ttc": 0,
-        "minimum_ttc": 0,
-        "average_ttc": 0,
-        "median_ttc": 0,
-        "resolution": {},
-        "gain": {
-            "no_tag": 0,
-            "low-gain": 0,
-            "medium-gain": 0,
-            "high-gain": 0,
-        },
-        "trouble": {
-            "no_tag": 0,
-            "low-trouble": 0,
-            "medium-trouble": 0,
-            "high-trouble": 0,
-        },
-        "ops": 0,
-        "dev": 0,
-    }
-    time_to_close_list = []
-
-    for issue_dict in data["issues"]:
-        for issue in issue_dict.values():
-            if closed:
-                # time to close
-                time_to_close_list.append(issue["time_to_close"])
-
-            # resolution
-            # Skip the issues that are not closed
-            if issue["resolution"]:
-                if issue["resolution"] in aggregated_data["resolution"]:
-                    aggregated_data["resolution"][issue["resolution"]] = aggregated_data["resolution"][issue["resolution"]] + 1
-                else:
-                    aggregated_data["resolution"][issue["resolution"]] = 1
-                aggregated_data["closed"] = aggregated_data["closed"] + 1
-
-            # gain
-            if issue["gain"]:
-                if issue["gain"][0] in aggregated_data["gain"]:
-                    aggregated_data["gain"][issue["gain"][0]] = aggregated_data["gain"][issue["gain"][0]] + 1
-                else:
-                    aggregated_data["gain"][issue["gain"][0]] = 1
-            else:
-                aggregated_data["gain"]["no_tag"] = aggregated_data["gain"]["no_tag"] + 1
-
-            # trouble
-            if issue["trouble"]:
-                if issue["trouble"][0] in aggregated_data["trouble"]:
-                    aggregated_data["trouble"][issue["trouble"][0]] = aggregated_data["trouble"][issue["trouble"][0]] + 1
-                else:
-                    aggregated_data["trouble"][issue["trouble"][0]] = 1
-            else:
-                aggregated_data["trouble"]["no_tag"] = aggregated_data["trouble"]["no_tag"] + 1
-
-            # ops
-            if issue["ops"]:
-                aggregated_data["ops"] = aggregated_data["ops"] + 1
-
-            # dev
-            if issue["dev"]:
-                aggregated_data["dev"] = aggregated_data["dev"] + 1
-
-    # Get data from time to close list
-    if closed:
-        if data["issues"]:
-            aggregated_data["maximum_ttc"] = max(time_to_close_list)
-            aggregated_data["minimum_ttc"] = min(time_to_close_list)
-            aggregated_data["average_ttc"] = sum(time_to_close_list) / len(time_to_close_list)
-            aggregated_data["median_ttc"] = statistics.median(time_to_close_list)
+    aggregator = IssueAggregator(closed=closed)
 
-    return aggregated_data
+    add_records(aggregator, data["issues"])
 
+    with get_instrumentation().timer("aggregate"):
+        return aggregator.result()
 
-def get_page_data(url: str, till: arrow.Arrow, since: arrow.Arrow, closed: bool = True):
+
+def get_page(url: str, client: PagureClient = None, frozen_till: int = None):
+    """
+    Retrieve the page returned by pagination.
+
+    Params:
+      url: Url for the page
+      client: Client used for the request. Default None will use the shared client.
+      frozen_till: End of the finished window the page is for, see `PagureClient.get`. Default: None
+
+    Returns:
+      Page as returned by pagure API, decoded by `page_decoder.decode_page`.
+
+    Raises:
+      PagureRequestError: If the page couldn't be retrieved even after retries.
+        Skipping the page would silently leave out the rest of the issues.
+    """
+    content = get_page_content(url, client=client, frozen_till=frozen_till)
+    with get_instrumentation().timer("decode"):
+        return decode_page(content)
+
+
+def get_page_content(url: str, client: PagureClient = None, frozen_till: int = None) -> bytes:
+    """
+    Retrieve the page returned by pagination without decoding it.
+
+    Params:
+      url: Url for the page
+      client: Client used for the request. Default None will use the shared client.
+      frozen_till: End of the finished window the page is for, see `PagureClient.get`. Default: None
+
+    Returns:
+      Body of the response.
+
+    Raises:
+      PagureRequestError: If the page couldn't be retrieved even after retries.
+    """
+    if client is None:
+        client = get_default_client()
+
+    try:
+        r = client.get(url, frozen_till=frozen_till)
+    except requests.RequestException as error:
+        raise PagureRequestError(url, reason=str(error)) from error
+
+    if r.status_code == requests.codes.ok:
+        get_instrumentation().count("bytes", len(r.content))
+        return r.content
+
+    _logger.error("Status code '{}' returned for url '{}'.".format(r.status_code, url))
+    raise PagureRequestError(url, r.status_code)
+
+
+def get_page_data(
+        url: str, till: arrow.Arrow, since: arrow.Arrow, closed: bool = True,
+        client: PagureClient = None, frozen_till: int = None
+):
     """
     Gets data from the current page returned by pagination.
+    See `parse_page` for the filtering done on the issues.
+
+    Params:
+      url: Url for the page
+      till: Till date for the issues
+      since: Since date for the issues
+      closed: Should we get closed or open issues. Default: True
+      client: Client used for the request. Default None will use the shared client.
+      frozen_till: End of the finished window the page is for, see `PagureClient.get`. Default: None
+
+    Returns:
+      Dictionary containing issues with data we care about. See `parse_page`.
+    """
+    return parse_page(
+        get_page(url, client=client, frozen_till=frozen_till), till, since, closed=closed
+    )
+
+
+def parse_page(page: dict, till: arrow.Arrow, since: arrow.Arrow, closed: bool = True):
+    """
+    Gets data from the page returned by pagination.
     If closed is set to True it will filter any issue not
     closed at time interval specified by since and till parameters.
     since < closed_at < till
@@ -204,7 +618,7 @@ def get_page_data(url: str, till: arrow.Arrow, since: arrow.Arrow, closed: bool
     since < date_created < till
 
     Params:
-      url: Url for the page
+      page: Page as returned by pagure API
       till: Till date for closed issues. This will take in account closed_at
             key of the issue.
       since: Since date for closed issues. This will take in account closed_at
@@ -215,100 +629,117 @@ def get_page_data(url: str, till: arrow.Arrow, since: arrow.Arrow, closed: bool
       Dictionary containing issues with data we care about.
 
     Example output::
-      # if closed is set to True
-      {
-        "issues": [
-          {
-            0: { # Id of the issue
-              "time_to_close": 10, # Time to close in days
-              "resolution": "fixed", # Resolution of the ticket
-              "gain": ["low-gain"], # Issue gain value tag
-              "trouble": ["low-trouble"], # Issue trouble value tag
-              "ops": True, # Issue has ops tag
-              "dev": True, # Issue has dev tag
-            },
-          },
-        ],
-        "total": 1, # Number of issues on the page
-        "next_page": "https://pagure.io/next_page" # URL for next page
-      }
-
-      # if closed is set to False
       {
         "issues": [
-          {
-            0: { # Id of the issue
-              "resolution": "fixed", # Resolution of the ticket
-              "gain": ["low-gain"], # Issue gain value tag
-              "trouble": ["low-trouble"], # Issue trouble value tag
-              "ops": True, # Issue has ops tag
-              "dev": True, # Issue has dev tag
-            },
-          },
+          IssueRecord(
+            id=0, # Id of the issue
+            date_created=1651234567, # Timestamp of creation
+            closed_at=1652234567, # Timestamp of closing
+            time_to_close=10, # Time to close in days, None if closed is set to False
+            resolution=1, # Code of the resolution of the ticket
+            gain=Gain.LOW, # Issue gain value tag
+            trouble=Trouble.LOW, # Issue trouble value tag
+            ops=True, # Issue has ops tag
+            dev=True, # Issue has dev tag
+          ),
         ],
         "total": 1, # Number of issues on the page
-        "next_page": "https://pagure.io/next_page" # URL for next page
+        "next_page": "https://pagure.io/next_page", # URL for next page
+        "pages": 1, # Number of pages in pagination
       }
     """
-    r = requests.get(url)
     data = {
         "issues": [],
         "total": 0,
-        "next_page": None,
+        "next_page": page["pagination"]["next"],
+        "pages": page["pagination"]["pages"],
     }
 
-    if r.status_code == requests.codes.ok:
-        page = r.json()
+    till, since = epoch_bounds(till, since)
+    with get_instrumentation().timer("filter"):
         for issue in page["issues"]:
-            # Skip the ticket if any of the dates is not filled
-            if not issue["date_created"]:
-                continue
-            if closed:
-                if not issue["closed_at"]:
-                    continue
-
-                closed_at = arrow.Arrow.fromtimestamp(issue["closed_at"])
-
-                if closed_at < since or closed_at > till:
-                    continue
-
-                #click.echo("Issue was closed at: {}".format(closed_at.format("DD.MM.YYYY")))
-                #click.echo("{} < {} < {}".format(since.format("DD.MM.YYYY"), closed_at.format("DD.MM.YYYY"), till.format("DD.MM.YYYY")))
-
-                entry = {
-                    issue["id"]: {
-                        "time_to_close": (closed_at - arrow.Arrow.fromtimestamp(issue["date_created"])).days,
-                        "resolution": issue["close_status"],
-                        "gain": [tag for tag in issue["tags"] if tag in GAIN_VALUES],
-                        "trouble": [tag for tag in issue["tags"] if tag in TROUBLE_VALUES],
-                        "ops": "ops" in issue["tags"],
-                        "dev": "dev" in issue["tags"],
-                    }
-                }
-
-            else:
-                date_created = arrow.Arrow.fromtimestamp(issue["date_created"])
-
-                if date_created < since or date_created > till:
-                    continue
-
-                #click.echo("Issue was opened at: {}".format(date_created.format("DD.MM.YYYY")))
-                #click.echo("{} < {} < {}".format(since.format("DD.MM.YYYY"), date_created.format("DD.MM.YYYY"), till.format("DD.MM.YYYY")))
-
-                entry = {
-                    issue["id"]: {
-                        "resolution": issue.get("close_status", ""),
-                        "gain": [tag for tag in issue["tags"] if tag in GAIN_VALUES],
-                        "trouble": [tag for tag in issue["tags"] if tag in TROUBLE_VALUES],
-                        "ops": "ops" in issue["tags"],
-                        "dev": "dev" in issue["tags"],
-                    }
-                }
-
-            data["issues"].append(entry)
-        data["total"] = len(data["issues"])
-        data["next_page"] = page["pagination"]["next"]
-    else:
-        _logger.error("Status code '{}' returned for url '{}'. Skipping...".format(r.status_code, url))
+            record = _parse_issue(issue, till, since, closed=closed)
+            if record:
+                data["issues"].append(record)
+    data["total"] = len(data["issues"])
 
     return data
+
+
+def parse_issue(issue: dict, till: arrow.Arrow, since: arrow.Arrow, closed: bool = True):
+    """
+    Gets data from the issue returned by pagure API.
+    See `parse_page` for the filtering done on the issue.
+
+    Params:
+      issue: Issue as returned by pagure API
+      till: Till date for the issue
+      since: Since date for the issue
+      closed: Should we get closed or open issue. Default: True
+
+    Returns:
+      `IssueRecord` with the data we care about or None if the issue was filtered out.
+      See `parse_page` for the example of the record.
+    """
+    till, since = epoch_bounds(till, since)
+    return _parse_issue(issue, till, since, closed=closed)
+
+
+def epoch_bounds(till: arrow.Arrow, since: arrow.Arrow):
+    """
+    Convert the dates limiting the issues to integer timestamps.
+
+    Timestamps of the issues are whole seconds, so comparing them with since
+    rounded up and till rounded down gives the same result as comparing
+    them with the dates themselves.
+
+    Params:
+      till: Till date for the issues
+      since: Since date for the issues
+
+    Returns:
+      Tuple with till and since timestamps.
+    """
+    return math.floor(till.timestamp()), math.ceil(since.timestamp())
+
+
+def _parse_issue(issue: dict, till: int, since: int, closed: bool = True):
+    """
+    Same as `parse_issue`, but with till and since converted by `epoch_bounds`.
+    """
+    # Skip the ticket if any of the dates is not filled
+    if not issue["date_created"]:
+        return None
+    if closed:
+        if not issue["closed_at"]:
+            return None
+
+        closed_at = int(issue["closed_at"])
+
+        if closed_at < since or closed_at > till:
+            return None
+
+        record = to_record(issue, time_to_close=time_to_close(issue))
+
+    else:
+        date_created = int(issue["date_created"])
+
+        if date_created < since or date_created > till:
+            return None
+
+        record = to_record(issue)
+
+    return record
+
+
+def time_to_close(issue: dict):
+    """
+    Compute time to close of the closed issue.
+
+    Params:
+      issue: Closed issue as returned by pagure API
+
+    Returns:
+      Time to close in whole days, rounded down.
+    """
+    return (int(issue["closed_at"]) - int(issue["date_created"])) // DAY
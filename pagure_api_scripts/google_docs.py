@@ -1,12 +1,19 @@
 """Script for working with google docs with pagure_api_scripts."""
+import datetime
 import os.path
+import random
 
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from pagure_api_scripts.instrumentation import get_instrumentation
+from pagure_api_scripts.sheet_layout import Formula, SheetLayout
+
 # If modifying these scopes, delete the file token.json.
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
@@ -35,19 +42,115 @@ NEGATIVE_RESOLUTION = [
     "Wrong tracker",
 ]
 
+# Formats used in the sheet
+REPOSITORY_FORMAT = {
+    "textFormat": {
+        "bold": True,
+    },
+    "horizontalAlignment": "CENTER"
+}
+TITLE_FORMAT = {
+    "textFormat": {
+        "bold": True,
+    },
+}
+POSITIVE_FORMAT = {
+    "backgroundColor": {
+        "green": 0.9,
+        "red": 0.7,
+        "blue": 0.7
+    },
+}
+NEGATIVE_FORMAT = {
+    "backgroundColor": {
+        "green": 0.8,
+        "red": 1.0,
+        "blue": 0.8
+    },
+}
+
+# Number of columns used by one repository, including the empty space
+REPOSITORY_WIDTH = 4
+
+# Blocks of data shown for every repository under the repository name.
+# Every block starts at the row, the optional title is merged over both columns
+# and every row contains label and value found by the path in repository data.
+# Resolution block lists the positive and then the negative resolutions.
+SHEET_BLOCKS = [
+    {
+        "row": 1,
+        "rows": [
+            ("Opened issues", ("Opened issues",)),
+            ("Closed issues", ("Closed issues", "total")),
+        ],
+    },
+    {
+        "row": 4,
+        "title": "Time to Close (days):",
+        "rows": [
+            ("Maximum", ("Closed issues", "maximum_ttc")),
+            ("Minimum", ("Closed issues", "minimum_ttc")),
+            ("Average", ("Closed issues", "average_ttc")),
+            ("Median", ("Closed issues", "median_ttc")),
+        ],
+    },
+    {
+        "row": 10,
+        "title": "Resolution",
+        "resolutions": True,
+    },
+    {
+        "row": 21,
+        "title": "Gain",
+        "rows": [
+            (tag, ("Closed issues", "gain", tag))
+            for tag in ("no_tag", "low-gain", "medium-gain", "high-gain")
+        ],
+    },
+    {
+        "row": 27,
+        "title": "Trouble",
+        "rows": [
+            (tag, ("Closed issues", "trouble", tag))
+            for tag in ("no_tag", "low-trouble", "medium-trouble", "high-trouble")
+        ],
+    },
+    {
+        "row": 33,
+        "rows": [
+            ("Ops", ("Closed issues", "ops")),
+            ("Dev", ("Closed issues", "dev")),
+        ],
+    },
+]
+
+
+# Credentials are refreshed when they expire in less than this number of seconds
+REFRESH_MARGIN = 300
+
+# Credentials and Sheets service shared by all the calls in the process
+_credentials = None
+_service = None
+_service_credentials = None
+
 
 def authenticate():
     """
     Authenticate using google API
+
+    The credentials are loaded only once per process and refreshed
+    before they expire.
     """
+    global _credentials
+    creds = _credentials
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
     # time.
-    if os.path.exists("token.json"):
+    if not creds and os.path.exists("token.json"):
         creds = Credentials.from_authorized_user_file("token.json", SCOPES)
     # If there are no (valid) credentials available, let the user log in.
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
+    if not creds or not creds.valid or _expires_soon(creds):
+        if creds and creds.refresh_token:
             creds.refresh(Request())
         else:
             flow = InstalledAppFlow.from_client_secrets_file(
@@ -58,660 +161,204 @@ def authenticate():
         with open("token.json", "w") as token:
             token.write(creds.to_json())
 
+    _credentials = creds
     return creds
 
 
+def _expires_soon(creds: Credentials) -> bool:
+    """
+    Check if the credentials expire in less than `REFRESH_MARGIN` seconds.
+
+    Params:
+      creds: Credentials to check
+
+    Returns:
+      True if the credentials should be refreshed.
+    """
+    if not creds.expiry:
+        return False
+    # google.auth keeps expiry as naive UTC datetime
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return creds.expiry - now < datetime.timedelta(seconds=REFRESH_MARGIN)
+
+
+def get_service():
+    """
+    Return Sheets service shared by all the calls in the process.
+
+    The service is built only once from the discovery document shipped with
+    google-api-python-client and keeps its HTTP transport open. The service is not
+    thread safe, use it only from one thread.
+
+    Returns:
+      Sheets service.
+    """
+    global _service, _service_credentials
+    creds = authenticate()
+    # Credentials refreshed in place are picked up by the transport,
+    # new credentials from the authorization flow need new service
+    if _service is None or _service_credentials is not creds:
+        http = AuthorizedHttp(creds, http=httplib2.Http())
+        _service = build("sheets", "v4", http=http, cache_discovery=False, static_discovery=True)
+        _service_credentials = creds
+    return _service
+
+
 def add_new_sheet(data: dict, spreadsheet: str):
     """
     Add new sheet with provided data to document.
 
+    Building of the requests is measured as `sheets_build` phase, authentication
+    and the request to Google Sheets API as `sheets_api` phase.
+
     Params:
       data: Data to put in the new sheet
       spreadsheet: Spreadsheet to update
     """
-    creds = authenticate()
+    instrumentation = get_instrumentation()
     try:
-        service = build("sheets", "v4", credentials=creds)
-
-        requests = []
-
-        # Create a new sheet
-        requests.append(
-            {
-                "addSheet": {
-                    "properties": {
-                        "title": (
-                            data["since"].format("DD.MM.") + "-" +
-                            data["till"].format("DD.MM.YYYY")
-                        )
-                    }
-                }
-            }
-        )
-        body = {"requests": requests}
+        with instrumentation.timer("sheets_api"):
+            service = get_service()
 
-        response = (
-            service.spreadsheets()
-            .batchUpdate(spreadsheetId=spreadsheet, body=body)
-            .execute()
-        )
-        for reply in response.get("replies"):
-            if "addSheet" in reply:
-                sheetId = reply.get("addSheet").get("properties").get("sheetId")
-
-        requests = []
-
-        # Merge cells
-        column = 0
-        for repository in data["repositories"]:
-            # Repository name
-            requests.append(
-                {
-                    "mergeCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 0,
-                            "endRowIndex": 1,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        }
-                    }
-                }
-            )
-            # Time to close
-            requests.append(
-                {
-                    "mergeCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 4,
-                            "endRowIndex": 5,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        }
-                    }
-                }
-            )
-            # Resolution
-            requests.append(
-                {
-                    "mergeCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 10,
-                            "endRowIndex": 11,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        }
-                    }
-                }
-            )
-            # Gain
-            requests.append(
-                {
-                    "mergeCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 21,
-                            "endRowIndex": 22,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        }
-                    }
-                }
-            )
-            # Trouble
-            requests.append(
-                {
-                    "mergeCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 27,
-                            "endRowIndex": 28,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        }
-                    }
-                }
-            )
-            column += 4
-
-        column = 0
-        # Prepare the ranges with the data
-        for repository in data["repositories"]:
-            # Repository name with link
-            requests.append(
-                {
-                    "updateCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 0,
-                            "endRowIndex": 1,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        },
-                        "fields": "*",
-                        "rows": [
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "formulaValue": f"=HYPERLINK(\"{PAGURE_URL + repository + '/issues'}\", \"{repository}\")",
-                                        },
-                                        "userEnteredFormat": {
-                                            "textFormat": {
-                                                "bold": True,
-                                            },
-                                            "horizontalAlignment": "CENTER"
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                }
-            )
-            # Total Open/Closed issues
-            requests.append(
-                {
-                    "updateCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 1,
-                            "endRowIndex": 3,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        },
-                        "fields": "*",
-                        "rows": [
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Opened issues",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Opened issues"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Closed issues",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["total"],
-                                        },
-                                    },
-                                ]
-                            },
-                        ]
-                    }
-                }
-            )
-            # Time to close
-            requests.append(
-                {
-                    "updateCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 4,
-                            "endRowIndex": 10,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        },
-                        "fields": "*",
-                        "rows": [
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Time to Close (days):",
-                                        },
-                                        "userEnteredFormat": {
-                                            "textFormat": {
-                                                "bold": True,
-                                            },
-                                        }
-                                    }
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Maximum",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["maximum_ttc"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Minimum",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["minimum_ttc"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Average",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["average_ttc"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Median",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["median_ttc"],
-                                        },
-                                    },
-                                ]
-                            },
-                        ]
-                    }
-                }
-            )
+        with instrumentation.timer("sheets_build"):
+            new_sheet_id = sheet_id()
+            body = {"requests": build_requests(data, new_sheet_id)}
 
-            # Resolution
-            requests.append(
-                {
-                    "updateCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 10,
-                            "endRowIndex": 11,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        },
-                        "fields": "*",
-                        "rows": [
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Resolution",
-                                        },
-                                        "userEnteredFormat": {
-                                            "textFormat": {
-                                                "bold": True,
-                                            },
-                                        }
-                                    }
-                                ]
-                            },
-                        ]
-                    }
-                }
-            )
+        # Everything is sent in one request, the new sheet is created
+        # with its id assigned by us, so the following requests can reference it
+        try:
+            with instrumentation.timer("sheets_api"):
+                service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet, body=body).execute()
+        except HttpError as err:
+            # The whole batch is rejected when the id is already used by another sheet,
+            # retry with id which isn't used by any of them
+            if err.resp.status != 400:
+                raise
+            with instrumentation.timer("sheets_api"):
+                existing = sheet_ids(service, spreadsheet)
+            if new_sheet_id not in existing:
+                raise
+            with instrumentation.timer("sheets_build"):
+                body = {"requests": build_requests(data, sheet_id(existing))}
+            with instrumentation.timer("sheets_api"):
+                service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet, body=body).execute()
 
-            row = 11
-            # Positive resolutions
-            for resolution in data["repositories"][repository]["Closed issues"]["resolution"]:
-                if resolution in POSITIVE_RESOLUTION:
-                    requests.append(
-                        {
-                            "updateCells": {
-                                "range": {
-                                    "sheetId": sheetId,
-                                    "startRowIndex": row,
-                                    "endRowIndex": row + 1,
-                                    "startColumnIndex": column,
-                                    "endColumnIndex": column + 2
-                                },
-                                "fields": "*",
-                                "rows": [
-                                    {
-                                        "values": [
-                                            {
-                                                "userEnteredValue": {
-                                                    "stringValue": resolution,
-                                                },
-                                                "userEnteredFormat": {
-                                                    "backgroundColor": {
-                                                        "green": 0.9,
-                                                        "red": 0.7,
-                                                        "blue": 0.7
-                                                    },
-                                                }
-                                            },
-                                            {
-                                                "userEnteredValue": {
-                                                    "numberValue": data["repositories"][repository]["Closed issues"]["resolution"][resolution],
-                                                },
-                                                "userEnteredFormat": {
-                                                    "backgroundColor": {
-                                                        "green": 0.9,
-                                                        "red": 0.7,
-                                                        "blue": 0.7
-                                                    },
-                                                }
-                                            },
-                                        ]
-                                    },
-                                ]
-                            }
-                        }
-                    )
-                    row += 1
-
-            # Negative resolutions
-            for resolution in data["repositories"][repository]["Closed issues"]["resolution"]:
-                if resolution in NEGATIVE_RESOLUTION:
-                    requests.append(
-                        {
-                            "updateCells": {
-                                "range": {
-                                    "sheetId": sheetId,
-                                    "startRowIndex": row,
-                                    "endRowIndex": row + 1,
-                                    "startColumnIndex": column,
-                                    "endColumnIndex": column + 2
-                                },
-                                "fields": "*",
-                                "rows": [
-                                    {
-                                        "values": [
-                                            {
-                                                "userEnteredValue": {
-                                                    "stringValue": resolution,
-                                                },
-                                                "userEnteredFormat": {
-                                                    "backgroundColor": {
-                                                        "green": 0.8,
-                                                        "red": 1.0,
-                                                        "blue": 0.8
-                                                    },
-                                                }
-                                            },
-                                            {
-                                                "userEnteredValue": {
-                                                    "numberValue": data["repositories"][repository]["Closed issues"]["resolution"][resolution],
-                                                },
-                                                "userEnteredFormat": {
-                                                    "backgroundColor": {
-                                                        "green": 0.8,
-                                                        "red": 1.0,
-                                                        "blue": 0.8
-                                                    },
-                                                }
-                                            },
-                                        ]
-                                    },
-                                ]
-                            }
-                        }
-                    )
-                    row += 1
-
-            # Gain
-            requests.append(
-                {
-                    "updateCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 21,
-                            "endRowIndex": 26,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        },
-                        "fields": "*",
-                        "rows": [
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Gain",
-                                        },
-                                        "userEnteredFormat": {
-                                            "textFormat": {
-                                                "bold": True,
-                                            },
-                                        }
-                                    }
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "no_tag",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["gain"]["no_tag"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "low-gain",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["gain"]["low-gain"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "medium-gain",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["gain"]["medium-gain"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "high-gain",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["gain"]["high-gain"],
-                                        },
-                                    },
-                                ]
-                            },
-                        ]
-                    }
-                }
-            )
+    except HttpError as err:
+        print(err)
 
-            # Trouble
-            requests.append(
-                {
-                    "updateCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 27,
-                            "endRowIndex": 32,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        },
-                        "fields": "*",
-                        "rows": [
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Trouble",
-                                        },
-                                        "userEnteredFormat": {
-                                            "textFormat": {
-                                                "bold": True,
-                                            },
-                                        }
-                                    }
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "no_tag",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["trouble"]["no_tag"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "low-trouble",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["trouble"]["low-trouble"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "medium-trouble",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["trouble"]["medium-trouble"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "high-trouble",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["trouble"]["high-trouble"],
-                                        },
-                                    },
-                                ]
-                            },
-                        ]
-                    }
-                }
-            )
 
-            # Ops/Dev
-            requests.append(
-                {
-                    "updateCells": {
-                        "range": {
-                            "sheetId": sheetId,
-                            "startRowIndex": 33,
-                            "endRowIndex": 35,
-                            "startColumnIndex": column,
-                            "endColumnIndex": column + 2
-                        },
-                        "fields": "*",
-                        "rows": [
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Ops",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["ops"],
-                                        },
-                                    },
-                                ]
-                            },
-                            {
-                                "values": [
-                                    {
-                                        "userEnteredValue": {
-                                            "stringValue": "Dev",
-                                        },
-                                    },
-                                    {
-                                        "userEnteredValue": {
-                                            "numberValue": data["repositories"][repository]["Closed issues"]["dev"],
-                                        },
-                                    },
-                                ]
-                            },
-                        ]
-                    }
-                }
-            )
-            column += 4
-
-        requests.append(
-            {
-                "autoResizeDimensions": {
-                    "dimensions": {
-                        "sheetId": sheetId,
-                        "dimension": "COLUMNS",
-                    }
+def sheet_ids(service, spreadsheet: str) -> set:
+    """
+    Retrieve ids of all the sheets in the spreadsheet.
+
+    Params:
+      service: Sheets service
+      spreadsheet: Spreadsheet to look at
+
+    Returns:
+      Set of sheet ids.
+    """
+    response = service.spreadsheets().get(
+        spreadsheetId=spreadsheet, fields="sheets.properties.sheetId"
+    ).execute()
+    return {sheet["properties"]["sheetId"] for sheet in response.get("sheets", [])}
+
+
+def sheet_id(existing: set = frozenset()) -> int:
+    """
+    Return random id for the new sheet.
+
+    Ids of the sheets in the spreadsheet are arbitrary, so random id could be
+    already used by another sheet, though it's very unlikely. `add_new_sheet`
+    retries with new id avoiding the used ones when that happens.
+
+    Params:
+      existing: Ids of the sheets already in the spreadsheet. Default: empty set
+
+    Returns:
+      Sheet id, positive 31-bit integer.
+    """
+    while True:
+        new_sheet_id = random.randint(1, 0x7FFFFFFF)
+        if new_sheet_id not in existing:
+            return new_sheet_id
+
+
+def build_requests(data: dict, sheetId: int = None):
+    """
+    Build the requests creating new sheet with provided data.
+
+    Params:
+      data: Data to put in the new sheet
+      sheetId: Id of the new sheet, random id is used if not provided. Default: None
+
+    Returns:
+      List of requests for `spreadsheets.batchUpdate`.
+    """
+    title = data["since"].format("DD.MM.") + "-" + data["till"].format("DD.MM.YYYY")
+    if sheetId is None:
+        sheetId = sheet_id()
+
+    layout = SheetLayout()
+    column = 0
+    for repository, repository_data in data["repositories"].items():
+        # Repository name with link
+        layout.merge(0, column)
+        layout.set(
+            0, column, Formula(f"=HYPERLINK(\"{PAGURE_URL + repository + '/issues'}\", \"{repository}\")"),
+            REPOSITORY_FORMAT
+        )
+        for block in SHEET_BLOCKS:
+            row = block["row"]
+            if "title" in block:
+                layout.merge(row, column)
+                layout.set(row, column, block["title"], TITLE_FORMAT)
+                row += 1
+            for label, path in block.get("rows", []):
+                value = repository_data
+                for key in path:
+                    value = value[key]
+                layout.set(row, column, label)
+                layout.set(row, column + 1, value)
+                row += 1
+            if block.get("resolutions"):
+                resolutions = repository_data["Closed issues"]["resolution"]
+                for names, cell_format in (
+                        (POSITIVE_RESOLUTION, POSITIVE_FORMAT),
+                        (NEGATIVE_RESOLUTION, NEGATIVE_FORMAT),
+                ):
+                    for resolution, count in resolutions.items():
+                        if resolution in names:
+                            layout.set(row, column, resolution, cell_format)
+                            layout.set(row, column + 1, count, cell_format)
+                            row += 1
+        column += REPOSITORY_WIDTH
+
+    requests = []
+
+    # Create a new sheet
+    requests.append(
+        {
+            "addSheet": {
+                "properties": {
+                    "sheetId": sheetId,
+                    "title": title,
                 }
             }
-        )
+        }
+    )
 
-        body = {"requests": requests}
+    requests.extend(layout.compile(sheetId))
 
-        service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet, body=body).execute()
+    requests.append(
+        {
+            "autoResizeDimensions": {
+                "dimensions": {
+                    "sheetId": sheetId,
+                    "dimension": "COLUMNS",
+                }
+            }
+        }
+    )
 
-    except HttpError as err:
-        print(err)
+    return requests
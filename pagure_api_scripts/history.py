@@ -0,0 +1,224 @@
+"""
+Statistics for many consecutive time windows computed from one fetch.
+
+All the issues for the whole range are retrieved once and every issue is
+added to the windows it was opened or closed in. The result for each window
+is the same as running `get_statistics.open_issues` and
+`get_statistics.closed_issues` for that window.
+"""
+import bisect
+import time
+
+import arrow
+
+from pagure_api_scripts.aggregator import IssueAggregator
+from pagure_api_scripts.get_statistics import fetch_issues, issues_url, time_to_close
+from pagure_api_scripts.instrumentation import get_instrumentation
+from pagure_api_scripts.issue_cache import IssueCache
+from pagure_api_scripts.issue_record import to_record
+from pagure_api_scripts.pagure_client import PagureClient
+from pagure_api_scripts.process_pool import aggregate_pages
+
+# Supported lengths of the window and the unit used to shift the dates
+PERIODS = {
+    "daily": "days",
+    "weekly": "weeks",
+    "monthly": "months",
+}
+
+
+def windows(till: arrow.Arrow, period: str, count: int):
+    """
+    Create consecutive time windows ending at till.
+
+    Params:
+      till: End of the last window
+      period: Length of the window, one of `PERIODS`
+      count: Number of windows
+
+    Returns:
+      List of (since, till) tuples from the oldest window.
+    """
+    unit = PERIODS[period]
+    boundaries = [till.shift(**{unit: -shift}) for shift in range(count, -1, -1)]
+    return list(zip(boundaries, boundaries[1:]))
+
+
+class HistoryAggregator:
+    """
+    Statistics of the issues for consecutive time windows.
+
+    Attributes:
+      windows: List of (since, till) tuples returned by `windows`
+      open_aggregators: Aggregator of open issues for every window
+      closed_aggregators: Aggregator of closed issues for every window
+    """
+
+    def __init__(self, window_list: list):
+        """
+        Create empty aggregators for the windows.
+
+        Params:
+          window_list: List of (since, till) tuples returned by `windows`
+        """
+        self.windows = window_list
+        self._starts = [since.timestamp() for since, _ in window_list]
+        self._ends = [till.timestamp() for _, till in window_list]
+        self.open_aggregators = [IssueAggregator(closed=False) for _ in window_list]
+        self.closed_aggregators = [IssueAggregator() for _ in window_list]
+
+    def add(self, issue: dict):
+        """
+        Add the issue to the windows it was opened or closed in.
+
+        Params:
+          issue: Issue as returned by pagure API with any status
+
+        Returns:
+          `IssueRecord` of the issue or None if the issue doesn't have creation date.
+        """
+        # Skip the ticket if any of the dates is not filled
+        if not issue["date_created"]:
+            return None
+
+        record = to_record(issue)
+        for index in self._find_windows(record.date_created):
+            self.open_aggregators[index].add(record)
+
+        # The same filter as `status=Closed` is doing on the server
+        if issue.get("status") == "Closed" and record.closed_at:
+            closed_windows = self._find_windows(record.closed_at)
+            if closed_windows:
+                record = record._replace(time_to_close=time_to_close(issue))
+            for index in closed_windows:
+                self.closed_aggregators[index].add(record)
+
+        return record
+
+    def add_issues(self, issues):
+        """
+        Add the issues to the windows they were opened or closed in.
+        The time is measured as `aggregate` phase.
+
+        Params:
+          issues: Iterable of issues as returned by pagure API with any status
+        """
+        aggregation = 0.0
+        for issue in issues:
+            start = time.perf_counter()
+            self.add(issue)
+            aggregation = aggregation + time.perf_counter() - start
+        get_instrumentation().add_time("aggregate", aggregation)
+
+    def merge(self, other: "HistoryAggregator"):
+        """
+        Add statistics from other aggregator for the same windows to this one.
+
+        Params:
+          other: Aggregator to merge
+
+        Returns:
+          This aggregator.
+        """
+        for mine, theirs in zip(self.open_aggregators, other.open_aggregators):
+            mine.merge(theirs)
+        for mine, theirs in zip(self.closed_aggregators, other.closed_aggregators):
+            mine.merge(theirs)
+        return self
+
+    def result(self):
+        """
+        Return the aggregated statistics for every window.
+
+        Returns:
+          List of dictionaries from the oldest window.
+
+        Example output::
+          [
+            {
+              "since": arrow.Arrow(...), # Start of the window
+              "till": arrow.Arrow(...), # End of the window
+              "open": {...}, # Same as the output of `get_statistics.open_issues`
+              "closed": {...}, # Same as the output of `get_statistics.closed_issues`
+            },
+          ]
+        """
+        with get_instrumentation().timer("aggregate"):
+            return [
+                {
+                    "since": since,
+                    "till": till,
+                    "open": open_aggregator.result(),
+                    "closed": closed_aggregator.result(),
+                }
+                for (since, till), open_aggregator, closed_aggregator in zip(
+                    self.windows, self.open_aggregators, self.closed_aggregators
+                )
+            ]
+
+    def _find_windows(self, timestamp: int):
+        """
+        Find the windows containing the timestamp.
+
+        Both ends of the window are inclusive, so timestamp on the boundary
+        belongs to both windows, same as with separate runs for each window.
+
+        Params:
+          timestamp: Timestamp to look for
+
+        Returns:
+          List of window indexes.
+        """
+        index = bisect.bisect_right(self._starts, timestamp) - 1
+        if index < 0 or timestamp > self._ends[index]:
+            return []
+        if index > 0 and timestamp <= self._ends[index - 1]:
+            return [index - 1, index]
+        return [index]
+
+
+def history(
+        till: arrow.Arrow, period: str, count: int, repository: str, workers: int = 1,
+        client: PagureClient = None, cache: IssueCache = None, processes: int = 1,
+        frozen_till: int = None
+):
+    """
+    Get open and closed issues statistics for consecutive windows from one fetch.
+
+    Params:
+      till: End of the last window
+      period: Length of the window, one of `PERIODS`
+      count: Number of windows
+      repository: Repository namespace to check
+      workers: How many pages to fetch in parallel. Default: 1
+      client: Client used for the requests. Default None will use the shared client.
+      cache: Local store of issues to sync and compute from. Default None will retrieve
+             all the issues from pagure.
+      processes: How many processes parse and aggregate the pages, see
+                 `process_pool.aggregate_pages`. Can't be used with cache. Default: 1
+      frozen_till: Timestamp of the end of the window, if it ended before the run started,
+                   so its pages could be reused without asking pagure, see `PagureClient.get`.
+                   Default None for window which isn't finished.
+
+    Returns:
+      Statistics for every window. See `HistoryAggregator.result`.
+    """
+    window_list = windows(till, period, count)
+
+    if processes > 1:
+        if cache:
+            raise ValueError("Issues from the cache can't be aggregated in process pool.")
+        return aggregate_pages(
+            issues_url(repository, window_list[0][0].int_timestamp),
+            lambda: HistoryAggregator(window_list), processes, workers=workers, client=client,
+            frozen_till=frozen_till
+        ).result()
+
+    aggregator = HistoryAggregator(window_list)
+
+    aggregator.add_issues(fetch_issues(
+        repository, window_list[0][0], workers=workers, client=client, cache=cache,
+        frozen_till=frozen_till
+    ))
+
+    return aggregator.result()
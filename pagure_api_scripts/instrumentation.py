@@ -0,0 +1,377 @@
+"""
+Instrumentation of the runs of pagure_api_scripts.
+
+Time spent in every phase of the run (requests to pagure, decoding of the pages,
+filtering of the issues, aggregation and the Google Sheets API), counters of
+requests, bytes and issues and histogram of the latency of requests to pagure
+are collected by one `Instrumentation` shared by the whole run, see
+`get_instrumentation`. They could be written as JSON or as Prometheus textfile
+read by node_exporter textfile collector. The run could be also profiled
+by cProfile or pyinstrument, see `Profiler`.
+
+Times of the phases are summed over all the threads and processes, so with
+multiple workers they could be longer than the whole run.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds of the buckets of the request latency histogram in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Prefix of the names of the Prometheus metrics
+PROMETHEUS_PREFIX = "pagure_api_scripts"
+
+# Supported profilers
+PROFILERS = ("cprofile", "pyinstrument")
+
+# Number of functions printed in cProfile report
+PROFILE_LINES = 30
+
+
+class Instrumentation:
+    """
+    Timers, counters and latency histogram of one run, could be shared by multiple threads.
+
+    Attributes:
+      phases: Dictionary with phase as key and dictionary with `seconds` and `calls` as value
+      counters: Dictionary with name of the counter as key and its value
+      latency: Number of requests in every bucket of `LATENCY_BUCKETS`, the last one
+               is for requests slower than all the buckets
+      latency_sum: Sum of latencies of all the requests in seconds
+      started: Timestamp when the run started
+    """
+
+    def __init__(self):
+        """
+        Create empty instrumentation, the run starts now.
+        """
+        self.phases = {}
+        self.counters = {}
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, phase: str):
+        """
+        Measure the time spent in the block as the phase.
+
+        Params:
+          phase: Name of the phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    @contextmanager
+    def request_timer(self):
+        """
+        Measure one request to pagure as `http` phase, count it and add its latency to the histogram.
+        """
+        self.count("requests")
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.add_time("http", seconds)
+            self.observe_latency(seconds)
+
+    def add_time(self, phase: str, seconds: float, calls: int = 1):
+        """
+        Add time spent in the phase.
+
+        Params:
+          phase: Name of the phase
+          seconds: Time spent in the phase
+          calls: How many times the phase was entered. Default: 1
+        """
+        with self._lock:
+            timer = self.phases.setdefault(phase, {"seconds": 0.0, "calls": 0})
+            timer["seconds"] = timer["seconds"] + seconds
+            timer["calls"] = timer["calls"] + calls
+
+    def merge_phases(self, phases: dict):
+        """
+        Add times of the phases measured elsewhere, for example in other process.
+
+        Params:
+          phases: Phases in the same format as `phases` attribute
+        """
+        for phase, timer in phases.items():
+            self.add_time(phase, timer["seconds"], timer["calls"])
+
+    def count(self, name: str, value: int = 1):
+        """
+        Increase the counter.
+
+        Params:
+          name: Name of the counter
+          value: Value to add. Default: 1
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_latency(self, seconds: float):
+        """
+        Add the latency of one request to the histogram.
+
+        Params:
+          seconds: Latency of the request
+        """
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            self.latency[bucket] = self.latency[bucket] + 1
+            self.latency_sum = self.latency_sum + seconds
+
+    def duration(self) -> float:
+        """
+        Return number of seconds since the run started.
+        """
+        return time.perf_counter() - self._start
+
+    def to_dict(self) -> dict:
+        """
+        Return everything collected as dictionary.
+
+        Returns:
+          Dictionary with all the values.
+
+        Example output::
+          {
+            "started": 1652234567.0, # Timestamp when the run started
+            "duration": 12.3, # Length of the run in seconds
+            "phases": {
+              "http": {"seconds": 10.1, "calls": 20},
+              ...
+            },
+            "counters": {
+              "requests": 20,
+              ...
+            },
+            "latency": {
+              "buckets": {"0.05": 0, "0.1": 2, ..., "+Inf": 20}, # Cumulative counts
+              "sum": 10.1,
+              "count": 20,
+            },
+          }
+        """
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), self.latency):
+                cumulative = cumulative + count
+                buckets[str(bound)] = cumulative
+            return {
+                "started": self.started,
+                "duration": self.duration(),
+                "phases": {phase: dict(timer) for phase, timer in self.phases.items()},
+                "counters": dict(self.counters),
+                "latency": {"buckets": buckets, "sum": self.latency_sum, "count": cumulative},
+            }
+
+    def write_json(self, path: str, command: str = None):
+        """
+        Write everything collected to JSON file.
+
+        Params:
+          path: Path to the file
+          command: Name of the command which was run. Default: None
+        """
+        data = self.to_dict()
+        data["command"] = command
+        _write_atomic(path, json.dumps(data, indent=2))
+
+    def write_prometheus(self, path: str, command: str = None):
+        """
+        Write everything collected to Prometheus textfile.
+
+        The file is replaced at once, so the textfile collector never reads
+        partially written file.
+
+        Params:
+          path: Path to the file, it needs to end with `.prom` for the textfile collector
+          command: Name of the command which was run, added as `command` label. Default: None
+        """
+        _write_atomic(path, self.prometheus(command))
+
+    def prometheus(self, command: str = None) -> str:
+        """
+        Return everything collected in Prometheus text format.
+
+        Params:
+          command: Name of the command which was run, added as `command` label. Default: None
+
+        Returns:
+          Metrics in Prometheus text format.
+        """
+        data = self.to_dict()
+        labels = 'command="{}"'.format(command or "")
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP {}_{} {}".format(PROMETHEUS_PREFIX, name, help_text))
+            lines.append("# TYPE {}_{} {}".format(PROMETHEUS_PREFIX, name, kind))
+            for suffix, sample_labels, value in samples:
+                lines.append("{}_{}{}{{{}}} {}".format(
+                    PROMETHEUS_PREFIX, name, suffix, sample_labels, value))
+
+        metric("last_run_timestamp_seconds", "gauge", "Time when the last run started.", [
+            ("", labels, data["started"])
+        ])
+        metric("run_duration_seconds", "gauge", "Length of the last run.", [
+            ("", labels, data["duration"])
+        ])
+        metric("phase_seconds", "gauge", "Time spent in each phase of the last run.", [
+            ("", '{},phase="{}"'.format(labels, phase), timer["seconds"])
+            for phase, timer in sorted(data["phases"].items())
+        ])
+        metric("phase_calls", "gauge", "How many times each phase was entered in the last run.", [
+            ("", '{},phase="{}"'.format(labels, phase), timer["calls"])
+            for phase, timer in sorted(data["phases"].items())
+        ])
+        for name, value in sorted(data["counters"].items()):
+            metric(name, "gauge", "Number of {} in the last run.".format(name.replace("_", " ")), [
+                ("", labels, value)
+            ])
+        metric(
+            "http_request_duration_seconds", "histogram",
+            "Latency of the requests to pagure in the last run.",
+            [
+                ("_bucket", '{},le="{}"'.format(labels, bound), count)
+                for bound, count in data["latency"]["buckets"].items()
+            ] + [
+                ("_sum", labels, data["latency"]["sum"]),
+                ("_count", labels, data["latency"]["count"]),
+            ]
+        )
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """
+        Return human readable summary of the phases and counters.
+        """
+        data = self.to_dict()
+        lines = ["Run took {:.2f}s".format(data["duration"])]
+        for phase, timer in sorted(data["phases"].items(), key=lambda item: -item[1]["seconds"]):
+            lines.append("  {:14} {:9.3f}s in {} calls".format(phase, timer["seconds"], timer["calls"]))
+        for name, value in sorted(data["counters"].items()):
+            lines.append("  {:14} {}".format(name, value))
+        return "\n".join(lines)
+
+
+def _write_atomic(path: str, content: str):
+    """
+    Write the content to temporary file and move it over the path.
+
+    Params:
+      path: Path to the file
+      content: Content of the file
+    """
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary, "w") as output:
+        output.write(content)
+    os.replace(temporary, path)
+
+
+_instrumentation = Instrumentation()
+
+
+def get_instrumentation() -> Instrumentation:
+    """
+    Return the instrumentation of the current run.
+
+    Returns:
+      Shared `Instrumentation` instance.
+    """
+    return _instrumentation
+
+
+def reset_instrumentation() -> Instrumentation:
+    """
+    Start new run with empty instrumentation.
+
+    The old instrumentation is replaced instead of cleared, so this is safe
+    to call in forked process even if other thread held its lock.
+
+    Returns:
+      New shared `Instrumentation` instance.
+    """
+    global _instrumentation
+    _instrumentation = Instrumentation()
+    return _instrumentation
+
+
+class Profiler:
+    """
+    Profiler of the whole run using cProfile or pyinstrument.
+
+    Attributes:
+      kind: "cprofile" or "pyinstrument"
+      output: Path to the report, None to print it to stderr
+    """
+
+    def __init__(self, kind: str, output: str = None):
+        """
+        Create the profiler, it's not started yet.
+
+        Params:
+          kind: "cprofile" or "pyinstrument"
+          output: Path to the report. cProfile report is saved in pstats format,
+                  pyinstrument report as HTML. Default None will print text report to stderr.
+
+        Raises:
+          RuntimeError: If pyinstrument is requested, but not installed.
+        """
+        self.kind = kind
+        self.output = output
+        if kind == "cprofile":
+            self._profiler = cProfile.Profile()
+        else:
+            try:
+                # Import here, pyinstrument is optional and only needed by --profile pyinstrument
+                import pyinstrument
+            except ImportError:
+                raise RuntimeError("Profiling by pyinstrument requires pyinstrument. Install it by `pip install pyinstrument`.")
+            self._profiler = pyinstrument.Profiler()
+
+    def start(self):
+        """
+        Start profiling.
+        """
+        if self.kind == "cprofile":
+            self._profiler.enable()
+        else:
+            self._profiler.start()
+
+    def stop(self):
+        """
+        Stop profiling and write the report.
+        """
+        if self.kind == "cprofile":
+            self._profiler.disable()
+            if self.output:
+                self._profiler.dump_stats(self.output)
+            else:
+                stream = io.StringIO()
+                pstats.Stats(self._profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_LINES)
+                sys.stderr.write(stream.getvalue())
+        else:
+            self._profiler.stop()
+            if self.output:
+                with open(self.output, "w") as output:
+                    output.write(self._profiler.output_html())
+            else:
+                sys.stderr.write(self._profiler.output_text())
@@ -0,0 +1,165 @@
+"""
+Local store of pagure issues used by pagure_api_scripts.
+
+Issues are kept in SQLite database keyed by repository and issue id.
+The first sync for the repository retrieves all the issues updated since
+the requested date, every next sync only retrieves the issues updated since
+the last sync and upserts them.
+"""
+import json
+import logging
+import os
+import sqlite3
+
+import arrow
+
+from pagure_api_scripts.pagure_client import PagureClient
+
+# Default directory for the cache
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pagure_api_scripts")
+
+# Name of the database file in the cache directory
+CACHE_FILE = "issues.sqlite"
+
+# How many seconds before the last sync should the next sync start.
+# This covers issues updated while the last sync was running.
+SYNC_OVERLAP = 60
+
+_logger = logging.getLogger(__name__)
+
+
+class IssueCache:
+    """
+    SQLite store of pagure issues.
+
+    Attributes:
+      connection: Connection to the SQLite database
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        """
+        Open the cache and create the tables if they don't exist.
+
+        Params:
+          cache_dir: Directory where the database is stored
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(cache_dir, CACHE_FILE))
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS issues ("
+                "repository TEXT NOT NULL, "
+                "id INTEGER NOT NULL, "
+                "status TEXT, "
+                "date_created INTEGER, "
+                "closed_at INTEGER, "
+                "close_status TEXT, "
+                "tags TEXT NOT NULL, "
+                "last_updated INTEGER NOT NULL, "
+                "PRIMARY KEY (repository, id))"
+            )
+            # since: All issues updated after this timestamp are in the cache
+            # synced_at: Timestamp of the start of the last sync
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS sync ("
+                "repository TEXT PRIMARY KEY, "
+                "since INTEGER NOT NULL, "
+                "synced_at INTEGER NOT NULL)"
+            )
+
+    def sync(
+            self, repository: str, since: arrow.Arrow, workers: int = 1,
+            client: PagureClient = None
+    ):
+        """
+        Retrieve the issues changed since the last sync and store them in the cache.
+
+        If the cache doesn't contain the issues since the requested date yet,
+        all issues updated since that date are retrieved.
+
+        Params:
+          repository: Repository namespace to sync
+          since: The cache needs to contain all issues updated since this date
+          workers: How many pages to fetch in parallel. Default: 1
+          client: Client used for the requests. Default None will use the shared client.
+        """
+        # Import here to avoid circular import
+        from pagure_api_scripts.get_statistics import fetch_pages, issues_url
+
+        synced_at = arrow.utcnow().int_timestamp
+        row = self.connection.execute(
+            "SELECT since, synced_at FROM sync WHERE repository = ?", (repository,)
+        ).fetchone()
+
+        if row is None or since.int_timestamp < row[0]:
+            fetch_since = since.int_timestamp
+            covered_since = since.int_timestamp
+        else:
+            fetch_since = row[1] - SYNC_OVERLAP
+            covered_since = row[0]
+
+        _logger.info("Syncing issues from '{}' updated since {}".format(repository, fetch_since))
+
+        url = issues_url(repository, fetch_since)
+        with self.connection:
+            for page in fetch_pages(url, workers=workers, client=client):
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO issues "
+                    "(repository, id, status, date_created, closed_at, close_status, tags, last_updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            repository,
+                            issue["id"],
+                            issue.get("status"),
+                            int(issue["date_created"]) if issue["date_created"] else None,
+                            int(issue["closed_at"]) if issue["closed_at"] else None,
+                            issue.get("close_status"),
+                            json.dumps(issue["tags"]),
+                            int(issue.get("last_updated") or issue["date_created"] or 0),
+                        )
+                        for issue in page["issues"]
+                    ]
+                )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sync (repository, since, synced_at) VALUES (?, ?, ?)",
+                (repository, covered_since, synced_at)
+            )
+
+    def issues(self, repository: str, since: arrow.Arrow, status: str = "all"):
+        """
+        Get issues from the cache in the same format as pagure API returns them.
+
+        Params:
+          repository: Repository namespace
+          since: Only return issues updated since this date, same as pagure API does
+          status: Only return issues with this status. Default "all" returns every issue.
+
+        Returns:
+          Generator of issue dictionaries.
+        """
+        query = (
+            "SELECT id, status, date_created, closed_at, close_status, tags FROM issues "
+            "WHERE repository = ? AND last_updated >= ?"
+        )
+        params = [repository, since.int_timestamp]
+        if status != "all":
+            query = query + " AND status = ?"
+            params.append(status)
+        query = query + " ORDER BY date_created DESC, id DESC"
+
+        for row in self.connection.execute(query, params):
+            yield {
+                "id": row[0],
+                "status": row[1],
+                "date_created": row[2],
+                "closed_at": row[3],
+                "close_status": row[4],
+                "tags": json.loads(row[5]),
+            }
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        self.connection.close()
@@ -0,0 +1,143 @@
+"""
+Compact representation of the issue used by pagure_api_scripts.
+
+Every issue we care about is kept as `IssueRecord` tuple. Resolutions are
+interned into small integer codes and gain and trouble tags are stored
+as `Gain` and `Trouble` codes.
+"""
+import threading
+from enum import IntEnum
+from typing import NamedTuple, Optional
+
+GAIN_VALUES = [
+    "low-gain",
+    "medium-gain",
+    "high-gain"
+]
+
+TROUBLE_VALUES = [
+    "low-trouble",
+    "medium-trouble",
+    "high-trouble"
+]
+
+
+class Gain(IntEnum):
+    """
+    Code of the gain tag of the issue.
+    """
+    NO_TAG = 0
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+
+
+class Trouble(IntEnum):
+    """
+    Code of the trouble tag of the issue.
+    """
+    NO_TAG = 0
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+
+
+# Names of the codes as used in aggregated statistics
+GAIN_NAMES = ["no_tag"] + GAIN_VALUES
+TROUBLE_NAMES = ["no_tag"] + TROUBLE_VALUES
+
+# Tag to code mapping
+GAIN_CODES = {tag: Gain(code) for code, tag in enumerate(GAIN_NAMES) if code}
+TROUBLE_CODES = {tag: Trouble(code) for code, tag in enumerate(TROUBLE_NAMES) if code}
+
+# Interned resolutions, code 0 means no resolution
+_resolutions = [None]
+_resolution_codes = {}
+_resolution_lock = threading.Lock()
+
+
+class IssueRecord(NamedTuple):
+    """
+    Data we care about for one issue.
+
+    Attributes:
+      id: Id of the issue
+      date_created: When was the issue created as timestamp
+      closed_at: When was the issue closed as timestamp, None if not closed
+      time_to_close: Time to close in days, None if not computed
+      resolution: Code of the resolution, see `resolution_code`
+      gain: Code of the first gain tag of the issue
+      trouble: Code of the first trouble tag of the issue
+      ops: Issue has ops tag
+      dev: Issue has dev tag
+    """
+    id: int
+    date_created: int
+    closed_at: Optional[int]
+    time_to_close: Optional[int]
+    resolution: int
+    gain: Gain
+    trouble: Trouble
+    ops: bool
+    dev: bool
+
+
+def resolution_code(resolution: Optional[str]) -> int:
+    """
+    Return the code of the resolution. New resolutions get new code.
+
+    Params:
+      resolution: Resolution of the issue, empty value means no resolution
+
+    Returns:
+      Code of the resolution, 0 for no resolution.
+    """
+    if not resolution:
+        return 0
+    code = _resolution_codes.get(resolution)
+    if code is None:
+        with _resolution_lock:
+            code = _resolution_codes.get(resolution)
+            if code is None:
+                code = len(_resolutions)
+                _resolutions.append(resolution)
+                _resolution_codes[resolution] = code
+    return code
+
+
+def resolution_name(code: int) -> Optional[str]:
+    """
+    Return the resolution for the code.
+
+    Params:
+      code: Code returned by `resolution_code`
+
+    Returns:
+      Resolution, None for code 0.
+    """
+    return _resolutions[code]
+
+
+def to_record(issue: dict, time_to_close: Optional[int] = None) -> IssueRecord:
+    """
+    Create record from the issue returned by pagure API.
+
+    Params:
+      issue: Issue as returned by pagure API
+      time_to_close: Time to close of the issue in days
+
+    Returns:
+      Record of the issue.
+    """
+    tags = issue["tags"]
+    return IssueRecord(
+        id=issue["id"],
+        date_created=int(issue["date_created"]),
+        closed_at=int(issue["closed_at"]) if issue.get("closed_at") else None,
+        time_to_close=time_to_close,
+        resolution=resolution_code(issue.get("close_status")),
+        gain=next((GAIN_CODES[tag] for tag in tags if tag in GAIN_CODES), Gain.NO_TAG),
+        trouble=next((TROUBLE_CODES[tag] for tag in tags if tag in TROUBLE_CODES), Trouble.NO_TAG),
+        ops="ops" in tags,
+        dev="dev" in tags,
+    )
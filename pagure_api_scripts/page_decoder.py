@@ -0,0 +1,90 @@
+"""
+Decoding of the pages of issues returned by pagure API used by pagure_api_scripts.
+
+Pages contain full issues with their content, comments and users, but only
+few fields of every issue are used. When msgspec is installed, the pages are
+decoded by typed schema, which skips all the other fields without creating
+Python objects for them. Otherwise orjson is used when it's installed and
+the standard json module as the last resort. All the backends return
+the same dictionaries for the fields we use.
+"""
+import json
+from typing import List, Optional, TypedDict, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class Issue(TypedDict, total=False):
+    """
+    Fields of the issue used by pagure_api_scripts.
+    """
+    id: int
+    status: Optional[str]
+    date_created: Union[int, str, None]
+    closed_at: Union[int, str, None]
+    last_updated: Union[int, str, None]
+    close_status: Optional[str]
+    tags: List[str]
+
+
+class Pagination(TypedDict, total=False):
+    """
+    Fields of the pagination used by pagure_api_scripts.
+    """
+    next: Optional[str]
+    pages: int
+
+
+class Page(TypedDict, total=False):
+    """
+    Fields of the page used by pagure_api_scripts.
+    """
+    issues: List[Issue]
+    pagination: Pagination
+    total_issues: int
+
+
+_msgspec_decoder = msgspec.json.Decoder(Page) if msgspec is not None else None
+
+
+def backend() -> str:
+    """
+    Return the name of the backend used by `decode_page`.
+
+    Returns:
+      "msgspec", "orjson" or "json".
+    """
+    if _msgspec_decoder is not None:
+        return "msgspec"
+    if orjson is not None:
+        return "orjson"
+    return "json"
+
+
+def decode_page(content: bytes, use_backend: str = None) -> dict:
+    """
+    Decode the page of issues.
+
+    Params:
+      content: Body of the response
+      use_backend: Name of the backend to use, see `backend`. Default None will use
+                   the fastest installed backend.
+
+    Returns:
+      Page as returned by pagure API. With msgspec backend only the fields
+      defined by `Page` are present.
+    """
+    use_backend = use_backend or backend()
+    if use_backend == "msgspec":
+        return _msgspec_decoder.decode(content)
+    if use_backend == "orjson":
+        return orjson.loads(content)
+    return json.loads(content)
@@ -0,0 +1,245 @@
+"""
+Client for the pagure API used by pagure_api_scripts.
+
+It holds a pooled keep-alive session, so the connections are reused
+across the pages and across the repositories. Requests are rate limited
+and retried by `request_scheduler.RequestScheduler` and responses could be
+cached by `response_cache.ResponseCache`.
+"""
+import logging
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pagure_api_scripts.instrumentation import get_instrumentation
+from pagure_api_scripts.request_scheduler import RequestScheduler
+
+# Default number of connections kept in the pool
+DEFAULT_POOL_SIZE = 10
+
+# Default timeout for requests in seconds
+DEFAULT_TIMEOUT = 30
+
+_logger = logging.getLogger(__name__)
+
+
+class FetchMetrics:
+    """
+    Counters of the pages and issues retrieved from pagure.
+
+    Attributes:
+      pages: Number of pages retrieved
+      issues: Number of issues in the retrieved pages
+    """
+
+    def __init__(self):
+        """
+        Create counters set to zero.
+        """
+        self.pages = 0
+        self.issues = 0
+
+    def add_page(self, page: dict):
+        """
+        Count the retrieved page.
+
+        Params:
+          page: Page as returned by pagure API
+        """
+        self.add(len(page["issues"]))
+
+    def add(self, issues: int):
+        """
+        Count the retrieved page by the number of issues in it.
+
+        Params:
+          issues: Number of issues in the page
+        """
+        self.pages = self.pages + 1
+        self.issues = self.issues + issues
+
+
+class PagureClient:
+    """
+    HTTP client for the pagure API.
+
+    Attributes:
+      session: Pooled `requests.Session` used for all the requests
+      timeout: Timeout for the requests in seconds
+      scheduler: Scheduler limiting the rate and retrying failed requests
+      response_cache: Cache of the responses, None if responses are not cached
+      metrics: Counters of the pages and issues retrieved by this client
+    """
+
+    def __init__(
+            self, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT,
+            gzip: bool = True, scheduler: RequestScheduler = None, response_cache=None
+    ):
+        """
+        Create the client.
+
+        Params:
+          pool_size: How many connections to keep open. This should be at least the number
+                     of workers fetching the pages in parallel.
+          timeout: Timeout for the requests in seconds
+          gzip: Ask the server for compressed responses. Default: True
+          scheduler: Scheduler for the requests. Default None will create scheduler
+                     with default limits.
+          response_cache: `response_cache.ResponseCache` used for the requests.
+                          Default None will not cache the responses.
+        """
+        self.timeout = timeout
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.response_cache = response_cache
+        self.metrics = FetchMetrics()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if gzip:
+            self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        else:
+            self.session.headers["Accept-Encoding"] = "identity"
+
+    def get(self, url: str, frozen_till: float = None) -> requests.Response:
+        """
+        Send GET request to the url using the pooled session.
+
+        If the response is cached, the request is conditional and the cached
+        response is returned when the server answers it wasn't modified.
+        Cached responses for finished window are returned without any request,
+        if they were retrieved after the window ended and they are still fresh.
+
+        Params:
+          url: Url to retrieve
+          frozen_till: Timestamp of the end of the finished window the response is for,
+                       it's not expected to change after that. Default None for response
+                       which could change.
+
+        Returns:
+          Response returned by the server or from the cache. This could be error
+          response if it couldn't be retried.
+
+        Raises:
+          requests.RequestException: If the connection failed and couldn't be retried.
+        """
+        if self.response_cache is None:
+            return self._send(url)
+
+        cached = self.response_cache.get(url)
+        if cached and frozen_till is not None and self.response_cache.is_fresh(cached, frozen_till):
+            get_instrumentation().count("cache_hits")
+            return _cached_response(url, cached)
+
+        response = self._send(url, cached.validators() if cached else None)
+        if cached and response.status_code == requests.codes.not_modified:
+            get_instrumentation().count("cache_hits")
+            self.response_cache.refresh(url)
+            return _cached_response(url, cached)
+        if response.status_code == requests.codes.ok:
+            self.response_cache.store(
+                url, response.content, response.headers.get("ETag"),
+                response.headers.get("Last-Modified")
+            )
+        return response
+
+    def _send(self, url: str, headers: dict = None) -> requests.Response:
+        """
+        Send GET request to the url, when the scheduler allows it.
+
+        Failed requests are retried as long as the scheduler allows it.
+        Every attempt is measured by `instrumentation.get_instrumentation`.
+
+        Params:
+          url: Url to retrieve
+          headers: Additional headers of the request. Default: None
+
+        Returns:
+          Response returned by the server. This could be error response if it
+          couldn't be retried.
+
+        Raises:
+          requests.RequestException: If the connection failed and couldn't be retried.
+        """
+        instrumentation = get_instrumentation()
+        attempt = 0
+        while True:
+            delay = self.scheduler.acquire()
+            if delay > 0:
+                time.sleep(delay)
+
+            try:
+                with instrumentation.request_timer():
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                delay = self.scheduler.retry_delay(attempt)
+                if delay is None:
+                    raise
+                _logger.warning("Request for url '{}' failed: {}. Retrying in {:.1f}s".format(
+                    url, error, delay))
+            else:
+                if response.ok:
+                    self.scheduler.success()
+                    return response
+                delay = self.scheduler.retry_delay(
+                    attempt, response.status_code, response.headers.get("Retry-After")
+                )
+                if delay is None:
+                    return response
+                _logger.warning("Status code '{}' returned for url '{}'. Retrying in {:.1f}s".format(
+                    response.status_code, url, delay))
+                response.close()
+
+            instrumentation.count("retries")
+            time.sleep(delay)
+            attempt = attempt + 1
+
+    def close(self):
+        """
+        Close all the connections in the pool and the response cache.
+        """
+        self.session.close()
+        if self.response_cache is not None:
+            self.response_cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _cached_response(url: str, cached) -> requests.Response:
+    """
+    Create response from the cached one.
+
+    Params:
+      url: Url of the request
+      cached: `response_cache.CachedResponse` for the url
+
+    Returns:
+      Response with status 200 and the cached body.
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = requests.codes.ok
+    response._content = cached.body
+    response.encoding = "utf-8"
+    return response
+
+
+_default_client = None
+
+
+def get_default_client() -> PagureClient:
+    """
+    Return the client shared by all the callers, which didn't provide their own client.
+
+    Returns:
+      Shared `PagureClient` instance.
+    """
+    global _default_client
+    if _default_client is None:
+        _default_client = PagureClient()
+    return _default_client
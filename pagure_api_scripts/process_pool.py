@@ -0,0 +1,106 @@
+"""
+Parsing and aggregation of the pages in process pool used by pagure_api_scripts.
+
+Pages are retrieved by threads in the main process and their raw content
+is handed to the worker processes. Every worker decodes the page, filters
+the issues and aggregates them into its own aggregator, which is sent back
+and merged in the main process. Aggregators are merged in order of the pages,
+so the result is the same as when all the issues are aggregated in one process.
+Time spent by the workers is sent back together with the aggregators and added
+to the instrumentation of the main process.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from pagure_api_scripts.get_statistics import get_page_content
+from pagure_api_scripts.instrumentation import get_instrumentation, reset_instrumentation
+from pagure_api_scripts.page_decoder import decode_page
+from pagure_api_scripts.pagure_client import PagureClient, get_default_client
+
+
+def aggregate_pages(
+        url: str, new_aggregator, processes: int, workers: int = 1,
+        client: PagureClient = None, frozen_till: int = None
+):
+    """
+    Retrieve all the pages for the url and aggregate them in process pool.
+
+    The first page is decoded in the main process to find out the number of pages
+    from `pagination.pages`. At most twice the number of workers pages are retrieved
+    ahead and at most twice the number of processes pages are waiting for the workers.
+
+    Params:
+      url: Url for the first page
+      new_aggregator: Function creating empty aggregator. The aggregator needs to be
+                      picklable and have `add_issues(issues)` and `merge(other)` methods.
+      processes: How many processes parse and aggregate the pages
+      workers: How many pages to fetch in parallel. Default: 1
+      client: Client used for the requests. Default None will use the shared client.
+      frozen_till: End of the finished window the pages are for, see `PagureClient.get`. Default: None
+
+    Returns:
+      Aggregator with all the issues.
+    """
+    if client is None:
+        client = get_default_client()
+
+    instrumentation = get_instrumentation()
+    content = get_page_content(url, client=client, frozen_till=frozen_till)
+    with instrumentation.timer("decode"):
+        pages = decode_page(content)["pagination"]["pages"]
+    aggregator = new_aggregator()
+
+    def merge(future):
+        partial, issues, phases = future.result()
+        with instrumentation.timer("aggregate"):
+            aggregator.merge(partial)
+        client.metrics.add(issues)
+        instrumentation.merge_phases(phases)
+
+    numbers = iter(range(2, pages + 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            ProcessPoolExecutor(max_workers=processes) as pool:
+        downloads = deque()
+        for number in numbers:
+            downloads.append(executor.submit(
+                get_page_content, url + "&page=" + str(number), client=client, frozen_till=frozen_till
+            ))
+            if len(downloads) >= workers * 2:
+                break
+
+        parsed = deque([pool.submit(_aggregate_page, content, new_aggregator())])
+        while downloads:
+            content = downloads.popleft().result()
+            number = next(numbers, None)
+            if number is not None:
+                downloads.append(executor.submit(
+                    get_page_content, url + "&page=" + str(number), client=client, frozen_till=frozen_till
+                ))
+            parsed.append(pool.submit(_aggregate_page, content, new_aggregator()))
+            while len(parsed) > processes * 2:
+                merge(parsed.popleft())
+
+        while parsed:
+            merge(parsed.popleft())
+
+    return aggregator
+
+
+def _aggregate_page(content: bytes, aggregator):
+    """
+    Decode the page and add its issues to the aggregator. Runs in the worker process.
+
+    Params:
+      content: Body of the response with the page
+      aggregator: Empty aggregator
+
+    Returns:
+      Tuple with the filled aggregator, number of issues in the page and the time
+      spent in every phase, see `instrumentation.Instrumentation.phases`.
+    """
+    # Every page is measured separately, the worker runs only this function
+    instrumentation = reset_instrumentation()
+    with instrumentation.timer("decode"):
+        issues = decode_page(content)["issues"]
+    aggregator.add_issues(issues)
+    return aggregator, len(issues), instrumentation.phases
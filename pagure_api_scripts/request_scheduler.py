@@ -0,0 +1,238 @@
+"""
+Rate limiting and retries of the requests to pagure used by pagure_api_scripts.
+
+Requests are spread in time by the token bucket shared by all the threads
+and coroutines using the scheduler. Failed requests (429, 5xx or connection
+errors) are retried with exponential backoff with jitter or after the time
+requested by `Retry-After` header. Retries are limited per request and by
+the retry budget shared by all the requests, which is refilled by successful
+requests, so the scheduler stops retrying when the server is down.
+"""
+import email.utils
+import random
+import threading
+import time
+from typing import Optional
+
+# Default number of requests per second, 0 disables rate limiting
+DEFAULT_RATE = 10
+
+# Default number of requests which could be sent at once
+DEFAULT_BURST = 10
+
+# Default number of retries of one request
+DEFAULT_MAX_RETRIES = 5
+
+# Default number of retries available to all the requests
+DEFAULT_RETRY_BUDGET = 20
+
+# How much of retry budget is refilled by every successful request
+RETRY_REFILL = 0.1
+
+# Delay before the first retry in seconds, doubled for every next retry
+DEFAULT_BACKOFF = 0.5
+
+# Maximum delay before retry in seconds
+DEFAULT_MAX_DELAY = 60
+
+# Status codes which are worth retrying
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class PagureRequestError(Exception):
+    """
+    Raised when the request to pagure failed and couldn't be retried.
+
+    Attributes:
+      url: Url of the failed request
+      status_code: Status code of the last response, None if no response was received
+    """
+
+    def __init__(self, url: str, status_code: Optional[int] = None, reason: str = ""):
+        """
+        Create the error.
+
+        Params:
+          url: Url of the failed request
+          status_code: Status code of the last response. Default: None
+          reason: Description of the failure. Default: ""
+        """
+        self.url = url
+        self.status_code = status_code
+        if status_code is not None:
+            message = "Status code '{}' returned for url '{}'".format(status_code, url)
+        else:
+            message = "Request for url '{}' failed".format(url)
+        if reason:
+            message = message + ": " + reason
+        super().__init__(message)
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the rate of the requests.
+
+    Tokens could be reserved in advance, so every caller gets its own
+    time slot and callers are served in order.
+
+    Attributes:
+      rate: Number of tokens added every second, 0 means no limit
+      burst: Maximum number of tokens in the bucket
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST):
+        """
+        Create the bucket full of tokens.
+
+        Params:
+          rate: Number of tokens added every second. Default: `DEFAULT_RATE`
+          burst: Maximum number of tokens in the bucket. Default: `DEFAULT_BURST`
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take one token from the bucket.
+
+        Returns:
+          How many seconds the caller needs to wait before using the token.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = 0
+            if self.rate:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens = self._tokens - 1
+                if self._tokens < 0:
+                    wait = -self._tokens / self.rate
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds: float):
+        """
+        Don't give out usable tokens for the time.
+
+        Params:
+          seconds: How long to pause
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RequestScheduler:
+    """
+    Decides when the requests could be sent and whether failed requests are retried.
+
+    The scheduler doesn't send the requests itself, so it could be shared
+    by the threaded and asynchronous clients.
+
+    Attributes:
+      bucket: Token bucket limiting the rate of the requests
+      max_retries: Number of retries of one request
+      retry_budget: Number of retries available to all the requests
+      backoff: Delay before the first retry in seconds
+      max_delay: Maximum delay before retry in seconds
+    """
+
+    def __init__(
+            self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+            max_retries: int = DEFAULT_MAX_RETRIES, retry_budget: int = DEFAULT_RETRY_BUDGET,
+            backoff: float = DEFAULT_BACKOFF, max_delay: float = DEFAULT_MAX_DELAY
+    ):
+        """
+        Create the scheduler.
+
+        Params:
+          rate: Number of requests per second, 0 disables rate limiting. Default: `DEFAULT_RATE`
+          burst: Number of requests which could be sent at once. Default: `DEFAULT_BURST`
+          max_retries: Number of retries of one request. Default: `DEFAULT_MAX_RETRIES`
+          retry_budget: Number of retries available to all the requests. Default: `DEFAULT_RETRY_BUDGET`
+          backoff: Delay before the first retry in seconds. Default: `DEFAULT_BACKOFF`
+          max_delay: Maximum delay before retry in seconds. Default: `DEFAULT_MAX_DELAY`
+        """
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self._budget = retry_budget
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Reserve the time slot for the next request.
+
+        Returns:
+          How many seconds to wait before sending the request.
+        """
+        return self.bucket.reserve()
+
+    def success(self):
+        """
+        Record successful request, which refills part of the retry budget.
+        """
+        with self._lock:
+            self._budget = min(self.retry_budget, self._budget + RETRY_REFILL)
+
+    def retry_delay(
+            self, attempt: int, status_code: Optional[int] = None, retry_after: Optional[str] = None
+    ) -> Optional[float]:
+        """
+        Decide whether the failed request should be retried.
+
+        Params:
+          attempt: Number of retries of the request done so far
+          status_code: Status code of the response, None for connection errors. Default: None
+          retry_after: Value of `Retry-After` header of the response. Default: None
+
+        Returns:
+          How many seconds to wait before the retry or None if the request shouldn't be retried.
+        """
+        if status_code is not None and status_code not in RETRY_STATUS_CODES:
+            return None
+        if attempt >= self.max_retries:
+            return None
+        with self._lock:
+            if self._budget < 1:
+                return None
+            self._budget = self._budget - 1
+
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            # Full jitter, spreads the retries of requests which failed at the same time
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+        delay = min(delay, self.max_delay)
+
+        # The server is throttling us, slow down all the requests
+        if status_code == 429:
+            self.bucket.pause(delay)
+
+        return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the value of `Retry-After` header.
+
+    Params:
+      value: Number of seconds or HTTP date
+
+    Returns:
+      Number of seconds to wait or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(date.timestamp() - time.time(), 0)
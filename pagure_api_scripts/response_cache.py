@@ -0,0 +1,157 @@
+"""
+HTTP response cache for the pagure API used by pagure_api_scripts.
+
+Successful responses are kept in SQLite database keyed by url together
+with their `ETag` and `Last-Modified` headers. Cached responses are
+revalidated by conditional requests, when pagure answers with
+`304 Not Modified` the cached body is used. Pages retrieved after the end
+of windows which are already finished could be used without asking pagure
+at all for `frozen_ttl` seconds.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from pagure_api_scripts.issue_cache import DEFAULT_CACHE_DIR
+
+# Name of the database file in the cache directory
+CACHE_FILE = "responses.sqlite"
+
+# Default number of seconds for which cached pages of finished windows are used without revalidation
+DEFAULT_FROZEN_TTL = 7 * 24 * 60 * 60
+
+
+class CachedResponse(NamedTuple):
+    """
+    Response stored in the cache.
+
+    Attributes:
+      body: Body of the response
+      etag: Value of `ETag` header, None if not sent
+      last_modified: Value of `Last-Modified` header, None if not sent
+      stored_at: Timestamp when the response was retrieved or last revalidated
+    """
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+    def validators(self) -> dict:
+        """
+        Return headers for conditional request revalidating this response.
+
+        Returns:
+          Dictionary with `If-None-Match` and `If-Modified-Since` headers, if available.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    SQLite store of HTTP responses, could be shared by multiple threads.
+
+    Attributes:
+      connection: Connection to the SQLite database
+      frozen_ttl: Number of seconds for which cached pages of finished windows
+                  are used without revalidation
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, frozen_ttl: float = DEFAULT_FROZEN_TTL):
+        """
+        Open the cache and create the table if it doesn't exist.
+
+        Params:
+          cache_dir: Directory where the database is stored
+          frozen_ttl: Number of seconds for which cached pages of finished windows
+                      are used without revalidation. Default: `DEFAULT_FROZEN_TTL`
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.frozen_ttl = frozen_ttl
+        self.connection = sqlite3.connect(
+            os.path.join(cache_dir, CACHE_FILE), check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "url TEXT PRIMARY KEY, "
+                "body BLOB NOT NULL, "
+                "etag TEXT, "
+                "last_modified TEXT, "
+                "stored_at REAL NOT NULL)"
+            )
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """
+        Return the cached response for the url.
+
+        Params:
+          url: Url of the request
+
+        Returns:
+          Cached response or None if the url is not in the cache.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        return CachedResponse(*row) if row else None
+
+    def is_fresh(self, cached: CachedResponse, frozen_till: float) -> bool:
+        """
+        Could the cached page of finished window be used without revalidation.
+
+        Page retrieved before the window ended could miss issues changed
+        later in the window, so it needs to be revalidated.
+
+        Params:
+          cached: Response returned by `get`
+          frozen_till: Timestamp of the end of the window
+
+        Returns:
+          True if the response was retrieved or revalidated after the window ended
+          and it's younger than `frozen_ttl`.
+        """
+        return cached.stored_at >= frozen_till and time.time() - cached.stored_at < self.frozen_ttl
+
+    def store(self, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str]):
+        """
+        Store the response for the url.
+
+        Params:
+          url: Url of the request
+          body: Body of the response
+          etag: Value of `ETag` header
+          last_modified: Value of `Last-Modified` header
+        """
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (url, body, etag, last_modified, stored_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, time.time())
+            )
+
+    def refresh(self, url: str):
+        """
+        Mark the cached response for the url as revalidated now.
+
+        Params:
+          url: Url of the request
+        """
+        with self._lock, self.connection:
+            self.connection.execute(
+                "UPDATE responses SET stored_at = ? WHERE url = ?", (time.time(), url)
+            )
+
+    def close(self):
+        """
+        Close the database.
+        """
+        self.connection.close()
@@ -0,0 +1,226 @@
+"""
+Small layout engine for Google Sheets used by pagure_api_scripts.
+
+Cells and merges are placed on the `SheetLayout` grid and compiled into
+the smallest batch of `spreadsheets.batchUpdate` requests: all values are
+written by one `updateCells` request and cells sharing the same format
+are formatted together by `repeatCell` requests.
+"""
+import json
+
+
+class Formula(str):
+    """
+    Cell value, which should be written as formula.
+    """
+
+
+class SheetLayout:
+    """
+    Grid of cells and merges for one sheet.
+
+    Attributes:
+      cells: Dictionary with (row, column) as key and (value, format) as value
+      merges: List of (row, column, height, width) tuples
+    """
+
+    def __init__(self):
+        """
+        Create empty layout.
+        """
+        self.cells = {}
+        self.merges = []
+
+    def set(self, row: int, column: int, value, cell_format: dict = None):
+        """
+        Place value to the cell.
+
+        Params:
+          row: Row index of the cell
+          column: Column index of the cell
+          value: String, number or `Formula`
+          cell_format: Format of the cell as `CellFormat` of Sheets API. Default: None
+        """
+        self.cells[(row, column)] = (value, cell_format)
+
+    def merge(self, row: int, column: int, height: int = 1, width: int = 2):
+        """
+        Merge the cells.
+
+        Params:
+          row: Row index of the top left cell
+          column: Column index of the top left cell
+          height: Number of merged rows. Default: 1
+          width: Number of merged columns. Default: 2
+        """
+        self.merges.append((row, column, height, width))
+
+    def compile(self, sheet_id: int):
+        """
+        Compile the layout into requests.
+
+        Merges go first, then one `updateCells` request with all the values
+        and formats used only by single cell, then one `repeatCell` request
+        for every rectangle of cells sharing the same format.
+
+        Params:
+          sheet_id: Id of the sheet
+
+        Returns:
+          List of requests for `spreadsheets.batchUpdate`.
+        """
+        requests = []
+
+        for row, column, height, width in self.merges:
+            requests.append(
+                {
+                    "mergeCells": {
+                        "range": _grid_range(sheet_id, row, column, height, width)
+                    }
+                }
+            )
+
+        if not self.cells:
+            return requests
+
+        rectangles = self._format_rectangles()
+        # Formats of cells covered by repeatCell are not written inline
+        repeated = {
+            (row, column)
+            for (top, left, height, width), _ in rectangles
+            for row in range(top, top + height)
+            for column in range(left, left + width)
+        }
+
+        first_row = min(row for row, _ in self.cells)
+        first_column = min(column for _, column in self.cells)
+        last_columns = {}
+        for row, column in self.cells:
+            last_columns[row] = max(column, last_columns.get(row, column))
+        rows = []
+        for row in range(first_row, max(last_columns) + 1):
+            if row not in last_columns:
+                rows.append({})
+                continue
+            rows.append(
+                {
+                    "values": [
+                        self._cell_data((row, column), (row, column) not in repeated)
+                        for column in range(first_column, last_columns[row] + 1)
+                    ]
+                }
+            )
+
+        requests.append(
+            {
+                "updateCells": {
+                    "start": {
+                        "sheetId": sheet_id,
+                        "rowIndex": first_row,
+                        "columnIndex": first_column,
+                    },
+                    "fields": "userEnteredValue,userEnteredFormat",
+                    "rows": rows,
+                }
+            }
+        )
+
+        for (row, column, height, width), cell_format in rectangles:
+            requests.append(
+                {
+                    "repeatCell": {
+                        "range": _grid_range(sheet_id, row, column, height, width),
+                        "cell": {
+                            "userEnteredFormat": cell_format,
+                        },
+                        "fields": "userEnteredFormat",
+                    }
+                }
+            )
+
+        return requests
+
+    def _cell_data(self, position: tuple, with_format: bool) -> dict:
+        """
+        Return `CellData` for the cell.
+
+        Params:
+          position: (row, column) of the cell
+          with_format: Include the format of the cell
+
+        Returns:
+          `CellData` dictionary, empty for empty cell.
+        """
+        if position not in self.cells:
+            return {}
+        value, cell_format = self.cells[position]
+        cell = {}
+        if isinstance(value, Formula):
+            cell["userEnteredValue"] = {"formulaValue": str(value)}
+        elif isinstance(value, str):
+            cell["userEnteredValue"] = {"stringValue": value}
+        elif value is not None:
+            cell["userEnteredValue"] = {"numberValue": value}
+        if cell_format and with_format:
+            cell["userEnteredFormat"] = cell_format
+        return cell
+
+    def _format_rectangles(self):
+        """
+        Group the cells with the same format into rectangles.
+
+        Every format is deduplicated, cells with the same format in one column
+        are joined into vertical runs and runs with the same rows in adjacent
+        columns are joined together. Rectangles of single cell are left out,
+        their format is written inline.
+
+        Returns:
+          List of ((row, column, height, width), format) tuples.
+        """
+        formats = {}
+        for position, (_, cell_format) in self.cells.items():
+            if cell_format:
+                key = json.dumps(cell_format, sort_keys=True)
+                formats.setdefault(key, (cell_format, set()))[1].add(position)
+
+        rectangles = []
+        for cell_format, positions in formats.values():
+            # Vertical runs in every column
+            runs = {}
+            for row, column in sorted(positions, key=lambda position: (position[1], position[0])):
+                run = runs.get(column)
+                if run and run[-1][0] + run[-1][1] == row:
+                    run[-1][1] = run[-1][1] + 1
+                else:
+                    runs.setdefault(column, []).append([row, 1])
+            # Join runs with the same rows in adjacent columns,
+            # rectangles are looked up by their rows and the column right after them
+            joined = []
+            open_rectangles = {}
+            for column in sorted(runs):
+                for row, height in runs[column]:
+                    rectangle = open_rectangles.pop((row, height, column), None)
+                    if rectangle:
+                        rectangle[3] = rectangle[3] + 1
+                    else:
+                        rectangle = [row, column, height, 1]
+                        joined.append(rectangle)
+                    open_rectangles[(row, height, column + 1)] = rectangle
+            for row, column, height, width in joined:
+                if height * width > 1:
+                    rectangles.append(((row, column, height, width), cell_format))
+
+        return rectangles
+
+
+def _grid_range(sheet_id: int, row: int, column: int, height: int, width: int) -> dict:
+    """
+    Return `GridRange` for the rectangle.
+    """
+    return {
+        "sheetId": sheet_id,
+        "startRowIndex": row,
+        "endRowIndex": row + height,
+        "startColumnIndex": column,
+        "endColumnIndex": column + width,
+    }
@@ -0,0 +1,209 @@
+"""
+Time-indexed store of issues for window queries used by pagure_api_scripts.
+
+Issues are kept as records in two sorted arrays, by the date of creation for the
+windows of opened issues and by the date of closing for the windows of closed issues.
+Any window is found by binary search instead of going through the whole history.
+For every resolution, gain, trouble, ops and dev tag the positions of the records
+with it are kept as sorted arrays too, so their counts in the window are found
+by binary search as well. Only time to close statistics need to go through
+the records in the window.
+
+The results are the same as from `get_statistics.open_issues` and
+`get_statistics.closed_issues` for the same window, provided the store contains
+all the issues updated since the start of the window.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+import arrow
+
+from pagure_api_scripts.aggregator import IssueAggregator
+from pagure_api_scripts.get_statistics import epoch_bounds, time_to_close
+from pagure_api_scripts.issue_record import GAIN_NAMES, TROUBLE_NAMES, to_record
+
+
+class SortedRecords:
+    """
+    Records sorted by one of their timestamps, with positions of every category.
+
+    Attributes:
+      records: Records sorted by the timestamp, then by creation date and id
+      timestamps: Sorted timestamps of the records
+    """
+
+    def __init__(self, records: list, field: str):
+        """
+        Sort the records and index their categories.
+
+        Params:
+          records: Records to store
+          field: Name of the timestamp to sort by, "date_created" or "closed_at"
+        """
+        self.records = sorted(
+            records, key=lambda record: (getattr(record, field), record.date_created, record.id)
+        )
+        self.timestamps = array("q", (getattr(record, field) for record in self.records))
+        self._resolution = {}
+        self._gain = [array("l") for _ in GAIN_NAMES]
+        self._trouble = [array("l") for _ in TROUBLE_NAMES]
+        self._ops = array("l")
+        self._dev = array("l")
+        for position, record in enumerate(self.records):
+            self._resolution.setdefault(record.resolution, array("l")).append(position)
+            self._gain[record.gain].append(position)
+            self._trouble[record.trouble].append(position)
+            if record.ops:
+                self._ops.append(position)
+            if record.dev:
+                self._dev.append(position)
+
+    def window(self, since: int, till: int):
+        """
+        Find the records with the timestamp in the window, both ends are inclusive.
+
+        Params:
+          since: Start of the window as timestamp
+          till: End of the window as timestamp
+
+        Returns:
+          Tuple with position of the first record in the window and position after the last one.
+        """
+        return bisect_left(self.timestamps, since), bisect_right(self.timestamps, till)
+
+    def aggregator(self, start: int, end: int, closed: bool = True) -> IssueAggregator:
+        """
+        Create aggregator filled with the records between the positions.
+
+        Counts are found by binary search in the positions of every category.
+        Resolutions are in the order pagure would return them, from the latest
+        created issue. With closed set to True the records are also added
+        to the time to close statistics one by one.
+
+        Params:
+          start: Position of the first record
+          end: Position after the last record
+          closed: Should we aggregate closed or open issues. Default: True
+
+        Returns:
+          Aggregator with the same state as if the records were added one by one.
+        """
+        aggregator = IssueAggregator(closed=closed)
+        aggregator.total = end - start
+        aggregator.gain = [_count(positions, start, end) for positions in self._gain]
+        aggregator.trouble = [_count(positions, start, end) for positions in self._trouble]
+        aggregator.ops = _count(self._ops, start, end)
+        aggregator.dev = _count(self._dev, start, end)
+
+        # Latest created issue with every resolution in the window
+        latest = {}
+        if closed:
+            for record in self.records[start:end]:
+                key = (record.resolution, record.time_to_close)
+                aggregator.time_to_close[key] = aggregator.time_to_close.get(key, 0) + 1
+                created = (record.date_created, record.id)
+                if record.resolution not in latest or created > latest[record.resolution]:
+                    latest[record.resolution] = created
+        else:
+            # Records are sorted by creation, so the last position in the window is the latest created
+            for code, positions in self._resolution.items():
+                last = bisect_left(positions, end) - 1
+                if last >= 0 and positions[last] >= start:
+                    latest[code] = positions[last]
+
+        for code in sorted(latest, key=latest.get, reverse=True):
+            if code:
+                aggregator.resolution[code] = _count(self._resolution[code], start, end)
+                aggregator.closed_count = aggregator.closed_count + aggregator.resolution[code]
+        return aggregator
+
+
+class TimeIndex:
+    """
+    Issues of one repository indexed by the dates of creation and closing.
+    """
+
+    def __init__(self, issues):
+        """
+        Create the index from the issues.
+
+        Params:
+          issues: Iterable of issues as returned by pagure API with any status
+        """
+        opened = []
+        closed = []
+        for issue in issues:
+            # Skip the ticket if any of the dates is not filled
+            if not issue["date_created"]:
+                continue
+            record = to_record(issue)
+            opened.append(record)
+            # The same filter as `status=Closed` is doing on the server
+            if issue.get("status") == "Closed" and record.closed_at:
+                closed.append(record._replace(time_to_close=time_to_close(issue)))
+        self._opened = SortedRecords(opened, "date_created")
+        self._closed = SortedRecords(closed, "closed_at")
+
+    def records(self, till: arrow.Arrow, since: arrow.Arrow, closed: bool = True) -> list:
+        """
+        Return the records opened or closed in the window.
+
+        Params:
+          till: Till date for the issues
+          since: Since date for the issues
+          closed: Should we get closed or open issues. Default: True
+
+        Returns:
+          List of `IssueRecord` sorted by the date of closing or creation.
+        """
+        records, start, end = self._window(till, since, closed)
+        return records.records[start:end]
+
+    def count(self, till: arrow.Arrow, since: arrow.Arrow, closed: bool = True) -> int:
+        """
+        Return the number of issues opened or closed in the window.
+
+        Params:
+          till: Till date for the issues
+          since: Since date for the issues
+          closed: Should we count closed or open issues. Default: True
+
+        Returns:
+          Number of issues.
+        """
+        _, start, end = self._window(till, since, closed)
+        return end - start
+
+    def statistics(self, till: arrow.Arrow, since: arrow.Arrow, closed: bool = True) -> dict:
+        """
+        Compute the statistics of the issues opened or closed in the window.
+
+        Params:
+          till: Till date for the issues
+          since: Since date for the issues
+          closed: Should we aggregate closed or open issues. Default: True
+
+        Returns:
+          Output of `get_statistics.aggregate_stats`.
+        """
+        records, start, end = self._window(till, since, closed)
+        return records.aggregator(start, end, closed=closed).result()
+
+    def _window(self, till: arrow.Arrow, since: arrow.Arrow, closed: bool):
+        """
+        Find the records opened or closed in the window.
+
+        Returns:
+          Tuple with `SortedRecords` and positions returned by `SortedRecords.window`.
+        """
+        records = self._closed if closed else self._opened
+        till, since = epoch_bounds(till, since)
+        start, end = records.window(since, till)
+        return records, start, end
+
+
+def _count(positions: array, start: int, end: int) -> int:
+    """
+    Count the positions between start and end.
+    """
+    return bisect_left(positions, end) - bisect_left(positions, start)
@@ -0,0 +1,247 @@
+"""
+Time to close statistics used by pagure_api_scripts.
+
+Computes percentiles, histogram and per resolution breakdown of time to close
+from the count of every time to close value, which is how `aggregator.IssueAggregator`
+keeps them.
+Uses numpy when it's installed and falls back to pure Python otherwise,
+both backends return the same values. numpy is imported on the first use,
+so commands without time to close statistics don't pay for it.
+"""
+import math
+from bisect import bisect_right
+from itertools import accumulate
+
+# Imported by `_import_numpy`, False when it's not installed
+numpy = None
+
+# Percentiles of time to close to compute
+PERCENTILES = [50, 75, 90, 95, 99]
+
+# Lower edges of the histogram buckets in days, the last bucket is open-ended
+HISTOGRAM_EDGES = [0, 1, 2, 7, 14, 30, 60, 90, 180, 365]
+
+
+def histogram_labels():
+    """
+    Return labels of the histogram buckets.
+
+    Returns:
+      List of labels like "2-6" or "365+".
+    """
+    labels = []
+    for lower, upper in zip(HISTOGRAM_EDGES, HISTOGRAM_EDGES[1:]):
+        if upper - lower == 1:
+            labels.append(str(lower))
+        else:
+            labels.append("{}-{}".format(lower, upper - 1))
+    labels.append("{}+".format(HISTOGRAM_EDGES[-1]))
+    return labels
+
+
+def ttc_statistics_from_counts(counts: dict, use_numpy: bool = True):
+    """
+    Compute time to close statistics from the count of every time to close value.
+
+    The values are not repeated by their counts, every statistic is found by walking
+    the cumulative counts of the sorted distinct values.
+
+    Params:
+      counts: Dictionary with resolution as key and dictionary with time to close value
+              in days as key and number of issues with it as value. Resolutions are
+              in order of first appearance.
+      use_numpy: Use numpy if it's installed. Default: True
+
+    Returns:
+      Dictionary with the statistics.
+
+    Example output::
+      {
+        "percentiles_ttc": { # Time to close percentiles
+          "p50": 10.0,
+          ...
+        },
+        "histogram_ttc": { # Number of issues in each time to close bucket
+          "0": 5,
+          "1": 2,
+          "2-6": 7,
+          ...
+          "365+": 1,
+        },
+        "resolution_ttc": { # Time to close for each resolution
+          "Fixed": {
+            "count": 10,
+            "maximum": 20,
+            "minimum": 0,
+            "average": 7.5,
+            "median": 6.0,
+          },
+          ...
+        },
+      }
+    """
+    if use_numpy and _import_numpy():
+        return _numpy_counted_statistics(counts)
+    return _python_counted_statistics(counts)
+
+
+def _import_numpy() -> bool:
+    """
+    Import numpy into this module, if it wasn't tried yet.
+
+    Returns:
+      True if numpy is installed.
+    """
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+    return numpy is not False
+
+
+def _numpy_counted_statistics(counts: dict):
+    """
+    Numpy backend for `ttc_statistics_from_counts`.
+    """
+    result = {
+        "percentiles_ttc": {},
+        "histogram_ttc": dict.fromkeys(histogram_labels(), 0),
+        "resolution_ttc": {},
+    }
+    totals = _merge_counts(counts)
+    if not totals:
+        return result
+
+    values, cumulative = _numpy_cumulative(totals)
+    percentiles = _numpy_counted_percentiles(values, cumulative, PERCENTILES)
+    for percentile, value in zip(PERCENTILES, percentiles):
+        result["percentiles_ttc"]["p{}".format(percentile)] = float(value)
+
+    buckets = numpy.searchsorted(HISTOGRAM_EDGES, values, side="right") - 1
+    weights = numpy.diff(cumulative, prepend=0)
+    histogram = numpy.bincount(
+        numpy.clip(buckets, 0, None), weights=weights, minlength=len(HISTOGRAM_EDGES)
+    )
+    for label, count in zip(histogram_labels(), histogram):
+        result["histogram_ttc"][label] = int(count)
+
+    for resolution, group in counts.items():
+        values, cumulative = _numpy_cumulative(group)
+        size = int(cumulative[-1])
+        result["resolution_ttc"][resolution] = {
+            "count": size,
+            "maximum": int(values[-1]),
+            "minimum": int(values[0]),
+            "average": int(numpy.dot(values, numpy.diff(cumulative, prepend=0))) / size,
+            "median": float(_numpy_counted_percentiles(values, cumulative, [50])[0]),
+        }
+
+    return result
+
+
+def _numpy_cumulative(counts: dict):
+    """
+    Return sorted distinct values and cumulative counts of them as numpy arrays.
+    """
+    values = numpy.fromiter(sorted(counts), dtype=numpy.int64, count=len(counts))
+    cumulative = numpy.cumsum([counts[value] for value in values.tolist()], dtype=numpy.int64)
+    return values, cumulative
+
+
+def _numpy_counted_percentiles(values, cumulative, percentiles: list):
+    """
+    Compute percentiles of counted values with linear interpolation, same as `_counted_percentile`.
+    """
+    count = int(cumulative[-1])
+    index = (count - 1) * (numpy.asarray(percentiles) / 100)
+    lower = numpy.floor(index)
+    upper = numpy.minimum(lower + 1, count - 1)
+    gamma = index - lower
+    lower_values = values[numpy.searchsorted(cumulative, lower, side="right")]
+    upper_values = values[numpy.searchsorted(cumulative, upper, side="right")]
+    difference = upper_values - lower_values
+    return numpy.where(
+        gamma >= 0.5, upper_values - difference * (1 - gamma), lower_values + difference * gamma
+    )
+
+
+def _python_counted_statistics(counts: dict):
+    """
+    Pure Python backend for `ttc_statistics_from_counts`.
+    """
+    result = {
+        "percentiles_ttc": {},
+        "histogram_ttc": dict.fromkeys(histogram_labels(), 0),
+        "resolution_ttc": {},
+    }
+    totals = _merge_counts(counts)
+    if not totals:
+        return result
+
+    values = sorted(totals)
+    cumulative = list(accumulate(totals[value] for value in values))
+    for percentile in PERCENTILES:
+        result["percentiles_ttc"]["p{}".format(percentile)] = _counted_percentile(
+            values, cumulative, percentile
+        )
+
+    labels = histogram_labels()
+    for value in values:
+        label = labels[max(bisect_right(HISTOGRAM_EDGES, value) - 1, 0)]
+        result["histogram_ttc"][label] = result["histogram_ttc"][label] + totals[value]
+
+    for resolution, group in counts.items():
+        values = sorted(group)
+        cumulative = list(accumulate(group[value] for value in values))
+        result["resolution_ttc"][resolution] = {
+            "count": cumulative[-1],
+            "maximum": values[-1],
+            "minimum": values[0],
+            "average": sum(value * group[value] for value in values) / cumulative[-1],
+            "median": _counted_percentile(values, cumulative, 50),
+        }
+
+    return result
+
+
+def _merge_counts(counts: dict) -> dict:
+    """
+    Sum the counts of every time to close value over all the resolutions.
+    """
+    totals = {}
+    for group in counts.values():
+        for value, count in group.items():
+            totals[value] = totals.get(value, 0) + count
+    return totals
+
+
+def _counted_percentile(values: list, cumulative: list, percentile: int) -> float:
+    """
+    Compute percentile of counted values with linear interpolation, same as numpy does.
+
+    Params:
+      values: Sorted distinct values
+      cumulative: Number of values lower or equal to every distinct value
+      percentile: Percentile to compute
+
+    Returns:
+      Value of the percentile.
+    """
+    index = (cumulative[-1] - 1) * (percentile / 100)
+    lower = math.floor(index)
+    upper = min(lower + 1, cumulative[-1] - 1)
+    return _interpolate(
+        values[bisect_right(cumulative, lower)], values[bisect_right(cumulative, upper)], index - lower
+    )
+
+
+def _interpolate(lower: float, upper: float, gamma: float) -> float:
+    """
+    Interpolate between two neighbouring values the same way as numpy does.
+    """
+    difference = upper - lower
+    if gamma >= 0.5:
+        return float(upper - difference * (1 - gamma))
+    return float(lower + difference * gamma)
@@ -1,43 +1,209 @@
 """
 This script is a command line client for pagure_api_scripts module.
 """
+import functools
+
 import arrow
 import click
 
+import pagure_api_scripts.async_statistics as async_statistics
+import pagure_api_scripts.daemon as daemon
+import pagure_api_scripts.export as export
 import pagure_api_scripts.get_statistics as get_statistics
-import pagure_api_scripts.google_docs as google_docs
+import pagure_api_scripts.history as history
+from pagure_api_scripts.instrumentation import PROFILERS, Profiler, get_instrumentation, reset_instrumentation
+from pagure_api_scripts.issue_cache import IssueCache
+from pagure_api_scripts.pagure_client import PagureClient, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+from pagure_api_scripts.request_scheduler import PagureRequestError, RequestScheduler, DEFAULT_MAX_RETRIES, DEFAULT_RATE
+from pagure_api_scripts.response_cache import ResponseCache, DEFAULT_FROZEN_TTL
+
+
+def open_cache(cache_dir: str):
+    """
+    Open local cache of issues, which is closed together with the command.
+
+    Params:
+      cache_dir: Directory with local cache of issues, None will not use the cache
+
+    Returns:
+      `IssueCache` or None.
+    """
+    if not cache_dir:
+        return None
+    cache = IssueCache(cache_dir)
+    click.get_current_context().call_on_close(cache.close)
+    return cache
+
+
+def parse_till(till: str) -> tuple:
+    """
+    Parse the end of the window provided by the `--till` option.
+
+    Only explicit till before the start of the run ends finished window,
+    which pages could be reused from the response cache.
+
+    Params:
+      till: Date in DD.MM.YYYY format, None for now
+
+    Returns:
+      Tuple of the end of the window as `arrow.Arrow` and its timestamp
+      if the window is finished, otherwise None.
+    """
+    if not till:
+        return arrow.utcnow(), None
+    till = arrow.get(till, "DD.MM.YYYY")
+    return till, till.int_timestamp if till < arrow.utcnow() else None
+
+
+def check_processes(processes: int, cache_dir: str, use_async: bool = False):
+    """
+    Check that the `--processes` option isn't combined with options it can't be used with.
+
+    Params:
+      processes: How many processes parse and aggregate the pages
+      cache_dir: Directory with local cache of issues, None if the cache isn't used
+      use_async: Retrieve the repositories concurrently. Default: False
+
+    Raises:
+      click.UsageError: If the options can't be used together.
+    """
+    if processes > 1 and cache_dir:
+        raise click.UsageError("Options --processes and --cache-dir can't be used together.")
+    if processes > 1 and use_async:
+        raise click.UsageError("Options --processes and --async can't be used together.")
+
+
+def pagure_errors(command):
+    """
+    Report requests to pagure, which failed even after retries, as command errors.
+
+    Params:
+      command: Function of the command
+
+    Returns:
+      Wrapped function raising `click.ClickException` instead of `PagureRequestError`.
+    """
+
+    @functools.wraps(command)
+    def wrapper(*args, **kwargs):
+        try:
+            return command(*args, **kwargs)
+        except PagureRequestError as error:
+            raise click.ClickException(str(error))
+
+    return wrapper
 
 
 @click.group()
-def cli():
-    pass
+@click.option("--pool-size", default=DEFAULT_POOL_SIZE, help="How many connections to pagure to keep open.")
+@click.option("--timeout", default=DEFAULT_TIMEOUT, type=float, help="Timeout for requests to pagure in seconds.")
+@click.option("--gzip/--no-gzip", default=True, help="Ask pagure for compressed responses.")
+@click.option("--rate", default=DEFAULT_RATE, type=float, help="How many requests per second to send to pagure, 0 disables the limit.")
+@click.option("--max-retries", default=DEFAULT_MAX_RETRIES, help="How many times to retry failed request to pagure.")
+@click.option("--http-cache-dir", default=None, help="Keep responses from pagure in this directory and revalidate them instead of downloading them again.")
+@click.option("--frozen-ttl", default=DEFAULT_FROZEN_TTL, type=float, help="How many seconds to use cached responses for windows with --till in the past without asking pagure.")
+@click.option("--profile", default=None, type=click.Choice(PROFILERS), help="Profile the run by cProfile or pyinstrument and print the time spent in each phase. Pyinstrument requires pyinstrument.")
+@click.option("--profile-output", default=None, help="Save the profile to this file instead of printing it, in pstats format for cProfile or as HTML for pyinstrument.")
+@click.option("--metrics-json", default=None, help="Write time spent in each phase, counters and latency of requests to this JSON file.")
+@click.option("--metrics-prom", default=None, help="Write the same metrics as --metrics-json to this Prometheus textfile.")
+@click.pass_context
+def cli(
+        ctx: click.Context, pool_size: int, timeout: float, gzip: bool, rate: float,
+        max_retries: int, http_cache_dir: str, frozen_ttl: float, profile: str,
+        profile_output: str, metrics_json: str, metrics_prom: str
+):
+    """
+    Create the pagure client shared by the command.
+
+    Params:
+      pool_size: How many connections to pagure to keep open
+      timeout: Timeout for requests to pagure in seconds
+      gzip: Ask pagure for compressed responses
+      rate: How many requests per second to send to pagure
+      max_retries: How many times to retry failed request to pagure
+      http_cache_dir: Directory with cache of responses. Default None will not cache responses.
+      frozen_ttl: How many seconds to use cached responses for windows in the past
+      profile: Profiler to use, "cprofile" or "pyinstrument". Default None will not profile the run.
+      profile_output: File to save the profile to. Default None will print it to stderr.
+      metrics_json: JSON file to write the metrics to. Default None will not write it.
+      metrics_prom: Prometheus textfile to write the metrics to. Default None will not write it.
+    """
+    try:
+        profiler = Profiler(profile, profile_output) if profile else None
+    except RuntimeError as error:
+        raise click.UsageError(str(error))
+    scheduler = RequestScheduler(rate=rate, max_retries=max_retries)
+    response_cache = ResponseCache(http_cache_dir, frozen_ttl=frozen_ttl) if http_cache_dir else None
+    ctx.obj = PagureClient(
+        pool_size=pool_size, timeout=timeout, gzip=gzip, scheduler=scheduler,
+        response_cache=response_cache
+    )
+    ctx.call_on_close(ctx.obj.close)
+
+    instrumentation = reset_instrumentation()
+    if profiler:
+        profiler.start()
+
+    def finish():
+        """
+        Stop the profiler and write the metrics, when the command is finished.
+        """
+        if profiler:
+            profiler.stop()
+            click.echo(instrumentation.summary(), err=True)
+        instrumentation.count("pages", ctx.obj.metrics.pages)
+        instrumentation.count("issues_fetched", ctx.obj.metrics.issues)
+        if metrics_json:
+            instrumentation.write_json(metrics_json, ctx.invoked_subcommand)
+        if metrics_prom:
+            instrumentation.write_prometheus(metrics_prom, ctx.invoked_subcommand)
+
+    ctx.call_on_close(finish)
 
 
 @click.command()
 @click.option("--days-ago", default=30, help="How many days ago to look for open issues.")
 @click.option("--till", default=None, help="Show results till this date. Expects date in DD.MM.YYYY format (31.12.2021).")
+@click.option("--workers", default=1, type=click.IntRange(min=1), help="How many pages to fetch in parallel.")
+@click.option("--cache-dir", default=None, help="Keep issues in local cache in this directory and only retrieve changed issues.")
+@click.option("--processes", default=1, type=click.IntRange(min=1), help="How many processes parse and aggregate the pages. Can't be used with --cache-dir.")
 @click.argument('repository')
-def open_issues(days_ago: int, till: str, repository: str):
+@click.pass_obj
+@pagure_errors
+def open_issues(
+        client: PagureClient, days_ago: int, till: str, workers: int, cache_dir: str,
+        processes: int, repository: str
+):
     """
     Get open issues from the repository and print their count.
 
     Params:
+      client: Client used for requests to pagure
       days_ago: How many days ago to look for the issues
       till: Limit results to the day set by this argument. Default None will be replaced by `arrow.utcnow()`.
+      workers: How many pages to fetch in parallel
+      cache_dir: Directory with local cache of issues. Default None will not use the cache.
+      processes: How many processes parse and aggregate the pages
       repository: Repository namespace to check
     """
-    if till:
-        till = arrow.get(till, "DD.MM.YYYY")
-    else:
-        till = arrow.utcnow()
+    check_processes(processes, cache_dir)
+
+    till, frozen_till = parse_till(till)
     since_arg = till.shift(days=-days_ago)
+    cache = open_cache(cache_dir)
 
     click.echo("Retrieving open issues from {} opened in last {} days ({}) till {}".format(
         repository, days_ago, since_arg.format("DD.MM.YYYY"), since_arg.shift(days=+days_ago).format("DD.MM.YYYY")))
 
-    data = get_statistics.open_issues(till, since_arg, repository)
+    data = get_statistics.open_issues(
+        till, since_arg, repository, workers=workers, client=client, cache=cache, processes=processes,
+        frozen_till=frozen_till
+    )
 
     click.echo("Total number of retrieved issues: {}".format(data["total"]))
+    click.echo("Downloaded {} issues in {} pages, kept {}".format(
+        client.metrics.issues, client.metrics.pages, data["total"]))
+    get_instrumentation().count("issues_kept", data["total"])
 
     click.echo("Already closed: {}".format(data["closed"]))
 
@@ -64,28 +230,46 @@ def open_issues(days_ago: int, till: str, repository: str):
 @click.command()
 @click.option("--days-ago", default=30, help="How many days ago to look for closed issues.")
 @click.option("--till", default=None, help="Show results till this date. Expects date in DD.MM.YYYY format (31.12.2021).")
+@click.option("--workers", default=1, type=click.IntRange(min=1), help="How many pages to fetch in parallel.")
+@click.option("--cache-dir", default=None, help="Keep issues in local cache in this directory and only retrieve changed issues.")
+@click.option("--processes", default=1, type=click.IntRange(min=1), help="How many processes parse and aggregate the pages. Can't be used with --cache-dir.")
 @click.argument('repository')
-def closed_issues(days_ago: int, till: str, repository: str):
+@click.pass_obj
+@pagure_errors
+def closed_issues(
+        client: PagureClient, days_ago: int, till: str, workers: int, cache_dir: str,
+        processes: int, repository: str
+):
     """
     Get closed issues from the repository and print their count.
 
     Params:
+      client: Client used for requests to pagure
       days_ago: How many days ago to look for the issues
       till: Limit results to the day set by this argument. Default None will be replaced by `arrow.utcnow()`.
+      workers: How many pages to fetch in parallel
+      cache_dir: Directory with local cache of issues. Default None will not use the cache.
+      processes: How many processes parse and aggregate the pages
       repository: Repository namespace to check
     """
-    if till:
-        till = arrow.get(till, "DD.MM.YYYY")
-    else:
-        till = arrow.utcnow()
+    check_processes(processes, cache_dir)
+
+    till, frozen_till = parse_till(till)
     since_arg = till.shift(days=-days_ago)
+    cache = open_cache(cache_dir)
 
     click.echo("Retrieving closed issues from {} updated in last {} days ({}) till {}".format(
         repository, days_ago, since_arg.format("DD.MM.YYYY"), since_arg.shift(days=+days_ago).format("DD.MM.YYYY")))
 
-    data = get_statistics.closed_issues(till, since_arg, repository)
+    data = get_statistics.closed_issues(
+        till, since_arg, repository, workers=workers, client=client, cache=cache, processes=processes,
+        frozen_till=frozen_till
+    )
 
     click.echo("Total number of retrieved issues: {}".format(data["total"]))
+    click.echo("Downloaded {} issues in {} pages, kept {}".format(
+        client.metrics.issues, client.metrics.pages, data["total"]))
+    get_instrumentation().count("issues_kept", data["total"])
 
     click.echo("")
     click.echo("Time to Close:")
@@ -93,6 +277,13 @@ def closed_issues(days_ago: int, till: str, repository: str):
     click.echo("* Minimum: {}".format(data["minimum_ttc"]))
     click.echo("* Average: {}".format(data["average_ttc"]))
     click.echo("* Median: {}".format(data["median_ttc"]))
+    for key, value in data.get("percentiles_ttc", {}).items():
+        click.echo("* {}: {}".format(key, value))
+
+    click.echo("")
+    click.echo("Time to Close Histogram (days):")
+    for key, value in data.get("histogram_ttc", {}).items():
+        click.echo("* {}: {}".format(key, value))
 
     click.echo("")
     click.echo("Resolution:")
@@ -117,24 +308,46 @@ def closed_issues(days_ago: int, till: str, repository: str):
 @click.command()
 @click.option("--days-ago", default=7, help="How many days ago to look for closed issues.")
 @click.option("--till", default=None, help="Show results till this date. Expects date in DD.MM.YYYY format (31.12.2021).")
+@click.option("--workers", default=1, type=click.IntRange(min=1), help="How many pages to fetch in parallel.")
+@click.option("--cache-dir", default=None, help="Keep issues in local cache in this directory and only retrieve changed issues.")
+@click.option("--async", "use_async", is_flag=True, help="Retrieve all the repositories concurrently. Requires aiohttp.")
+@click.option("--concurrency", default=async_statistics.DEFAULT_CONCURRENCY, type=click.IntRange(min=1), help="How many requests could run at the same time with --async.")
+@click.option("--per-host", default=async_statistics.DEFAULT_PER_HOST, help="How many connections to pagure could be opened with --async.")
+@click.option("--processes", default=1, type=click.IntRange(min=1), help="How many processes parse and aggregate the pages. Can't be used with --cache-dir or --async.")
 @click.argument("google_spreadsheet")
 @click.argument("repositories", nargs=-1)
+@click.pass_obj
+@pagure_errors
 def update_google_spreadsheet(
-        days_ago: int, till: str, google_spreadsheet: str, repositories: tuple
+        client: PagureClient, days_ago: int, till: str, workers: int, cache_dir: str,
+        use_async: bool, concurrency: int, per_host: int, processes: int,
+        google_spreadsheet: str, repositories: tuple
 ):
     """
     Update google spreadsheet by statistics from specified repositories.
 
     Params:
+      client: Client used for requests to pagure
       days_ago: How many days ago to look for the issues
       till: Limit results to the day set by this argument. Default None will be replaced by `arrow.utcnow()`.
+      workers: How many pages to fetch in parallel
+      cache_dir: Directory with local cache of issues. Default None will not use the cache.
+      use_async: Retrieve all the repositories concurrently
+      concurrency: How many requests could run at the same time with `use_async`
+      per_host: How many connections to pagure could be opened with `use_async`
+      processes: How many processes parse and aggregate the pages
       repository: Repository namespace to check
     """
-    if till:
-        till = arrow.get(till, "DD.MM.YYYY")
-    else:
-        till = arrow.utcnow()
+    # Import here, google libraries are slow to import and only this command needs them
+    import pagure_api_scripts.google_docs as google_docs
+
+    if use_async and cache_dir:
+        raise click.UsageError("Options --async and --cache-dir can't be used together.")
+    check_processes(processes, cache_dir, use_async)
+
+    till, frozen_till = parse_till(till)
     since_arg = till.shift(days=-days_ago)
+    cache = open_cache(cache_dir)
 
     click.echo("Retrieving open and closed issues from {} updated in last {} days ({}) till {}".format(
         ", ".join(repositories), days_ago, since_arg.format("DD.MM.YYYY"), since_arg.shift(days=+days_ago).format("DD.MM.YYYY")))
@@ -143,19 +356,177 @@ def update_google_spreadsheet(
     data["since"] = since_arg
     data["till"] = till
     data["repositories"] = {}
+    if use_async:
+        async_data = async_statistics.collect_statistics(
+            till, since_arg, repositories, concurrency=concurrency, per_host=per_host,
+            timeout=client.timeout, scheduler=client.scheduler, metrics=client.metrics
+        )
     for repository in repositories:
         data["repositories"][repository] = {}
-        repository_data = get_statistics.open_issues(till, since_arg, repository)
-        data["repositories"][repository]["Opened issues"] = repository_data["total"]
-        repository_data = get_statistics.closed_issues(till, since_arg, repository)
-        data["repositories"][repository]["Closed issues"] = repository_data
-
+        if use_async:
+            repository_data = async_data[repository]
+        else:
+            repository_data = get_statistics.open_and_closed_issues(
+                till, since_arg, repository, workers=workers, client=client, cache=cache,
+                processes=processes, frozen_till=frozen_till
+            )
+        data["repositories"][repository]["Opened issues"] = repository_data["open"]["total"]
+        data["repositories"][repository]["Closed issues"] = repository_data["closed"]
+
+    kept_opened = sum(repository_data["Opened issues"] for repository_data in data["repositories"].values())
+    kept_closed = sum(repository_data["Closed issues"]["total"] for repository_data in data["repositories"].values())
+    click.echo("Downloaded {} issues in {} pages, kept {} opened and {} closed".format(
+        client.metrics.issues, client.metrics.pages, kept_opened, kept_closed))
+    get_instrumentation().count("issues_kept", kept_opened + kept_closed)
     click.echo("Data retrieved. Updating google spreadsheet 'https://docs.google.com/spreadsheets/d/{}/edit'".format(google_spreadsheet))
     google_docs.add_new_sheet(data, google_spreadsheet)
 
 
+@click.command("history")
+@click.option("--windows", default=4, type=click.IntRange(min=1), help="How many consecutive windows to compute.")
+@click.option("--period", default="weekly", type=click.Choice(list(history.PERIODS)), help="Length of each window.")
+@click.option("--till", default=None, help="End of the last window. Expects date in DD.MM.YYYY format (31.12.2021).")
+@click.option("--workers", default=1, type=click.IntRange(min=1), help="How many pages to fetch in parallel.")
+@click.option("--cache-dir", default=None, help="Keep issues in local cache in this directory and only retrieve changed issues.")
+@click.option("--processes", default=1, type=click.IntRange(min=1), help="How many processes parse and aggregate the pages. Can't be used with --cache-dir.")
+@click.argument('repository')
+@click.pass_obj
+@pagure_errors
+def history_command(
+        client: PagureClient, windows: int, period: str, till: str, workers: int, cache_dir: str,
+        processes: int, repository: str
+):
+    """
+    Get open and closed issues statistics for consecutive windows and print them.
+    All the issues are retrieved only once for the whole range.
+
+    Params:
+      client: Client used for requests to pagure
+      windows: How many consecutive windows to compute
+      period: Length of each window
+      till: End of the last window. Default None will be replaced by `arrow.utcnow()`.
+      workers: How many pages to fetch in parallel
+      cache_dir: Directory with local cache of issues. Default None will not use the cache.
+      processes: How many processes parse and aggregate the pages
+      repository: Repository namespace to check
+    """
+    check_processes(processes, cache_dir)
+
+    till, frozen_till = parse_till(till)
+    cache = open_cache(cache_dir)
+
+    click.echo("Retrieving {} {} windows of issues from {} till {}".format(
+        windows, period, repository, till.format("DD.MM.YYYY")))
+
+    data = history.history(
+        till, period, windows, repository, workers=workers, client=client, cache=cache,
+        processes=processes, frozen_till=frozen_till
+    )
+
+    for window in data:
+        click.echo("{} - {}: opened {}, closed {}, median time to close {}".format(
+            window["since"].format("DD.MM.YYYY"), window["till"].format("DD.MM.YYYY"),
+            window["open"]["total"], window["closed"]["total"], window["closed"]["median_ttc"]))
+    click.echo("Downloaded {} issues in {} pages".format(client.metrics.issues, client.metrics.pages))
+
+
+@click.command("export")
+@click.option("--windows", default=4, type=click.IntRange(min=1), help="How many consecutive windows to compute.")
+@click.option("--period", default="weekly", type=click.Choice(list(history.PERIODS)), help="Length of each window.")
+@click.option("--till", default=None, help="End of the last window. Expects date in DD.MM.YYYY format (31.12.2021).")
+@click.option("--format", "output_format", default="csv", type=click.Choice(list(export.WRITERS)), help="Format of the exported files. Parquet requires pyarrow.")
+@click.option("--issues-file", default=None, help="Export every retrieved issue to this file.")
+@click.option("--windows-file", default=None, help="Export statistics of every window to this file.")
+@click.option("--workers", default=1, type=click.IntRange(min=1), help="How many pages to fetch in parallel.")
+@click.option("--cache-dir", default=None, help="Keep issues in local cache in this directory and only retrieve changed issues.")
+@click.argument("repositories", nargs=-1, required=True)
+@click.pass_obj
+@pagure_errors
+def export_command(
+        client: PagureClient, windows: int, period: str, till: str, output_format: str,
+        issues_file: str, windows_file: str, workers: int, cache_dir: str, repositories: tuple
+):
+    """
+    Export issues and statistics for consecutive windows from the repositories to files.
+    The files are written while the issues are retrieved.
+
+    Params:
+      client: Client used for requests to pagure
+      windows: How many consecutive windows to compute
+      period: Length of each window
+      till: End of the last window. Default None will be replaced by `arrow.utcnow()`.
+      output_format: Format of the exported files
+      issues_file: Path to the file for issues. Default None will not export issues.
+      windows_file: Path to the file for statistics of windows. Default None will not export them.
+      workers: How many pages to fetch in parallel
+      cache_dir: Directory with local cache of issues. Default None will not use the cache.
+      repositories: Repository namespaces to export
+    """
+    if not issues_file and not windows_file:
+        raise click.UsageError("At least one of --issues-file and --windows-file is required.")
+
+    till, frozen_till = parse_till(till)
+    cache = open_cache(cache_dir)
+
+    click.echo("Exporting {} {} windows of issues from {} till {}".format(
+        windows, period, ", ".join(repositories), till.format("DD.MM.YYYY")))
+
+    exported = export.export(
+        till, period, windows, repositories, output_format=output_format,
+        issues_path=issues_file, windows_path=windows_file, workers=workers,
+        client=client, cache=cache, frozen_till=frozen_till
+    )
+
+    if issues_file:
+        click.echo("Exported {} issues to {}".format(exported["issues"], issues_file))
+    if windows_file:
+        click.echo("Exported {} windows to {}".format(exported["windows"], windows_file))
+    click.echo("Downloaded {} issues in {} pages".format(client.metrics.issues, client.metrics.pages))
+
+
+@click.command("serve")
+@click.option("--host", default="127.0.0.1", help="Address to listen on.")
+@click.option("--port", default=daemon.DEFAULT_PORT, help="Port to listen on.")
+@click.option("--socket", "socket_path", default=None, help="Listen on this Unix socket instead of the port.")
+@click.option("--refresh", default=daemon.DEFAULT_REFRESH, type=float, help="How many seconds to wait between refreshes of the issues.")
+@click.option("--history-days", default=daemon.DEFAULT_HISTORY_DAYS, help="How many days of history to load for every repository.")
+@click.option("--workers", default=1, type=click.IntRange(min=1), help="How many pages to fetch in parallel.")
+@click.argument("repositories", nargs=-1)
+@click.pass_obj
+@pagure_errors
+def serve_command(
+        client: PagureClient, host: str, port: int, socket_path: str, refresh: float,
+        history_days: int, workers: int, repositories: tuple
+):
+    """
+    Keep issues of the repositories in memory and answer open and closed issues queries over HTTP.
+
+    Params:
+      client: Client used for requests to pagure
+      host: Address to listen on
+      port: Port to listen on
+      socket_path: Unix socket to listen on instead of the port. Default None will listen on the port.
+      refresh: How many seconds to wait between refreshes of the issues
+      history_days: How many days of history to load for every repository
+      workers: How many pages to fetch in parallel
+      repositories: Repositories to load before serving, other repositories are loaded on the first query
+    """
+    index = daemon.IssueIndex(client=client, workers=workers, history_days=history_days)
+
+    if repositories:
+        click.echo("Loading {} days of issues from {}".format(history_days, ", ".join(repositories)))
+        for repository in repositories:
+            index.repository(repository)
+
+    click.echo("Serving on {}".format(socket_path or "http://{}:{}/".format(host, port)))
+    daemon.serve(index, refresh=refresh, host=host, port=port, socket_path=socket_path)
+
+
 if __name__ == "__main__":
     cli.add_command(closed_issues)
+    cli.add_command(export_command)
+    cli.add_command(history_command)
     cli.add_command(open_issues)
+    cli.add_command(serve_command)
     cli.add_command(update_google_spreadsheet)
     cli()